@@ -0,0 +1,63 @@
+"""
+Recipe alternatives benchmark.
+
+Builds a synthetic recipe pool and reports the time to index it and the
+median time to find the closest recipes and templates to a recipe, with and
+without tag and restriction filters.
+
+    python -m benchmarks.alternatives [--recipes 100000] [--k 3] [--repeat 20]
+"""
+import argparse
+import time
+
+import numpy as np
+
+from benchmarks._common import setup_django, timed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--recipes', type=int, default=100000)
+    parser.add_argument('--k', type=int, default=3)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    setup_django()
+    from meal_plans.alternatives import NutrientIndex
+    from meal_plans.recipe_pool import RecipePool
+    from meal_plans.template_catalog import get_template_catalog
+    from recipes.models import Recipe
+
+    rng = np.random.default_rng(0)
+    n = args.recipes
+    calories = rng.uniform(150, 900, n)
+    split = rng.dirichlet([4, 5, 3], n)
+    nutrients = np.column_stack([calories, calories[:, None] * split / [4, 4, 9]])
+    tag_bits = {'vegetarian': 1, 'vegan': 2}
+    masks = np.where(np.arange(n) % 2, 1, 0) | np.where(np.arange(n) % 6 == 1, 2, 0)
+    ingredients = [['peanuts'] if i % 7 == 0 else ['rice', 'beans'] for i in range(n)]
+    pool = RecipePool(np.arange(n), np.zeros(n), np.ones(n), nutrients, masks, ingredients, tag_bits)
+
+    started = time.perf_counter()
+    index = NutrientIndex(pool, get_template_catalog())
+    build_seconds = time.perf_counter() - started
+    print(f"index of {n} recipes built in {build_seconds * 1000:.1f} ms")
+
+    recipe = Recipe(pk=0, title='Query', calories_per_serving=520, protein=35, carbs=50, fat=18)
+    cases = [
+        ('any recipe', {}),
+        ('vegetarian', {'dietary_tags': ['vegetarian']}),
+        ('vegan, no nuts', {'dietary_tags': ['vegan'], 'restrictions': ['nut']}),
+    ]
+    print(f"{'filter':<18}{'recipes ms':>12}{'templates ms':>14}")
+    for label, filters in cases:
+        recipe_seconds, _ = timed(lambda: index.recipe_neighbours(recipe, args.k, **filters), args.repeat)
+        template_seconds, _ = timed(
+            lambda: index.template_neighbours(recipe, args.k, 'vegetarian', filters.get('restrictions', ())),
+            args.repeat
+        )
+        print(f"{label:<18}{recipe_seconds * 1000:>12.2f}{template_seconds * 1000:>14.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+"""
+Meal-plan materialisation benchmark.
+
+Reports the number of queries and the latency of writing a generated plan
+for 7-, 28- and 90-day plans.
+
+    python -m benchmarks.materialize [--meals-per-day 3] [--repeat 5]
+"""
+import argparse
+
+from benchmarks._common import setup_django, benchmark_database, timed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--days', type=int, nargs='+', default=[7, 28, 90])
+    parser.add_argument('--meals-per-day', type=int, default=3)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.contrib.auth.models import User
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    from meal_plans.local_ai_service import LocalAIMealPlannerService
+
+    with benchmark_database():
+        user = User.objects.create_user(username='bench', password='bench')
+        service = LocalAIMealPlannerService()
+
+        print(f"{'days':>6}{'meals':>8}{'queries':>10}{'median ms':>12}")
+        for days in args.days:
+            preferences = {'dietary_preferences': ['balanced'], 'days': days, 'meals_per_day': args.meals_per_day}
+            meal_plan_data = service.generate_meal_plan(preferences)
+
+            with CaptureQueriesContext(connection) as queries:
+                service.create_meal_plan_from_ai_response(user, meal_plan_data, preferences)
+
+            seconds, _ = timed(
+                lambda: service.create_meal_plan_from_ai_response(user, meal_plan_data, preferences),
+                repeat=args.repeat
+            )
+            meals = sum(len(day['meals']) for day in meal_plan_data['days'])
+            print(f"{days:>6}{meals:>8}{len(queries):>10}{seconds * 1000:>12.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""
+Keyset pagination benchmark.
+
+Fills the recipe table (1M rows by default) and the meal-plan table (the same
+number of plans spread over 100 users), then reports the median time to
+fetch a page at increasing depths with ``KeysetPagination`` against the
+equivalent ``OFFSET`` query.
+
+    python -m benchmarks.pagination [--rows 1000000] [--page-size 20] [--repeat 5]
+"""
+import argparse
+import datetime
+import random
+import time
+
+from benchmarks._common import setup_django, benchmark_database, timed
+
+DEPTHS = (0, 100, 1_000, 10_000, 49_000)
+
+
+class _View:
+    def __init__(self, ordering):
+        self.keyset_ordering = ordering
+
+
+def _recipes(count, user):
+    from recipes.models import Recipe
+
+    for i in range(count):
+        yield Recipe(
+            title=f'Recipe {i}', description='', ingredients=[], instructions='',
+            prep_time=10, cook_time=10, servings=2, calories_per_serving=400,
+            protein=20, carbs=40, fat=15, created_by=user,
+        )
+
+
+def _meal_plans(count, users, rng):
+    from meal_plans.models import MealPlan
+
+    first = datetime.date(2020, 1, 1)
+    for i in range(count):
+        start = first + datetime.timedelta(days=rng.randrange(2000))
+        yield MealPlan(user=rng.choice(users), name=f'Plan {i}', start_date=start,
+                       end_date=start + datetime.timedelta(days=6))
+
+
+def _report(label, queryset, view, page_size, repeat):
+    from rest_framework.request import Request
+    from rest_framework.test import APIRequestFactory
+    from meal_planner_project.pagination import KeysetPagination
+
+    factory = APIRequestFactory()
+    paginator = KeysetPagination()
+    paginator.ordering_columns = paginator.get_ordering(view)
+    order_by = [f"{'-' if descending else ''}{column}" for column, descending in paginator.ordering_columns]
+    pages = queryset.count() // page_size
+
+    print(f"\n{label}")
+    print(f"{'page':>8}{'keyset ms':>12}{'offset ms':>12}")
+    for depth in (depth for depth in DEPTHS if depth < pages):
+        offset = depth * page_size
+        params = {'page_size': page_size}
+        if offset:
+            # The cursor a client would hold after reading ``depth`` pages
+            last = queryset.order_by(*order_by)[offset - 1]
+            params['cursor'] = paginator.cursor_token(last, False)
+
+        def keyset_page():
+            return KeysetPagination().paginate_queryset(queryset, Request(factory.get('/', params)), view)
+
+        keyset_seconds, page = timed(keyset_page, repeat)
+        offset_seconds, rows = timed(
+            lambda: list(queryset.order_by(*order_by)[offset:offset + page_size]), repeat
+        )
+        assert [row.pk for row in page] == [row.pk for row in rows]
+        print(f"{depth + 1:>8}{keyset_seconds * 1000:>12.2f}{offset_seconds * 1000:>12.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--page-size', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.contrib.auth.models import User
+    from meal_plans.models import MealPlan
+    from recipes.models import Recipe
+
+    with benchmark_database():
+        users = User.objects.bulk_create([User(username=f'bench{i}') for i in range(100)])
+        rng = random.Random(0)
+
+        started = time.perf_counter()
+        Recipe.objects.bulk_create(_recipes(args.rows, users[0]), batch_size=5000)
+        MealPlan.objects.bulk_create(_meal_plans(args.rows, users, rng), batch_size=5000)
+        print(f"inserted {args.rows} recipes and {args.rows} meal plans "
+              f"in {time.perf_counter() - started:.1f}s")
+
+        _report('recipes, -created_at', Recipe.objects.all(), _View(('-created_at',)),
+                args.page_size, args.repeat)
+        # One user's plans: ~1% of the table
+        plans = MealPlan.objects.filter(user=users[0])
+        _report(f'meal plans of one user ({plans.count()} rows), -start_date', plans,
+                _View(('-start_date',)), args.page_size, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
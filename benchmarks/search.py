@@ -0,0 +1,91 @@
+"""
+Full-text recipe search benchmark.
+
+Builds a synthetic corpus (100k recipes by default), rebuilds the FTS5 index
+and reports the median latency of ranked searches, with and without the
+numeric filters, against a plain ``icontains`` scan.
+
+    python -m benchmarks.search [--recipes 100000] [--repeat 5]
+"""
+import argparse
+import random
+import time
+
+from benchmarks._common import setup_django, benchmark_database, timed
+
+WORDS = (
+    'chicken chickpea lentil tofu salmon beef pork turkey quinoa rice pasta noodle oat barley '
+    'spinach kale tomato pepper onion garlic ginger lemon lime coconut almond peanut walnut '
+    'basil cumin paprika curry chili yogurt cheese egg bean mushroom avocado potato squash '
+    'roasted grilled baked stewed creamy spicy smoky crispy fresh quick hearty light'
+).split()
+
+QUERIES = ('chick', 'coconut curry', 'spicy lentil stew', 'zzz')
+
+
+def _corpus(count, user, rng):
+    from recipes.models import Recipe
+
+    for i in range(count):
+        title_words = rng.sample(WORDS, 3)
+        yield Recipe(
+            title=' '.join(title_words).title(),
+            description=' '.join(rng.choices(WORDS, k=12)),
+            ingredients=[{'name': word, 'amount': 100, 'unit': 'g'} for word in rng.sample(WORDS, 6)],
+            instructions=' '.join(rng.choices(WORDS, k=30)),
+            prep_time=rng.randint(5, 60),
+            cook_time=rng.randint(0, 90),
+            servings=rng.randint(1, 6),
+            calories_per_serving=rng.randint(150, 900),
+            protein=rng.uniform(5, 60),
+            carbs=rng.uniform(5, 120),
+            fat=rng.uniform(2, 50),
+            created_by=user,
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--recipes', type=int, default=100_000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.contrib.auth.models import User
+    from django.db.models import Q
+    from recipes.models import Recipe
+    from recipes.search import rebuild_search_index, search_recipes
+
+    with benchmark_database():
+        user = User.objects.create_user(username='bench', password='bench')
+        rng = random.Random(0)
+
+        started = time.perf_counter()
+        Recipe.objects.bulk_create(_corpus(args.recipes, user, rng), batch_size=2000)
+        inserted = time.perf_counter()
+        indexed = rebuild_search_index()
+        print(f"inserted {args.recipes} recipes in {inserted - started:.1f}s, "
+              f"indexed {indexed} in {time.perf_counter() - inserted:.1f}s")
+
+        print(f"{'query':<20}{'filters':>9}{'hits':>8}{'fts ms':>10}{'scan ms':>10}")
+        for query in QUERIES:
+            for filtered in (False, True):
+                queryset = Recipe.objects.all()
+                if filtered:
+                    queryset = queryset.filter(calories_per_serving__lte=500, prep_time__lte=30)
+
+                fts_seconds, top = timed(lambda: list(search_recipes(query, queryset)[:20]), args.repeat)
+                hits = search_recipes(query, queryset).count()
+
+                condition = Q()
+                for term in query.split():
+                    condition &= Q(title__icontains=term) | Q(description__icontains=term) | \
+                        Q(instructions__icontains=term)
+                scan_seconds, _ = timed(lambda: list(queryset.filter(condition)[:20]), args.repeat)
+
+                print(f"{query:<20}{'yes' if filtered else 'no':>9}{hits:>8}"
+                      f"{fts_seconds * 1000:>10.1f}{scan_seconds * 1000:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""
+Shopping-list generation benchmark.
+
+Stores 7-, 28- and 90-day plans over a set of recipes, then reports the
+number of queries and the median latency of generating (and regenerating)
+a shopping list for each, and of the incremental update that follows
+re-serving one meal of the plan.
+
+    python -m benchmarks.shopping [--recipes 50] [--ingredients 12] [--repeat 5]
+"""
+import argparse
+import datetime
+import random
+
+from benchmarks._common import setup_django, benchmark_database, timed
+
+UNITS = ('g', 'kg', 'ml', 'l', 'tbsp', 'cup', 'pcs')
+
+
+def _meal_plan(user, recipes, meal_types, days, rng):
+    from meal_plans.models import Meal, MealPlan, MealPlanDay
+
+    start = datetime.date(2026, 1, 1)
+    meal_plan = MealPlan.objects.create(user=user, name=f'{days} days', start_date=start,
+                                        end_date=start + datetime.timedelta(days=days - 1))
+    plan_days = MealPlanDay.objects.bulk_create(
+        MealPlanDay(meal_plan=meal_plan, date=start + datetime.timedelta(days=i)) for i in range(days)
+    )
+    Meal.objects.bulk_create(
+        Meal(day=day, meal_type=meal_type, recipe=rng.choice(recipes), servings=rng.randint(1, 4))
+        for day in plan_days for meal_type in meal_types
+    )
+    return meal_plan
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--days', type=int, nargs='+', default=[7, 28, 90])
+    parser.add_argument('--recipes', type=int, default=50)
+    parser.add_argument('--ingredients', type=int, default=12)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.contrib.auth.models import User
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    from meal_plans.models import Meal, MealType
+    from recipes.models import Recipe
+    from shopping.generation import generate_shopping_list
+    from shopping.models import PantryItem, ShoppingList
+
+    with benchmark_database():
+        rng = random.Random(0)
+        user = User.objects.create_user(username='bench', password='bench')
+        meal_types = [MealType.objects.create(name=name, display_order=i)
+                      for i, name in enumerate(('breakfast', 'lunch', 'dinner'))]
+        recipes = [
+            Recipe.objects.create(
+                title=f'Recipe {i}', description='', instructions='', prep_time=10, cook_time=10,
+                servings=rng.randint(1, 4), calories_per_serving=500, protein=30, carbs=50, fat=20,
+                ingredients=[
+                    {'name': f'ingredient {rng.randrange(200)}', 'amount': rng.randint(1, 500),
+                     'unit': rng.choice(UNITS)}
+                    for _ in range(args.ingredients)
+                ],
+                created_by=user,
+            )
+            for i in range(args.recipes)
+        ]
+        PantryItem.objects.bulk_create(
+            PantryItem(user=user, name=f'ingredient {i}', quantity=100, unit='g') for i in range(0, 200, 4)
+        )
+
+        print(f"{'days':>6}{'meals':>8}{'items':>8}{'queries':>10}{'median ms':>12}"
+              f"{'edit queries':>14}{'edit ms':>10}")
+        for days in args.days:
+            meal_plan = _meal_plan(user, recipes, meal_types, days, rng)
+            shopping_list = ShoppingList.objects.create(user=user, meal_plan=meal_plan, name=f'{days} days')
+
+            with CaptureQueriesContext(connection) as queries:
+                generate_shopping_list(shopping_list)
+            seconds, items = timed(lambda: generate_shopping_list(shopping_list), args.repeat)
+
+            meal = Meal.objects.filter(day__meal_plan=meal_plan).first()
+
+            def reserve():
+                meal.servings = meal.servings % 4 + 1
+                meal.save()
+
+            with CaptureQueriesContext(connection) as edit_queries:
+                reserve()
+            edit_seconds, _ = timed(reserve, args.repeat)
+            print(f"{days:>6}{days * len(meal_types):>8}{len(items):>8}{len(queries):>10}{seconds * 1000:>12.1f}"
+                  f"{len(edit_queries):>14}{edit_seconds * 1000:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+"""
+Meal-plan solver benchmark.
+
+Builds a synthetic recipe pool, filters it by tag and restriction, and plans
+a month of meals, reporting candidate filtering time, solve time and the
+objective score.
+
+    python -m benchmarks.solver [--recipes 50000] [--days 30]
+"""
+import argparse
+import time
+
+import numpy as np
+
+from benchmarks._common import setup_django
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--recipes', type=int, default=50000)
+    parser.add_argument('--days', type=int, nargs='+', default=[7, 30])
+    parser.add_argument('--target-calories', type=float, default=2000)
+    args = parser.parse_args()
+
+    setup_django()
+    from meal_plans.recipe_pool import RecipePool
+    from meal_plans.solver import MealPlanSolver, daily_targets
+
+    rng = np.random.default_rng(0)
+    n = args.recipes
+    calories = rng.uniform(150, 900, n)
+    split = rng.dirichlet([4, 5, 3], n)
+    nutrients = np.column_stack([calories, calories[:, None] * split / [4, 4, 9]])
+    tag_bits = {'vegetarian': 1, 'vegan': 2}
+    masks = np.where(np.arange(n) % 2, 1, 0) | np.where(np.arange(n) % 6 == 1, 2, 0)
+    ingredients = [['peanuts'] if i % 7 == 0 else ['rice', 'beans'] for i in range(n)]
+
+    started = time.perf_counter()
+    pool = RecipePool(np.arange(n), np.zeros(n), np.ones(n), nutrients, masks, ingredients, tag_bits)
+    build_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    candidates = pool.candidate_mask(dietary_tags=['vegetarian'], restrictions=['nut'])
+    filter_seconds = time.perf_counter() - started
+
+    print(f"pool of {n} recipes: build {build_seconds * 1000:.1f} ms, "
+          f"filter {filter_seconds * 1000:.1f} ms ({int(candidates.sum())} candidates)")
+    print(f"{'days':>6}{'solve ms':>12}{'objective':>12}{'mean kcal':>12}")
+    solver = MealPlanSolver(pool.nutrients, daily_targets(args.target_calories), ['breakfast', 'lunch', 'dinner'])
+    for days in args.days:
+        result = solver.solve(days, candidates)
+        print(f"{days:>6}{result.solve_seconds * 1000:>12.1f}{result.objective:>12.4f}"
+              f"{result.daily_totals[:, 0].mean():>12.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""
+Startup benchmark.
+
+Measures, in a fresh interpreter each time, how long it takes to import each
+app and to serve the first request, and checks that torch/transformers stay
+out of ``sys.modules`` until an inference path runs.
+
+    python -m benchmarks.startup [--runs 5]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+HEAVY_MODULES = ('torch', 'transformers')
+APPS = ('recipes', 'meal_plans', 'shopping')
+
+PROBE = r'''
+import json, os, sys, time
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'meal_planner_project.settings')
+started = time.perf_counter()
+import django
+django.setup()
+timings = {'django_setup': time.perf_counter() - started}
+for app in %(apps)r:
+    t = time.perf_counter()
+    __import__(app + '.views')
+    __import__(app + '.urls')
+    timings[app] = time.perf_counter() - t
+t = time.perf_counter()
+__import__('meal_planner_project.urls')
+timings['urlconf'] = time.perf_counter() - t
+from django.test import Client
+t = time.perf_counter()
+Client().get('/api/recipes/')
+timings['first_request'] = time.perf_counter() - t
+timings['time_to_first_request'] = time.perf_counter() - started
+print(json.dumps({
+    'timings': timings,
+    'heavy_modules': [m for m in %(heavy)r if m in sys.modules],
+}))
+'''
+
+
+def probe():
+    """Run one cold start in a subprocess and return its measurements"""
+    code = PROBE % {'apps': APPS, 'heavy': HEAVY_MODULES}
+    output = subprocess.run(
+        [sys.executable, '-c', code],
+        cwd=BASE_DIR,
+        env={**os.environ, 'MEAL_PLANNER_WARM_UP_MODEL': ''},
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    results = [probe() for _ in range(args.runs)]
+    heavy = sorted({m for r in results for m in r['heavy_modules']})
+
+    print(f"{'phase':<24}{'median ms':>12}{'max ms':>12}")
+    for phase in results[0]['timings']:
+        samples = [r['timings'][phase] * 1000 for r in results]
+        print(f"{phase:<24}{statistics.median(samples):>12.1f}{max(samples):>12.1f}")
+    print(f"heavy modules imported at startup: {', '.join(heavy) or 'none'}")
+    return 1 if heavy else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,36 @@
+"""
+Helpers for delete signal handlers that maintain derived data.
+
+Django sends ``pre_delete`` for every row a cascade removes, with ``origin``
+set to the instance or queryset the delete started from. Handlers use
+``deleted_with`` to skip rows whose parent is going as well, and
+``deleted_rows`` to handle a ``QuerySet.delete()`` in one pass on its first
+instance instead of once per row.
+"""
+from typing import Any, Dict, List
+
+from django.db.models import QuerySet
+
+
+def deleted_with(origin, models) -> bool:
+    """Whether the delete started from ``origin`` removes rows of ``models`` outright"""
+    if isinstance(origin, QuerySet):
+        return issubclass(origin.model, models)
+    return isinstance(origin, models)
+
+
+def deleted_rows(origin, sender, instance, *fields, handler: str) -> List[Dict[str, Any]]:
+    """Values of the rows a delete removes: the instance's, or all of a bulk delete.
+
+    A bulk delete of ``sender`` is read once, on its first instance; later
+    instances get no rows. ``handler`` names the caller, so each handler
+    reads it once.
+    """
+    marker = f'_{handler}_deleted'
+    if isinstance(origin, QuerySet) and issubclass(origin.model, sender):
+        if instance.pk in getattr(origin, marker, ()):
+            return []
+        rows = list(origin.values('pk', *fields))
+        setattr(origin, marker, {row['pk'] for row in rows})
+        return rows
+    return list(sender.objects.filter(pk=instance.pk).values('pk', *fields))
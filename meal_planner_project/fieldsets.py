@@ -0,0 +1,222 @@
+"""
+Sparse fieldsets and opt-in nesting for API serializers.
+
+Serializers using ``ExpandableFieldsMixin`` render related objects compactly
+by default: a foreign key as its id and a reverse relation as a list of ids,
+or not at all for relations whose size is unbounded (such as ratings).
+Clients opt in to nesting and trim fields with query parameters, using dots
+to reach into nested objects:
+
+    ?expand=days.meals.recipe
+    ?fields=id,name,days.date,days.meals
+
+``prefetch_plan`` turns the same parameters into the ``select_related`` and
+``prefetch_related`` calls needed to render that shape, so views load only
+what the response contains. Fields computed by the database (counts and
+sums over a relation) are declared in ``field_annotations`` and added to the
+same queryset, rather than read from prefetched rows.
+"""
+from typing import Any, Dict, List, Optional, Tuple
+
+from django.db.models import Prefetch
+from django.utils.module_loading import import_string
+from rest_framework import serializers
+
+FieldTree = Dict[str, 'FieldTree']
+
+
+def parse_fieldset(value: Optional[str]) -> FieldTree:
+    """Turn ``a,b.c,b.d`` into ``{'a': {}, 'b': {'c': {}, 'd': {}}}``"""
+    tree = {}
+    for path in (value or '').split(','):
+        node = tree
+        for name in path.strip().split('.'):
+            if name:
+                node = node.setdefault(name, {})
+    return tree
+
+
+class Expandable:
+    """An expandable field: what it nests and how it looks when not expanded.
+
+    ``serializer`` may be a class or a dotted path, for relations between apps
+    that would otherwise import each other. ``compact`` is ``'id'`` to render
+    ids when not expanded, or ``None`` to leave the field out.
+    """
+
+    def __init__(self, serializer, many: bool = False, source: Optional[str] = None,
+                 compact: Optional[str] = 'id'):
+        self._serializer = serializer
+        self.many = many
+        self.source = source
+        self.compact = compact
+
+    @property
+    def serializer(self):
+        if isinstance(self._serializer, str):
+            self._serializer = import_string(self._serializer)
+        return self._serializer
+
+    @property
+    def is_expandable(self) -> bool:
+        """Whether the nested serializer itself takes ``expand`` and ``fields``"""
+        return issubclass(self.serializer, ExpandableFieldsMixin)
+
+
+class ExpandableFieldsMixin:
+    """ModelSerializer mixin for ``?fields=`` and ``?expand=`` (see module docs).
+
+    ``expandable_fields`` maps field names to ``Expandable``; ``field_relations``
+    maps other fields to the relations they read (for example a method field
+    summing prefetched rows), so the prefetch plan includes them.
+    ``field_annotations`` maps fields to the ``{name: expression}`` annotations
+    they read; instances that were not loaded with them (such as one just
+    created) have them fetched in one query when rendered.
+    """
+    expandable_fields: Dict[str, Expandable] = {}
+    field_relations: Dict[str, Tuple[str, ...]] = {}
+    field_annotations: Dict[str, Dict[str, Any]] = {}
+
+    def __init__(self, *args, expand: Optional[FieldTree] = None,
+                 fields: Optional[FieldTree] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        if expand is None:
+            expand = parse_fieldset(request.query_params.get('expand')) if request else {}
+        if fields is None and request is not None:
+            fields = parse_fieldset(request.query_params.get('fields')) or None
+        self._expand = expand
+        self._fieldset = fields
+
+    @classmethod
+    def _included(cls, name: str, fields: Optional[FieldTree]) -> bool:
+        return fields is None or name in fields
+
+    def get_fields(self):
+        fields = super().get_fields()
+        for name, spec in self.expandable_fields.items():
+            source = spec.source if spec.source and spec.source != name else None
+            options = {'source': source} if source else {}
+            if name in self._expand:
+                if spec.is_expandable:
+                    options['expand'] = self._expand[name]
+                    options['fields'] = (self._fieldset or {}).get(name) or None
+                fields[name] = spec.serializer(many=spec.many, read_only=True, **options)
+            elif spec.compact == 'id':
+                if name in fields and not source and not any(
+                    other != name and getattr(field, 'source', None) == name for other, field in fields.items()
+                ):
+                    # The model serializer's own field already renders the id
+                    # and stays writable if the model field is (unless a
+                    # separate ``<name>_id`` field takes the input)
+                    continue
+                fields[name] = serializers.PrimaryKeyRelatedField(many=spec.many, read_only=True, **options)
+            else:
+                fields.pop(name, None)
+
+        if self._fieldset is not None:
+            for name, field in list(fields.items()):
+                if name in self._fieldset:
+                    continue
+                if field.read_only:
+                    del fields[name]
+                else:
+                    # Still accepted on input, just not rendered
+                    field.write_only = True
+        return fields
+
+    def to_representation(self, instance):
+        missing = {
+            name: expression
+            for field, annotations in self.field_annotations.items() if field in self.fields
+            for name, expression in annotations.items() if not hasattr(instance, name)
+        }
+        if missing:
+            values = type(instance)._default_manager.filter(pk=instance.pk).annotate(**missing).values(*missing)
+            for name, value in values.get().items():
+                setattr(instance, name, value)
+        return super().to_representation(instance)
+
+    @classmethod
+    def annotation_plan(cls, fields: Optional[FieldTree] = None) -> Dict[str, Any]:
+        """Annotations the included fields read"""
+        return {
+            name: expression
+            for field, annotations in cls.field_annotations.items() if cls._included(field, fields)
+            for name, expression in annotations.items()
+        }
+
+    @classmethod
+    def _relation_is_many(cls, source: str) -> bool:
+        field = cls.Meta.model._meta.get_field(source)
+        return not (field.many_to_one or field.one_to_one)
+
+    @classmethod
+    def prefetch_plan(cls, expand: Optional[FieldTree] = None, fields: Optional[FieldTree] = None,
+                      prefix: str = '') -> Tuple[List[str], List]:
+        """``select_related`` and ``prefetch_related`` lookups for a response shape"""
+        expand = expand or {}
+        select = []
+        prefetch = {}
+
+        for name, relations in cls.field_relations.items():
+            if cls._included(name, fields):
+                for relation in relations:
+                    if cls._relation_is_many(relation):
+                        prefetch.setdefault(prefix + relation, prefix + relation)
+                    else:
+                        select.append(prefix + relation)
+
+        for name, spec in cls.expandable_fields.items():
+            if not cls._included(name, fields):
+                continue
+            source = spec.source or name
+            if name in expand:
+                child = spec.serializer
+                subfields = (fields or {}).get(name) or None
+                if spec.many:
+                    queryset = child.Meta.model._default_manager.all()
+                    if spec.is_expandable:
+                        queryset = child.optimize_queryset(queryset, expand[name], subfields)
+                    prefetch[prefix + source] = Prefetch(prefix + source, queryset=queryset)
+                else:
+                    select.append(prefix + source)
+                    if spec.is_expandable:
+                        child_select, child_prefetch = child.prefetch_plan(
+                            expand[name], subfields, prefix=f'{prefix}{source}__'
+                        )
+                        select.extend(child_select)
+                        for lookup in child_prefetch:
+                            key = lookup.prefetch_to if isinstance(lookup, Prefetch) else lookup
+                            prefetch[key] = lookup
+            elif spec.many and spec.compact == 'id':
+                prefetch.setdefault(prefix + source, prefix + source)
+
+        return select, list(prefetch.values())
+
+    @classmethod
+    def optimize_queryset(cls, queryset, expand: Optional[FieldTree] = None,
+                          fields: Optional[FieldTree] = None):
+        """Apply ``prefetch_plan`` and ``annotation_plan`` to a queryset of this serializer's model"""
+        select, prefetch = cls.prefetch_plan(expand, fields)
+        annotations = cls.annotation_plan(fields)
+        if annotations:
+            queryset = queryset.annotate(**annotations)
+        if select:
+            queryset = queryset.select_related(*select)
+        if prefetch:
+            queryset = queryset.prefetch_related(*prefetch)
+        return queryset
+
+
+class ExpandableQuerysetMixin:
+    """ViewSet mixin applying the serializer's prefetch plan for the request"""
+
+    def optimize_queryset(self, queryset):
+        serializer_class = self.get_serializer_class()
+        params = self.request.query_params
+        return serializer_class.optimize_queryset(
+            queryset,
+            parse_fieldset(params.get('expand')),
+            parse_fieldset(params.get('fields')) or None
+        )
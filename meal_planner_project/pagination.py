@@ -0,0 +1,160 @@
+"""
+Keyset (cursor) pagination on several ordering columns.
+
+DRF's ``CursorPagination`` positions its cursor on the first ordering column
+only and falls back to offsets for ties. ``KeysetPagination`` instead encodes
+the values of every ordering column of the last row in the cursor, and the
+next page is the rows strictly after it:
+
+    (a, b, id) after (x, y, z)  =  a > x  OR  (a = x AND b > y)  OR  (a = x AND b = y AND id > z)
+
+(with ``<`` for descending columns), plus a redundant ``a >= x`` bound so the
+database can start a range scan on an index led by ``a``. With an index
+matching the ordering, page 1000 costs the same as page 1 and concurrent
+inserts never shift or repeat rows. There is no total count.
+
+Views set ``keyset_ordering``; a tie-breaker on ``id`` is appended when it is
+not already the last column. The ordering columns must be non-null, so
+nullable or related columns should be annotated with a ``Coalesce`` first.
+"""
+import base64
+import binascii
+import datetime
+import json
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+from django.db.models import Q
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+def _encode_value(value):
+    if isinstance(value, datetime.datetime):
+        return {'dt': value.isoformat()}
+    if isinstance(value, datetime.date):
+        return {'d': value.isoformat()}
+    return value
+
+
+def _decode_value(value):
+    if isinstance(value, dict):
+        if 'dt' in value:
+            return parse_datetime(value['dt'])
+        if 'd' in value:
+            return parse_date(value['d'])
+        raise ValueError(value)
+    return value
+
+
+class KeysetPagination(BasePagination):
+    """Paginate on the view's ``keyset_ordering`` with an opaque cursor"""
+    ordering = ('-id',)
+    page_size = 20
+    max_page_size = 100
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def get_ordering(self, view) -> List[Tuple[str, bool]]:
+        """``(column, descending)`` pairs ending with the id tie-breaker"""
+        ordering = list(getattr(view, 'keyset_ordering', self.ordering))
+        if ordering[-1].lstrip('-') not in ('id', 'pk'):
+            ordering.append('-id' if ordering[-1].startswith('-') else 'id')
+        return [(field.lstrip('-'), field.startswith('-')) for field in ordering]
+
+    def get_page_size(self, request) -> int:
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+
+    def decode_cursor(self, request) -> Optional[Tuple[list, bool]]:
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            data = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+            position = [_decode_value(value) for value in data['p']]
+            reverse = bool(data.get('r'))
+        except (TypeError, ValueError, KeyError, binascii.Error, UnicodeEncodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if len(position) != len(self.ordering_columns) or any(value is None for value in position):
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+    def cursor_token(self, instance, reverse: bool) -> str:
+        """The opaque cursor positioned on ``instance``"""
+        data = {'p': [_encode_value(getattr(instance, column)) for column, _ in self.ordering_columns]}
+        if reverse:
+            data['r'] = 1
+        return base64.urlsafe_b64encode(json.dumps(data, separators=(',', ':')).encode('ascii')).decode('ascii')
+
+    def encode_cursor(self, instance, reverse: bool) -> str:
+        return replace_query_param(self.base_url, self.cursor_query_param, self.cursor_token(instance, reverse))
+
+    def _after(self, position, reverse: bool) -> Q:
+        """Rows strictly after ``position`` in the (possibly reversed) ordering"""
+        condition = Q()
+        equal = Q()
+        for (column, descending), value in zip(self.ordering_columns, position):
+            lookup = 'lt' if descending != reverse else 'gt'
+            condition |= equal & Q(**{f'{column}__{lookup}': value})
+            equal &= Q(**{column: value})
+        first_column, descending = self.ordering_columns[0]
+        bound = Q(**{f"{first_column}__{'lte' if descending != reverse else 'gte'}": position[0]})
+        return bound & condition
+
+    def page_queryset(self, queryset, cursor: Optional[Tuple[list, bool]] = None):
+        """The rows of the page after ``cursor``, plus one to tell if more follow"""
+        reverse = cursor is not None and cursor[1]
+        order_by = [
+            f"{'-' if descending != reverse else ''}{column}" for column, descending in self.ordering_columns
+        ]
+        queryset = queryset.order_by(*order_by)
+        if cursor is not None:
+            queryset = queryset.filter(self._after(cursor[0], reverse))
+        return queryset[:self.page_size + 1]
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.ordering_columns = self.get_ordering(view)
+        cursor = self.decode_cursor(request)
+        reverse = cursor is not None and cursor[1]
+
+        rows = list(self.page_queryset(queryset, cursor))
+        has_more = len(rows) > self.page_size
+        self.page = rows[:self.page_size]
+        if reverse:
+            self.page.reverse()
+
+        # Going forwards there is a next page if a row was left over and a
+        # previous one if we came from a cursor; going backwards it is the reverse
+        has_next = has_more if not reverse else True
+        has_previous = cursor is not None if not reverse else has_more
+        self.next_url = self.encode_cursor(self.page[-1], False) if self.page and has_next else None
+        self.previous_url = self.encode_cursor(self.page[0], True) if self.page and has_previous else None
+        return self.page
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.next_url),
+            ('previous', self.previous_url),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
@@ -0,0 +1,81 @@
+"""
+EXPLAIN QUERY PLAN checks for the hot query paths.
+
+``QueryPlanTestMixin`` lets each app's tests build the querysets its viewsets
+actually run (including the keyset page query) and assert that SQLite reads
+every table through an index. A bare ``SCAN <table>`` is a full table scan
+and fails the assertion; ``SCAN <table> USING INDEX`` walks an index in
+order, stopping at the page limit, and is accepted.
+
+The planner runs without ``ANALYZE`` statistics in tests, so it judges every
+table as large: a plan that is indexed here stays indexed on real data.
+Checks are skipped on other databases, whose EXPLAIN output differs.
+"""
+import re
+import unittest
+from typing import Iterable, List
+
+from django.db import connection
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from .pagination import KeysetPagination
+
+_FULL_SCAN = re.compile(r'^SCAN (\w+)$')
+
+
+def query_plan(queryset) -> List[str]:
+    """The detail column of each EXPLAIN QUERY PLAN row"""
+    return [line.split(' ', 3)[-1] for line in queryset.explain().splitlines()]
+
+
+def full_scans(queryset, allowed_tables: Iterable[str] = ()) -> List[str]:
+    """Plan rows that scan a whole table, other than ``allowed_tables``"""
+    allowed = set(allowed_tables)
+    scans = []
+    for detail in query_plan(queryset):
+        match = _FULL_SCAN.match(detail)
+        if match and match.group(1) not in allowed:
+            scans.append(detail)
+    return scans
+
+
+class QueryPlanTestMixin:
+    """Assertions on the plans of the querysets the viewsets run"""
+
+    @classmethod
+    def setUpClass(cls):
+        if connection.vendor != 'sqlite':
+            raise unittest.SkipTest('Query plan checks read SQLite EXPLAIN QUERY PLAN output')
+        super().setUpClass()
+
+    def view_queryset(self, viewset, user, action='list', params=None, **kwargs):
+        """``viewset.get_queryset()`` as seen by ``user``'s request"""
+        request = APIRequestFactory().get('/', params or {})
+        force_authenticate(request, user=user)
+        view = viewset(action_map={'get': action}, kwargs=kwargs, format_kwarg=None)
+        view.request = view.initialize_request(request)
+        return view.filter_queryset(view.get_queryset()), view
+
+    def page_querysets(self, viewset, user, params=None):
+        """The first page, and the pages after and before the first row, of a paginated list view"""
+        queryset, view = self.view_queryset(viewset, user, params=params)
+        paginator = KeysetPagination()
+        paginator.ordering_columns = paginator.get_ordering(view)
+        row = queryset.order_by(*(
+            f"{'-' if descending else ''}{column}" for column, descending in paginator.ordering_columns
+        )).first()
+        position = [getattr(row, column) for column, _ in paginator.ordering_columns]
+        return [
+            paginator.page_queryset(queryset),
+            paginator.page_queryset(queryset, (position, False)),
+            paginator.page_queryset(queryset, (position, True)),
+        ]
+
+    def assertIndexed(self, queryset, allowed_tables: Iterable[str] = ()):
+        scans = full_scans(queryset, allowed_tables)
+        if scans:
+            self.fail(
+                f"Full table scan in the plan of\n{queryset.query}\n"
+                + '\n'.join(query_plan(queryset))
+            )
@@ -134,6 +134,54 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # OpenAI Settings
 OPENAI_API_KEY = os.environ.get('OPENAI_API_KEY', '')
 
+# Local AI settings
+# Load the local model when the app starts rather than on first use
+MEAL_PLANNER_WARM_UP_MODEL = os.environ.get('MEAL_PLANNER_WARM_UP_MODEL', '') == '1'
+# Address of the shared inference server (`manage.py run_inference_server`),
+# e.g. 'unix:/tmp/meal_planner_inference.sock' or '127.0.0.1:8765'.
+# Leave empty to run inference inside each web worker.
+MEAL_PLANNER_INFERENCE_SERVER = os.environ.get('MEAL_PLANNER_INFERENCE_SERVER', '')
+
+# Asynchronous meal-plan generation (`generate_ai_meal_plan` with async=true).
+# Jobs are stored in the database; RUN_IN_PROCESS starts a worker pool inside
+# the web process, otherwise run `manage.py run_meal_plan_workers`.
+MEAL_PLAN_JOBS = {
+    'CONCURRENCY': int(os.environ.get('MEAL_PLAN_JOB_CONCURRENCY', 2)),
+    'MAX_ATTEMPTS': 3,
+    'RETRY_BACKOFF_SECONDS': 5,
+    'POLL_INTERVAL_SECONDS': 1,
+    'STALE_AFTER_SECONDS': 600,
+    'RUN_IN_PROCESS': os.environ.get('MEAL_PLAN_JOBS_IN_PROCESS', '1') == '1',
+}
+
+# Cache for the rating leaderboards and the locks serialising their updates.
+# With several web processes point them at one shared cache, e.g.
+# MEAL_PLANNER_CACHE_URL=redis://127.0.0.1:6379/0; the default local-memory
+# cache is private to each process.
+MEAL_PLANNER_CACHE_URL = os.environ.get('MEAL_PLANNER_CACHE_URL', '')
+if MEAL_PLANNER_CACHE_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': MEAL_PLANNER_CACHE_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Recipe rating aggregates and the cached top-rated leaderboard.
+# The Bayesian ranking scores (PRIOR_WEIGHT * PRIOR_MEAN + sum) / (PRIOR_WEIGHT + count).
+RECIPE_RATINGS = {
+    'PRIOR_MEAN': 3.0,
+    'PRIOR_WEIGHT': 5,
+    'LEADERBOARD_SIZE': 50,
+    'CACHE_TIMEOUT': 300,
+}
+
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
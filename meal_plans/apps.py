@@ -1,6 +1,15 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class MealPlansConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'meal_plans'
+
+    def ready(self):
+        from . import signals  # noqa: F401 (connects the totals handlers)
+
+        # Optionally pay the model load cost at boot instead of on the first request
+        if getattr(settings, 'MEAL_PLANNER_WARM_UP_MODEL', False):
+            from .model_registry import model_registry
+            model_registry.warm_up()
@@ -0,0 +1,268 @@
+"""
+Shared local inference server.
+
+One daemon process owns the model and answers ``generate_meal_plan`` and
+``suggest_recipe_alternatives`` calls from every web worker over a Unix socket
+or local TCP port, so each worker stays small. Requests go through a bounded
+queue and are answered one at a time by a single thread. Planning is Python
+and NumPy work with no batched model call to share, so the daemon is serial:
+collecting requests into batches would only add queueing delay.
+
+The wire protocol is one JSON object per line in each direction:
+
+    -> {"method": "generate_meal_plan", "params": {"preferences": {...}}}
+    <- {"result": {...}}  or  {"error": "..."}
+
+When ``MEAL_PLANNER_INFERENCE_SERVER`` is unset, or the daemon cannot be
+reached, ``get_meal_planner_service`` falls back to the in-process service.
+"""
+import json
+import logging
+import os
+import queue
+import socket
+import socketserver
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from django.conf import settings
+from recipes.models import Recipe
+from .local_ai_service import LocalAIMealPlannerService
+from .scaling import to_json
+
+logger = logging.getLogger(__name__)
+
+# Recipe fields sent to the daemon for suggest_recipe_alternatives
+RECIPE_FIELDS = ('id', 'title', 'calories_per_serving', 'protein', 'carbs', 'fat', 'dietary_tags')
+
+
+class InferenceError(Exception):
+    """The daemon was reachable but could not answer the request"""
+
+
+class InferenceUnavailable(Exception):
+    """The daemon could not be reached or is shedding load"""
+
+
+def parse_address(address: str) -> Tuple[int, Any]:
+    """Turn ``unix:/path`` or ``host:port`` into a socket family and address"""
+    if address.startswith('unix:'):
+        return socket.AF_UNIX, address[len('unix:'):]
+    host, _, port = address.rpartition(':')
+    return socket.AF_INET, (host or '127.0.0.1', int(port))
+
+
+class _PendingRequest:
+    __slots__ = ('method', 'params', 'result', 'error', 'done')
+
+    def __init__(self, method: str, params: Dict[str, Any]):
+        self.method = method
+        self.params = params
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                message = json.loads(line)
+                response = {'result': self.server.inference.submit(message['method'], message.get('params', {}))}
+            except Exception as e:
+                response = {'error': str(e), 'busy': isinstance(e, InferenceUnavailable)}
+            self.wfile.write(json.dumps(response, default=to_json).encode() + b'\n')
+            self.wfile.flush()
+
+
+class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class _TCPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class InferenceServer:
+    """Serve meal-planner inference to local clients, one request at a time"""
+
+    METHODS = ('generate_meal_plan', 'suggest_recipe_alternatives', 'stats')
+
+    def __init__(self, address: str, service: Optional[LocalAIMealPlannerService] = None,
+                 max_queue: int = 64, request_timeout: float = 60.0):
+        self.address = address
+        self.service = service or LocalAIMealPlannerService()
+        self.request_timeout = request_timeout
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._stopping = threading.Event()
+        self._server = None
+        self._threads = []
+        self._stats_lock = threading.Lock()
+        self._stats = {'requests': 0, 'rejected': 0}
+
+    def start(self):
+        """Bind the socket and start the worker and accept threads"""
+        family, bind_address = parse_address(self.address)
+        if family == socket.AF_UNIX:
+            if os.path.exists(bind_address):
+                os.unlink(bind_address)
+            self._server = _UnixServer(bind_address, _RequestHandler)
+        else:
+            self._server = _TCPServer(bind_address, _RequestHandler)
+        self._server.inference = self
+
+        self._threads = [
+            threading.Thread(target=self._work_loop, name='inference-worker', daemon=True),
+            threading.Thread(target=self._server.serve_forever, name='inference-accept', daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def serve_forever(self):
+        self.start()
+        try:
+            while not self._stopping.wait(1):
+                pass
+        finally:
+            self.stop()
+
+    def stop(self):
+        self._stopping.set()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            family, bind_address = parse_address(self.address)
+            if family == socket.AF_UNIX and os.path.exists(bind_address):
+                os.unlink(bind_address)
+            self._server = None
+
+    def submit(self, method: str, params: Dict[str, Any]) -> Any:
+        """Queue a request and block until it has been answered"""
+        if method not in self.METHODS:
+            raise InferenceError(f"Unknown method: {method}")
+        if method == 'stats':
+            return self.stats()
+
+        pending = _PendingRequest(method, params)
+        try:
+            self._queue.put_nowait(pending)
+        except queue.Full:
+            with self._stats_lock:
+                self._stats['rejected'] += 1
+            raise InferenceUnavailable("Inference queue is full")
+
+        if not pending.done.wait(self.request_timeout):
+            raise InferenceError("Timed out waiting for inference")
+        if pending.error is not None:
+            raise InferenceError(pending.error)
+        return pending.result
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats['queue_depth'] = self._queue.qsize()
+        stats['models'] = self.service.registry.stats()
+        return stats
+
+    def _work_loop(self):
+        while not self._stopping.is_set():
+            try:
+                pending = self._queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            with self._stats_lock:
+                self._stats['requests'] += 1
+            self._run(pending)
+
+    def _run(self, pending: _PendingRequest):
+        """Answer one request on the single model owned by the daemon"""
+        try:
+            if pending.method == 'generate_meal_plan':
+                pending.result = self.service.generate_meal_plan(pending.params['preferences'])
+            else:
+                recipe = Recipe(**pending.params['recipe'])
+                pending.result = self.service.suggest_recipe_alternatives(recipe, pending.params['preferences'])
+        except Exception as e:
+            pending.error = str(e)
+        finally:
+            pending.done.set()
+
+
+class InferenceClient:
+    """Minimal blocking client for ``InferenceServer``"""
+
+    def __init__(self, address: str, timeout: float = 60.0, connect_timeout: float = 1.0):
+        self.address = address
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+
+    def call(self, method: str, **params) -> Any:
+        """Send one request and return its result.
+
+        Raises ``InferenceUnavailable`` when the server cannot be reached, times
+        out, drops the connection or replies with something other than JSON,
+        and ``InferenceError`` when it reports that the request itself failed.
+        """
+        family, address = parse_address(self.address)
+        try:
+            with socket.socket(family, socket.SOCK_STREAM) as sock:
+                sock.settimeout(self.connect_timeout)
+                sock.connect(address)
+                sock.settimeout(self.timeout)
+                sock.sendall(json.dumps({'method': method, 'params': params}).encode() + b'\n')
+                with sock.makefile('rb') as reader:
+                    line = reader.readline()
+            if not line:
+                raise InferenceUnavailable("Inference server closed the connection")
+            response = json.loads(line)
+            if not isinstance(response, dict) or ('result' not in response and 'error' not in response):
+                raise InferenceUnavailable("Invalid reply from inference server")
+        except OSError as e:
+            raise InferenceUnavailable(f"Inference server unavailable: {e}")
+        except ValueError as e:
+            raise InferenceUnavailable(f"Invalid reply from inference server: {e}")
+
+        if 'error' in response:
+            if response.get('busy'):
+                raise InferenceUnavailable(response['error'])
+            raise InferenceError(response['error'])
+        return response['result']
+
+
+class RemoteMealPlannerService(LocalAIMealPlannerService):
+    """Meal planner that sends inference to the shared daemon.
+
+    Database work stays in the calling worker; if the daemon is down or its
+    queue is full the call runs in-process instead.
+    """
+
+    def __init__(self, address: str, **kwargs):
+        super().__init__(**kwargs)
+        self.client = InferenceClient(address)
+
+    def generate_meal_plan(self, preferences: Dict[str, Any]) -> Dict[str, Any]:
+        try:
+            return self.client.call('generate_meal_plan', preferences=preferences)
+        except InferenceUnavailable as e:
+            logger.warning("Falling back to in-process meal plan generation: %s", e)
+            return super().generate_meal_plan(preferences)
+
+    def suggest_recipe_alternatives(self, recipe: Recipe, preferences: Dict[str, Any]) -> List[Dict[str, Any]]:
+        recipe_data = {field: getattr(recipe, field) for field in RECIPE_FIELDS}
+        try:
+            return self.client.call('suggest_recipe_alternatives', recipe=recipe_data, preferences=preferences)
+        except InferenceUnavailable as e:
+            logger.warning("Falling back to in-process recipe alternatives: %s", e)
+            return super().suggest_recipe_alternatives(recipe, preferences)
+
+
+def get_meal_planner_service() -> LocalAIMealPlannerService:
+    """Return the configured meal planner backend"""
+    address = getattr(settings, 'MEAL_PLANNER_INFERENCE_SERVER', '')
+    if address:
+        return RemoteMealPlannerService(address)
+    return LocalAIMealPlannerService()
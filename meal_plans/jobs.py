@@ -0,0 +1,226 @@
+"""
+Database-backed queue for asynchronous meal-plan generation.
+
+Jobs are rows of ``MealPlanJob``; there is no outside broker. A worker claims
+a job with a conditional UPDATE (queued -> running), so any number of threads
+or processes can share the table without handing the same job out twice.
+Failed attempts are retried with exponential backoff until ``max_attempts``.
+
+Workers run either inside the web process (``RUN_IN_PROCESS``, started on the
+first enqueue) or in a dedicated ``manage.py run_meal_plan_workers`` process.
+"""
+import logging
+import threading
+from datetime import timedelta
+from typing import Any, Dict, Optional
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Count, F, Min, Q
+from django.utils import timezone
+
+from .models import MealPlanJob
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_JOB_SETTINGS = {
+    'CONCURRENCY': 2,
+    'MAX_ATTEMPTS': 3,
+    'RETRY_BACKOFF_SECONDS': 5,
+    'POLL_INTERVAL_SECONDS': 1,
+    'STALE_AFTER_SECONDS': 600,
+    'RUN_IN_PROCESS': True,
+}
+
+
+def job_settings() -> Dict[str, Any]:
+    return {**DEFAULT_JOB_SETTINGS, **getattr(settings, 'MEAL_PLAN_JOBS', {})}
+
+
+def enqueue_meal_plan_job(user, preferences: Dict[str, Any]) -> MealPlanJob:
+    """Queue a meal-plan generation and wake the worker pool"""
+    job = MealPlanJob.objects.create(
+        user=user,
+        preferences=preferences,
+        max_attempts=job_settings()['MAX_ATTEMPTS'],
+    )
+    if job_settings()['RUN_IN_PROCESS']:
+        get_worker_pool().start()
+    if _worker_pool is not None:
+        _worker_pool.wake()
+    return job
+
+
+def claim_next_job() -> Optional[MealPlanJob]:
+    """Atomically move the oldest runnable job from queued to running"""
+    while True:
+        now = timezone.now()
+        job_id = MealPlanJob.objects.filter(
+            status=MealPlanJob.STATUS_QUEUED,
+            available_at__lte=now
+        ).order_by('available_at', 'id').values_list('id', flat=True).first()
+        if job_id is None:
+            return None
+
+        claimed = MealPlanJob.objects.filter(
+            pk=job_id,
+            status=MealPlanJob.STATUS_QUEUED
+        ).update(
+            status=MealPlanJob.STATUS_RUNNING,
+            attempts=F('attempts') + 1,
+            started_at=now
+        )
+        if claimed:
+            return MealPlanJob.objects.select_related('user').get(pk=job_id)
+        # Another worker got there first; try the next job
+
+
+def run_job(job: MealPlanJob) -> MealPlanJob:
+    """Generate and store the meal plan for a claimed job"""
+    from .inference import get_meal_planner_service
+
+    try:
+        ai_service = get_meal_planner_service()
+        meal_plan_data = ai_service.generate_meal_plan(job.preferences)
+        meal_plan = ai_service.create_meal_plan_from_ai_response(
+            user=job.user,
+            meal_plan_data=meal_plan_data,
+            preferences=job.preferences
+        )
+    except Exception as e:
+        logger.warning("Meal plan job %s failed (attempt %s): %s", job.pk, job.attempts, e)
+        job.error = str(e)
+        if job.attempts < job.max_attempts:
+            backoff = job_settings()['RETRY_BACKOFF_SECONDS'] * 2 ** (job.attempts - 1)
+            job.status = MealPlanJob.STATUS_QUEUED
+            job.available_at = timezone.now() + timedelta(seconds=backoff)
+        else:
+            job.status = MealPlanJob.STATUS_FAILED
+            job.finished_at = timezone.now()
+        job.save(update_fields=['status', 'error', 'available_at', 'finished_at'])
+        return job
+
+    job.status = MealPlanJob.STATUS_SUCCEEDED
+    job.meal_plan = meal_plan
+    job.error = ''
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'meal_plan', 'error', 'finished_at'])
+    return job
+
+
+def run_pending(limit: Optional[int] = None) -> int:
+    """Run runnable jobs in the calling thread; returns how many were run"""
+    processed = 0
+    while limit is None or processed < limit:
+        job = claim_next_job()
+        if job is None:
+            break
+        run_job(job)
+        processed += 1
+    return processed
+
+
+def requeue_stale_jobs() -> int:
+    """Return jobs whose worker died mid-run to the queue.
+
+    A job that has already used all its attempts is marked failed instead,
+    so a job that keeps killing its worker is not run forever. Returns the
+    number of jobs requeued.
+    """
+    now = timezone.now()
+    cutoff = now - timedelta(seconds=job_settings()['STALE_AFTER_SECONDS'])
+    stale = MealPlanJob.objects.filter(status=MealPlanJob.STATUS_RUNNING, started_at__lt=cutoff)
+    stale.filter(attempts__gte=F('max_attempts')).update(
+        status=MealPlanJob.STATUS_FAILED,
+        error='Worker stopped before the job finished',
+        finished_at=now
+    )
+    return stale.filter(attempts__lt=F('max_attempts')).update(
+        status=MealPlanJob.STATUS_QUEUED,
+        available_at=now
+    )
+
+
+def queue_metrics() -> Dict[str, Any]:
+    """Queue depth and job counts by status, in one query"""
+    now = timezone.now()
+    counts = MealPlanJob.objects.aggregate(
+        queued=Count('id', filter=Q(status=MealPlanJob.STATUS_QUEUED)),
+        runnable=Count('id', filter=Q(status=MealPlanJob.STATUS_QUEUED, available_at__lte=now)),
+        running=Count('id', filter=Q(status=MealPlanJob.STATUS_RUNNING)),
+        succeeded=Count('id', filter=Q(status=MealPlanJob.STATUS_SUCCEEDED)),
+        failed=Count('id', filter=Q(status=MealPlanJob.STATUS_FAILED)),
+        oldest_queued=Min('created_at', filter=Q(status=MealPlanJob.STATUS_QUEUED)),
+    )
+    oldest = counts.pop('oldest_queued')
+    counts['queue_depth'] = counts['queued']
+    counts['oldest_queued_seconds'] = (now - oldest).total_seconds() if oldest else 0
+    counts['workers'] = _worker_pool.concurrency if _worker_pool and _worker_pool.is_running else 0
+    return counts
+
+
+class JobWorkerPool:
+    """A fixed number of threads draining the job table"""
+
+    def __init__(self, concurrency: Optional[int] = None, poll_interval: Optional[float] = None):
+        config = job_settings()
+        self.concurrency = concurrency or config['CONCURRENCY']
+        self.poll_interval = poll_interval or config['POLL_INTERVAL_SECONDS']
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._threads = []
+        self._lock = threading.Lock()
+
+    @property
+    def is_running(self) -> bool:
+        return any(thread.is_alive() for thread in self._threads)
+
+    def start(self):
+        with self._lock:
+            if self.is_running:
+                return self
+            self._stopping.clear()
+            self._threads = [
+                threading.Thread(target=self._work, name=f'meal-plan-worker-{i}', daemon=True)
+                for i in range(self.concurrency)
+            ]
+            for thread in self._threads:
+                thread.start()
+        return self
+
+    def wake(self):
+        self._wakeup.set()
+
+    def stop(self, timeout: Optional[float] = None):
+        self._stopping.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def _work(self):
+        while not self._stopping.is_set():
+            close_old_connections()
+            try:
+                requeue_stale_jobs()
+                job = claim_next_job()
+                if job is not None:
+                    run_job(job)
+                    continue
+            except Exception:
+                logger.exception("Meal plan worker error")
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+        close_old_connections()
+
+
+_worker_pool = None
+_worker_pool_lock = threading.Lock()
+
+
+def get_worker_pool() -> JobWorkerPool:
+    """The worker pool of this process"""
+    global _worker_pool
+    with _worker_pool_lock:
+        if _worker_pool is None:
+            _worker_pool = JobWorkerPool()
+        return _worker_pool
@@ -1,130 +1,163 @@
 import json
-from typing import List, Dict, Any
-import torch
-from transformers import AutoModelForCausalLM, AutoTokenizer
+import random
+from typing import List, Dict, Any, Optional
 from django.conf import settings
 import os
 from pathlib import Path
 from recipes.models import Recipe
-from meal_plans.models import MealPlan, MealPlanDay, MealType, Meal
-from django.utils import timezone
+from meal_plans.models import MealPlan
+from .materialize import materialize_meal_plan
+from .model_registry import DEFAULT_MODEL_NAME, ModelRegistry, model_registry
+from .scaling import ScaledRecipe, scale_ingredient
+from .template_catalog import get_template_catalog
+
+
+# Diet preferences that describe a macro split rather than a recipe tag
+NON_TAG_DIETS = {'balanced'}
+# Days before the solver may repeat a recipe
+DEFAULT_VARIETY_DAYS = 3
+
 
 class LocalAIMealPlannerService:
-    def __init__(self):
+    def __init__(self, registry: Optional[ModelRegistry] = None):
         # Using FLAN-T5-small, a lightweight but capable model
-        self.model_name = "google/flan-t5-small"
-        self.device = "cuda" if torch.cuda.is_available() else "cpu"
-        
-        # Initialize tokenizer and model
-        self.tokenizer = AutoTokenizer.from_pretrained(self.model_name)
-        self.model = AutoModelForCausalLM.from_pretrained(
-            self.model_name,
-            torch_dtype=torch.float32,
-            low_cpu_mem_usage=True
-        ).to(self.device)
-
-        # Load predefined meal templates
-        self.meal_templates = self._load_meal_templates()
-
-    def _load_meal_templates(self) -> Dict[str, List[Dict[str, Any]]]:
-        """Load predefined meal templates from JSON file"""
-        template_path = Path(__file__).parent / 'data' / 'meal_templates.json'
-        if not template_path.exists():
-            self._create_default_templates(template_path)
-        
-        with open(template_path, 'r') as f:
-            return json.load(f)
-
-    def _create_default_templates(self, template_path: Path):
-        """Create default meal templates if none exist"""
-        default_templates = {
-            "vegetarian": [
-                {
-                    "meal_type": "breakfast",
-                    "recipe": {
-                        "title": "Overnight Oats with Berries",
-                        "description": "Healthy and filling breakfast with oats and fresh berries",
-                        "ingredients": [
-                            {"name": "rolled oats", "amount": 50, "unit": "g"},
-                            {"name": "almond milk", "amount": 120, "unit": "ml"},
-                            {"name": "mixed berries", "amount": 100, "unit": "g"},
-                            {"name": "honey", "amount": 15, "unit": "ml"}
-                        ],
-                        "instructions": [
-                            "Mix oats and almond milk in a jar",
-                            "Leave overnight in refrigerator",
-                            "Top with berries and honey before serving"
-                        ],
-                        "calories_per_serving": 350,
-                        "protein": 8,
-                        "carbs": 65,
-                        "fat": 7
-                    }
-                }
-                # Add more templates...
-            ],
-            "keto": [
-                # Add keto meal templates...
-            ],
-            "balanced": [
-                # Add balanced meal templates...
-            ]
-        }
-        
-        template_path.parent.mkdir(exist_ok=True)
-        with open(template_path, 'w') as f:
-            json.dump(default_templates, f, indent=4)
+        self.model_name = DEFAULT_MODEL_NAME
+        self.registry = registry or model_registry
+
+        # Predefined meal templates (indexed once per process)
+        self.catalog = get_template_catalog()
+
+    @property
+    def tokenizer(self):
+        return self.registry.get(self.model_name).tokenizer
+
+    @property
+    def model(self):
+        return self.registry.get(self.model_name).model
+
+    @property
+    def device(self):
+        return self.registry.get(self.model_name).device
+
+    @property
+    def meal_templates(self) -> Dict[str, List[Dict[str, Any]]]:
+        return self.catalog.templates
 
     def _adapt_template_to_preferences(self, template: Dict[str, Any], preferences: Dict[str, Any]) -> Dict[str, Any]:
-        """Adapt a meal template to match user preferences"""
-        adapted = template.copy()
-        recipe = adapted['recipe']
+        """Adapt a meal template to match user preferences.
+
+        The shared template is not copied: the returned recipe is a view that
+        scales amounts and macros as they are read.
+        """
+        recipe = template['recipe']
 
         # Adjust calories
-        target_calories = preferences.get('target_calories', 2000)
-        current_calories = recipe['calories_per_serving']
-        multiplier = target_calories / (current_calories * 3)  # Assuming 3 meals per day
-
-        # Adjust quantities and nutrients
-        for ingredient in recipe['ingredients']:
-            ingredient['amount'] *= multiplier
-        
-        recipe['calories_per_serving'] = int(current_calories * multiplier)
-        recipe['protein'] = int(recipe['protein'] * multiplier)
-        recipe['carbs'] = int(recipe['carbs'] * multiplier)
-        recipe['fat'] = int(recipe['fat'] * multiplier)
-
-        return adapted
-
-    def _select_meal_template(self, meal_type: str, preferences: Dict[str, Any]) -> Dict[str, Any]:
+        multiplier = self._meal_calorie_target(preferences) / recipe['calories_per_serving']
+
+        return {
+            'meal_type': template['meal_type'],
+            'recipe': ScaledRecipe(recipe, multiplier)
+        }
+
+    def _meal_calorie_target(self, preferences: Dict[str, Any]) -> float:
+        return preferences.get('target_calories', 2000) / preferences.get('meals_per_day', 3)
+
+    def _select_meal_template(self, meal_type: str, preferences: Dict[str, Any], rotation: int = 0) -> Dict[str, Any]:
         """Select an appropriate meal template based on preferences"""
         diet_type = preferences.get('dietary_preferences', ['balanced'])[0]
-        templates = self.meal_templates.get(diet_type, self.meal_templates['balanced'])
-        
-        # Filter templates by meal type
-        suitable_templates = [t for t in templates if t['meal_type'] == meal_type]
-        if not suitable_templates:
-            suitable_templates = templates  # Fallback to any template if no specific meal type found
-        
-        # Select a template (could be randomized or based on more criteria)
-        template = suitable_templates[0]
+        template = self.catalog.select(
+            diet_type,
+            meal_type,
+            target_calories=self._meal_calorie_target(preferences),
+            rotation=rotation
+        )
         return self._adapt_template_to_preferences(template, preferences)
 
+    def _generate_from_recipes(self, preferences: Dict[str, Any], meal_types: List[str]) -> Optional[Dict[str, Any]]:
+        """Plan with the solver over the recipe table.
+
+        Returns None when too few recipes match the preferences to honour the
+        variety rule, so the caller can fall back to templates.
+        """
+        # numpy is only needed here, keep it off the startup import path
+        from .recipe_pool import get_recipe_pool
+        from .solver import MealPlanSolver, daily_targets
+
+        diets = preferences.get('dietary_preferences') or ['balanced']
+        variety_days = preferences.get('variety_days', DEFAULT_VARIETY_DAYS)
+
+        pool = get_recipe_pool()
+        candidates = pool.candidate_mask(
+            user_id=preferences.get('user_id'),
+            dietary_tags=[diet for diet in diets if diet not in NON_TAG_DIETS],
+            restrictions=preferences.get('restrictions', [])
+        )
+        candidate_count = int(candidates.sum())
+        if candidate_count < len(meal_types) * (variety_days + 1):
+            return None
+
+        solver = MealPlanSolver(
+            pool.nutrients,
+            daily_targets(preferences.get('target_calories', 2000), diets[0]),
+            meal_types,
+            variety_days=variety_days
+        )
+        result = solver.solve(preferences.get('days', 7), candidates)
+        recipe_ids = pool.ids[result.rows]
+
+        return {
+            "days": [
+                {
+                    "day": day + 1,
+                    "meals": [
+                        {"meal_type": meal_type, "recipe_id": int(recipe_id)}
+                        for meal_type, recipe_id in zip(meal_types, day_recipe_ids)
+                    ]
+                }
+                for day, day_recipe_ids in enumerate(recipe_ids)
+            ],
+            "solver": {
+                "engine": "recipes",
+                "objective": result.objective,
+                "solve_seconds": result.solve_seconds,
+                "candidates": candidate_count
+            }
+        }
+
     def generate_meal_plan(self, preferences: Dict[str, Any]) -> Dict[str, Any]:
-        """Generate a meal plan based on user preferences"""
+        """Generate a meal plan based on user preferences.
+
+        ``engine`` selects where meals come from: ``recipes`` (the solver over
+        the recipe table), ``templates``, or ``auto`` (the default), which uses
+        the recipe table when enough recipes match.
+        """
         try:
             days = preferences.get('days', 7)
             meals_per_day = preferences.get('meals_per_day', 3)
             meal_types = ['breakfast', 'lunch', 'dinner'][:meals_per_day]
 
+            engine = preferences.get('engine', 'auto')
+            if engine in ('auto', 'recipes'):
+                meal_plan_data = self._generate_from_recipes(preferences, meal_types)
+                if meal_plan_data is not None:
+                    return meal_plan_data
+                if engine == 'recipes':
+                    raise ValueError("Not enough recipes match the preferences")
+
+            # Rotate through the suitable templates from a random (or seeded)
+            # starting point so consecutive days differ
+            rng = random.Random(preferences.get('seed'))
+            offsets = {meal_type: rng.randrange(1 << 30) for meal_type in meal_types}
+
             meal_plan_data = {
-                "days": []
+                "days": [],
+                "solver": {"engine": "templates"}
             }
 
             for day in range(days):
                 day_meals = []
                 for meal_type in meal_types:
-                    meal = self._select_meal_template(meal_type, preferences)
+                    meal = self._select_meal_template(meal_type, preferences, rotation=offsets[meal_type] + day)
                     day_meals.append(meal)
 
                 meal_plan_data["days"].append({
@@ -140,71 +173,35 @@ class LocalAIMealPlannerService:
     def create_meal_plan_from_ai_response(self, user, meal_plan_data: Dict[str, Any], preferences: Dict[str, Any]) -> MealPlan:
         """Create a MealPlan instance from generated data"""
         try:
-            # Create the meal plan
-            meal_plan = MealPlan.objects.create(
-                user=user,
+            return materialize_meal_plan(
+                user,
+                meal_plan_data,
                 name=f"AI Generated Plan - {preferences.get('dietary_preferences', ['Custom'])[0]}",
-                caloric_target=preferences.get('target_calories', 2000)
+                caloric_target=preferences.get('target_calories', 2000),
+                start_date=preferences.get('start_date')
             )
-
-            # Get or create meal types
-            meal_types = {
-                'breakfast': MealType.objects.get_or_create(name='Breakfast')[0],
-                'lunch': MealType.objects.get_or_create(name='Lunch')[0],
-                'dinner': MealType.objects.get_or_create(name='Dinner')[0]
-            }
-
-            # Create days and meals
-            for day_data in meal_plan_data['days']:
-                day = MealPlanDay.objects.create(
-                    meal_plan=meal_plan,
-                    date=meal_plan.start_date + timezone.timedelta(days=day_data['day'] - 1)
-                )
-
-                for meal_data in day_data['meals']:
-                    recipe_data = meal_data['recipe']
-                    recipe = Recipe.objects.create(
-                        title=recipe_data['title'],
-                        description=recipe_data['description'],
-                        ingredients=recipe_data['ingredients'],
-                        instructions=recipe_data['instructions'],
-                        calories_per_serving=recipe_data['calories_per_serving'],
-                        protein=recipe_data['protein'],
-                        carbs=recipe_data['carbs'],
-                        fat=recipe_data['fat'],
-                        created_by=user
-                    )
-
-                    Meal.objects.create(
-                        day=day,
-                        meal_type=meal_types[meal_data['meal_type']],
-                        recipe=recipe,
-                        servings=1
-                    )
-
-            return meal_plan
-
         except Exception as e:
-            if 'meal_plan' in locals():
-                meal_plan.delete()
             raise Exception(f"Failed to create meal plan: {str(e)}")
 
     def suggest_recipe_alternatives(self, recipe: Recipe, preferences: Dict[str, Any]) -> List[Dict[str, Any]]:
-        """Suggest alternative recipes based on user preferences"""
+        """Suggest the recipes and templates closest to a recipe by macros.
+
+        Recipes must be visible to ``user_id`` and carry the preferred diets'
+        tags; neither may contain a restricted ingredient.
+        """
+        # numpy is only needed here, keep it off the startup import path
+        from .alternatives import recipe_alternatives
+
         try:
-            diet_type = preferences.get('dietary_preferences', ['balanced'])[0]
-            templates = self.meal_templates.get(diet_type, self.meal_templates['balanced'])
-            
-            # Find similar recipes based on calories and macros
-            alternatives = []
-            for template in templates:
-                recipe_data = template['recipe']
-                if abs(recipe_data['calories_per_serving'] - recipe.calories_per_serving) <= 100:
-                    alternatives.append(recipe_data)
-                if len(alternatives) >= 3:
-                    break
-
-            return alternatives[:3]
+            diets = preferences.get('dietary_preferences') or ['balanced']
+            return recipe_alternatives(
+                recipe,
+                k=preferences.get('count', 3),
+                user_id=preferences.get('user_id'),
+                dietary_tags=[diet for diet in diets if diet not in NON_TAG_DIETS],
+                diet=diets[0],
+                restrictions=preferences.get('restrictions', [])
+            )
 
         except Exception as e:
             raise Exception(f"Failed to generate recipe alternatives: {str(e)}")
@@ -219,11 +216,10 @@ class LocalAIMealPlannerService:
                 'title': recipe.title,
                 'description': recipe.description,
                 'ingredients': [
-                    {
-                        'name': ingredient['name'],
-                        'amount': ingredient['amount'] * multiplier,
-                        'unit': ingredient['unit']
-                    }
+                    scale_ingredient(
+                        {'name': ingredient['name'], 'amount': ingredient['amount'], 'unit': ingredient['unit']},
+                        multiplier
+                    )
                     for ingredient in recipe.ingredients
                 ],
                 'instructions': recipe.instructions,
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from meal_plans.models import MealPlan, MealPlanDay
+from meal_plans.totals import meal_plan_drift, refresh_totals
+
+
+class Command(BaseCommand):
+    help = 'Verify the stored nutrition totals of meal plans and their days, and rebuild them'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true',
+                            help='Only report out-of-date totals; exit with an error if any are found')
+        parser.add_argument('--meal-plan', type=int, action='append', dest='meal_plans',
+                            help='Limit to this meal plan id (may be repeated)')
+
+    def handle(self, *args, **options):
+        meal_plans = options['meal_plans']
+        drift = meal_plan_drift(meal_plans)
+        for label, rows in drift.items():
+            for pk, field, stored, expected in rows:
+                self.stdout.write(f"{label} {pk}: {field} is {stored}, expected {expected}")
+        stale = sum(len(rows) for rows in drift.values())
+
+        if options['check']:
+            if stale:
+                raise CommandError(f"{stale} stored totals are out of date")
+            self.stdout.write(self.style.SUCCESS("All stored totals are up to date"))
+            return
+
+        days = MealPlanDay.objects.all()
+        plans = MealPlan.objects.all()
+        if meal_plans is not None:
+            days = days.filter(meal_plan__in=meal_plans)
+            plans = plans.filter(pk__in=meal_plans)
+        with transaction.atomic():
+            refresh_totals(days, plans)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt totals ({stale} were out of date)"))
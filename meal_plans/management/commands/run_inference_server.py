@@ -0,0 +1,31 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from meal_plans.inference import InferenceServer
+
+
+class Command(BaseCommand):
+    help = 'Run the shared local inference server used by all web workers'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--address',
+            default=getattr(settings, 'MEAL_PLANNER_INFERENCE_SERVER', '') or 'unix:/tmp/meal_planner_inference.sock',
+            help='unix:/path/to/socket or host:port'
+        )
+        parser.add_argument('--max-queue', type=int, default=64)
+        parser.add_argument('--no-warm-up', action='store_true', help='Load the model on first request instead of at startup')
+
+    def handle(self, *args, **options):
+        server = InferenceServer(
+            options['address'],
+            max_queue=options['max_queue'],
+        )
+        if not options['no_warm_up']:
+            server.service.registry.warm_up(server.service.model_name)
+
+        self.stdout.write(f"Inference server listening on {options['address']}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
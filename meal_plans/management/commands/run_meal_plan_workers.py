@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from meal_plans.jobs import JobWorkerPool, queue_metrics
+
+
+class Command(BaseCommand):
+    help = 'Run a pool of workers processing queued meal-plan generation jobs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=None)
+        parser.add_argument('--poll-interval', type=float, default=None)
+
+    def handle(self, *args, **options):
+        pool = JobWorkerPool(
+            concurrency=options['concurrency'],
+            poll_interval=options['poll_interval'],
+        ).start()
+        self.stdout.write(f"Started {pool.concurrency} meal plan workers")
+        try:
+            while True:
+                time.sleep(60)
+                self.stdout.write(f"Queue: {queue_metrics()}")
+        except KeyboardInterrupt:
+            pool.stop(timeout=30)
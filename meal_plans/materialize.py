@@ -0,0 +1,192 @@
+"""
+Turn generated meal-plan data into database rows.
+
+Shared by the local and OpenAI planner services. The whole plan is written in
+one transaction with a fixed number of statements (one bulk INSERT each for
+days, recipes and meals, then one UPDATE each for the day and plan totals),
+whatever the plan length, so a failure leaves nothing behind.
+
+Generated recipes are content-addressed: a recipe identical to, or a near
+duplicate of, one the user already owns (or one earlier in the same plan) is
+reused instead of inserted again.
+"""
+from datetime import timedelta
+from typing import Any, Dict, Iterable, List, Optional
+
+from django.db import transaction
+from django.utils import timezone
+
+from recipes.changes import bump_recipe_version
+from recipes.dedup import NearDuplicateIndex
+from recipes.models import Recipe
+from recipes.ingredients import sync_recipe_ingredients
+from recipes.search import index_recipes
+from recipes.tags import set_dietary_masks
+from .models import MealPlan, MealPlanDay, MealType, Meal
+from .totals import refresh_meal_plan_totals
+
+# Display name and order of the meal types a generator may emit
+MEAL_TYPES = {
+    'breakfast': ('Breakfast', 1),
+    'lunch': ('Lunch', 2),
+    'dinner': ('Dinner', 3),
+    'snack': ('Snack', 4),
+}
+
+
+def _format_instructions(instructions) -> str:
+    if isinstance(instructions, (list, tuple)):
+        return '\n'.join(str(step) for step in instructions)
+    return instructions or ''
+
+
+def get_meal_types(keys: Iterable[str]) -> Dict[str, MealType]:
+    """Fetch (creating if needed) the meal types for the given keys in bulk"""
+    names = {key: MEAL_TYPES.get(key, (key.title(), 0)) for key in keys}
+    by_name = {mt.name: mt for mt in MealType.objects.filter(name__in=[n for n, _ in names.values()])}
+
+    missing = [MealType(name=name, display_order=order) for name, order in names.values() if name not in by_name]
+    if missing:
+        MealType.objects.bulk_create(missing, ignore_conflicts=True)
+        by_name.update(
+            (mt.name, mt) for mt in MealType.objects.filter(name__in=[mt.name for mt in missing])
+        )
+
+    return {key: by_name[name] for key, (name, _) in names.items()}
+
+
+def build_recipe(user, recipe_data: Dict[str, Any]) -> Recipe:
+    """Build an unsaved Recipe from generated recipe data"""
+    return Recipe(
+        title=recipe_data['title'],
+        description=recipe_data.get('description', ''),
+        ingredients=list(recipe_data.get('ingredients', [])),
+        instructions=_format_instructions(recipe_data.get('instructions')),
+        prep_time=recipe_data.get('prep_time', 0),
+        cook_time=recipe_data.get('cook_time', 0),
+        servings=recipe_data.get('servings', 1),
+        calories_per_serving=recipe_data['calories_per_serving'],
+        protein=recipe_data['protein'],
+        carbs=recipe_data['carbs'],
+        fat=recipe_data['fat'],
+        dietary_tags=list(recipe_data.get('dietary_tags', [])),
+        created_by=user
+    )
+
+
+class _RecipePool:
+    """Near-duplicate lookup over a user's recipes plus those added in this plan"""
+
+    def __init__(self, user):
+        self.index = NearDuplicateIndex()
+        self.recipes = []
+        for recipe in Recipe.objects.filter(created_by=user).only(
+            'id', 'ingredient_signature', 'calories_per_serving', 'protein', 'carbs', 'fat'
+        ):
+            self.add(recipe)
+
+    def add(self, recipe: Recipe):
+        # Index by position: unsaved recipes have no pk to key on yet
+        self.index.add(len(self.recipes), recipe.ingredient_signature, recipe.macros)
+        self.recipes.append(recipe)
+
+    def find(self, recipe: Recipe) -> Optional[Recipe]:
+        position = self.index.find(recipe.ingredient_signature, recipe.macros)
+        return None if position is None else self.recipes[position]
+
+
+def resolve_recipes(user, recipes: List[Recipe]) -> List[Recipe]:
+    """Replace each unsaved recipe by an existing equivalent, saving only new ones.
+
+    Returns a list parallel to ``recipes`` whose items all have a primary key.
+    """
+    for recipe in recipes:
+        recipe.update_fingerprint()
+
+    by_hash = {}
+    existing = Recipe.objects.filter(
+        created_by=user,
+        content_hash__in={recipe.content_hash for recipe in recipes}
+    ).only('id', 'content_hash').order_by('id')
+    for recipe in existing:
+        by_hash.setdefault(recipe.content_hash, recipe)
+
+    pool = None
+    new_recipes = []
+    resolved = []
+    for recipe in recipes:
+        match = by_hash.get(recipe.content_hash)
+        if match is None:
+            if pool is None:
+                pool = _RecipePool(user)
+            match = pool.find(recipe)
+        if match is None:
+            match = recipe
+            new_recipes.append(recipe)
+            pool.add(recipe)
+        by_hash[recipe.content_hash] = match
+        resolved.append(match)
+
+    set_dietary_masks(new_recipes)
+    Recipe.objects.bulk_create(new_recipes)
+    # bulk_create sends no post_save, so index the new recipes here
+    index_recipes(new_recipes)
+    sync_recipe_ingredients(new_recipes)
+    if new_recipes:
+        bump_recipe_version()
+    return resolved
+
+
+@transaction.atomic
+def materialize_meal_plan(user, meal_plan_data: Dict[str, Any], name: str,
+                          caloric_target: Optional[int] = None, start_date=None) -> MealPlan:
+    """Create a MealPlan with its days, recipes and meals in one transaction"""
+    days_data = meal_plan_data['days']
+    start_date = start_date or timezone.now().date()
+    day_numbers = [day_data['day'] for day_data in days_data] or [1]
+
+    meal_plan = MealPlan.objects.create(
+        user=user,
+        name=name,
+        start_date=start_date,
+        end_date=start_date + timedelta(days=max(day_numbers) - 1),
+        caloric_target=caloric_target
+    )
+
+    meal_types = get_meal_types({
+        meal_data['meal_type'].lower()
+        for day_data in days_data
+        for meal_data in day_data['meals']
+    })
+
+    days = MealPlanDay.objects.bulk_create([
+        MealPlanDay(meal_plan=meal_plan, date=start_date + timedelta(days=day_data['day'] - 1))
+        for day_data in days_data
+    ])
+
+    meal_rows = [
+        (day, meal_data)
+        for day, day_data in zip(days, days_data)
+        for meal_data in day_data['meals']
+    ]
+    # Meals chosen from the recipe table reference a recipe_id; generated
+    # ones carry the recipe itself
+    recipes = iter(resolve_recipes(user, [
+        build_recipe(user, meal_data['recipe'])
+        for _, meal_data in meal_rows
+        if 'recipe_id' not in meal_data
+    ]))
+
+    Meal.objects.bulk_create([
+        Meal(
+            day=day,
+            meal_type=meal_types[meal_data['meal_type'].lower()],
+            recipe_id=meal_data['recipe_id'] if 'recipe_id' in meal_data else next(recipes).pk,
+            servings=meal_data.get('servings', 1)
+        )
+        for day, meal_data in meal_rows
+    ])
+    # bulk_create sends no signals, so set the stored totals here
+    refresh_meal_plan_totals(meal_plan)
+
+    return meal_plan
@@ -0,0 +1,63 @@
+# Generated by Django 5.0 on 2026-10-18 07:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('meal_plans', '0002_meal_plan_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mealplan',
+            name='meal_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='mealplan',
+            name='total_calories',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='mealplan',
+            name='total_carbs',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='mealplan',
+            name='total_fat',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='mealplan',
+            name='total_protein',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='mealplanday',
+            name='meal_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='mealplanday',
+            name='total_calories',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='mealplanday',
+            name='total_carbs',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='mealplanday',
+            name='total_fat',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='mealplanday',
+            name='total_protein',
+            field=models.FloatField(default=0),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.0 on 2026-10-18 07:45
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('meal_plans', '0003_meal_plan_totals'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='mealplan',
+            index=models.Index(fields=['user', '-start_date', '-id'], name='mealplan_user_start_idx'),
+        ),
+    ]
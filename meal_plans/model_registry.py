@@ -0,0 +1,101 @@
+"""
+Process-wide registry of local language models.
+
+Nothing in this module imports torch or transformers at import time; they are
+pulled in by the first ``ModelRegistry.get`` call that needs to load a model.
+"""
+import threading
+import time
+from collections import namedtuple
+from typing import Any, Callable, Dict, Optional
+from django.utils import timezone
+
+DEFAULT_MODEL_NAME = "google/flan-t5-small"
+
+LoadedModel = namedtuple('LoadedModel', ['tokenizer', 'model', 'device'])
+
+
+def _load_model(model_name: str) -> LoadedModel:
+    """Load a tokenizer and model from the Hugging Face cache"""
+    # torch and transformers cost seconds and hundreds of MB to import, so
+    # they are only imported once a model is actually needed
+    import torch
+    from transformers import AutoModelForCausalLM, AutoTokenizer
+
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModelForCausalLM.from_pretrained(
+        model_name,
+        torch_dtype=torch.float32,
+        low_cpu_mem_usage=True
+    ).to(device)
+    return LoadedModel(tokenizer, model, device)
+
+
+def _model_memory_bytes(model) -> int:
+    """Approximate resident size of a model's parameters and buffers"""
+    tensors = []
+    for attr in ('parameters', 'buffers'):
+        if hasattr(model, attr):
+            tensors.extend(getattr(model, attr)())
+    return sum(t.numel() * t.element_size() for t in tensors)
+
+
+class ModelRegistry:
+    """Process-wide cache holding one tokenizer/model pair per model name.
+
+    Models are loaded on first use (or via ``warm_up``) and shared by every
+    service instance in the process.
+    """
+
+    def __init__(self, loader: Optional[Callable[[str], LoadedModel]] = None):
+        self._loader = loader or _load_model
+        self._lock = threading.Lock()
+        self._models = {}
+        self._stats = {}
+
+    def get(self, model_name: str = DEFAULT_MODEL_NAME) -> LoadedModel:
+        """Return the loaded model, loading it if this process has not yet"""
+        loaded = self._models.get(model_name)
+        if loaded is not None:
+            with self._lock:
+                self._stats[model_name]['hits'] += 1
+            return loaded
+
+        with self._lock:
+            loaded = self._models.get(model_name)
+            if loaded is None:
+                started = time.perf_counter()
+                loaded = self._loader(model_name)
+                self._models[model_name] = loaded
+                self._stats[model_name] = {
+                    'load_seconds': time.perf_counter() - started,
+                    'memory_bytes': _model_memory_bytes(loaded.model),
+                    'device': loaded.device,
+                    'loaded_at': timezone.now().isoformat(),
+                    'hits': 0,
+                }
+            else:
+                self._stats[model_name]['hits'] += 1
+            return loaded
+
+    def warm_up(self, model_name: str = DEFAULT_MODEL_NAME) -> LoadedModel:
+        """Load a model ahead of the first request that needs it"""
+        return self.get(model_name)
+
+    def is_loaded(self, model_name: str = DEFAULT_MODEL_NAME) -> bool:
+        return model_name in self._models
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Load time, memory use and hit counters for every loaded model"""
+        with self._lock:
+            return {name: dict(stats) for name, stats in self._stats.items()}
+
+    def clear(self):
+        """Drop all loaded models (mainly for tests)"""
+        with self._lock:
+            self._models.clear()
+            self._stats.clear()
+
+
+model_registry = ModelRegistry()
@@ -1,11 +1,13 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
 from recipes.models import Recipe
 
 # Create your models here.
 
 class MealPlan(models.Model):
-    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    # Indexed by mealplan_user_start_idx
+    user = models.ForeignKey(User, on_delete=models.CASCADE, db_index=False)
     name = models.CharField(max_length=200)
     start_date = models.DateField()
     end_date = models.DateField()
@@ -14,17 +16,33 @@ class MealPlan(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     is_template = models.BooleanField(default=False)
     caloric_target = models.PositiveIntegerField(null=True, blank=True)
+    # Nutrition of the meals of all its days, maintained by meal_plans.signals
+    total_calories = models.IntegerField(default=0)
+    total_protein = models.FloatField(default=0)
+    total_carbs = models.FloatField(default=0)
+    total_fat = models.FloatField(default=0)
+    meal_count = models.PositiveIntegerField(default=0)
 
     def __str__(self):
         return f"{self.name} ({self.start_date} to {self.end_date})"
 
     class Meta:
         ordering = ['-start_date']
+        indexes = [
+            # Keyset pagination of a user's plans, see meal_planner_project.pagination
+            models.Index(fields=['user', '-start_date', '-id'], name='mealplan_user_start_idx'),
+        ]
 
 class MealPlanDay(models.Model):
     meal_plan = models.ForeignKey(MealPlan, on_delete=models.CASCADE, related_name='days')
     date = models.DateField()
     notes = models.TextField(blank=True)
+    # Nutrition of the day's meals, maintained by meal_plans.signals
+    total_calories = models.IntegerField(default=0)
+    total_protein = models.FloatField(default=0)
+    total_carbs = models.FloatField(default=0)
+    total_fat = models.FloatField(default=0)
+    meal_count = models.PositiveIntegerField(default=0)
 
     def __str__(self):
         return f"Day {self.date} of {self.meal_plan.name}"
@@ -66,3 +84,37 @@ class Meal(models.Model):
             'carbs': self.recipe.carbs * self.servings,
             'fat': self.recipe.fat * self.servings
         }
+
+class MealPlanJob(models.Model):
+    """A queued meal-plan generation, run by the local worker pool"""
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_SUCCEEDED = 'succeeded'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, 'Queued'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_SUCCEEDED, 'Succeeded'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='meal_plan_jobs')
+    preferences = models.JSONField(default=dict)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    meal_plan = models.ForeignKey(MealPlan, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    error = models.TextField(blank=True)
+    available_at = models.DateTimeField(default=timezone.now, help_text="Earliest time the job may (re)run")
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Meal plan job {self.pk} ({self.status})"
+
+    class Meta:
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['status', 'available_at'], name='mealplanjob_claim_idx'),
+        ]
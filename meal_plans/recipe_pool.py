@@ -0,0 +1,196 @@
+"""
+Per-recipe nutrient arrays for the meal-plan solver.
+
+The pool holds every recipe's id, owner, visibility, macros and dietary tag
+bitmask (``Recipe.dietary_mask``, see ``recipes.tags``) as NumPy arrays, plus
+an ingredient lookup, so filtering and scoring candidates never touches ORM
+objects; a tag filter is one vectorised AND over the mask column.
+
+It is built once per process and checked against the recipe table version
+in the cache (``recipes.changes``), so an unchanged table costs no query.
+When the version moves, one aggregate query (row count and latest
+``updated_at``) tells what changed; the pool then loads only the rows saved
+since it was built and merges them into a new pool. A full reload happens
+only when recipes were deleted.
+"""
+import threading
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+from django.db.models import Count, Max
+
+from recipes.changes import recipe_version
+from recipes.models import Recipe
+from recipes.tags import normalise_tag, tag_vocabulary
+
+NUTRIENTS = ('calories_per_serving', 'protein', 'carbs', 'fat')
+FIELDS = ('id', 'created_by_id', 'is_public', *NUTRIENTS, 'dietary_mask', 'ingredients')
+
+
+def _columns(queryset):
+    """The pool columns of the recipes of ``queryset``, in id order"""
+    ids, owners, public, nutrients, masks, ingredients = [], [], [], [], [], []
+    for row in queryset.order_by('id').values_list(*FIELDS):
+        ids.append(row[0])
+        owners.append(row[1] or -1)
+        public.append(row[2])
+        nutrients.append(row[3:3 + len(NUTRIENTS)])
+        masks.append(row[-2])
+        ingredients.append(tuple(
+            str(i.get('name', '')).strip().lower() for i in row[-1] or [] if isinstance(i, dict)
+        ))
+    return ids, owners, public, nutrients, masks, ingredients
+
+
+class RecipePool:
+    """Column arrays of recipe nutrients with tag and ingredient filters
+
+    ``dietary_masks`` holds each recipe's tag bits and ``tag_bits`` maps tag
+    names to their bit values (``recipes.tags.tag_vocabulary``). Rows are in
+    ``ids`` order.
+    """
+
+    def __init__(self, ids, owners, public, nutrients, dietary_masks, ingredients, tag_bits=None, version=None):
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.owners = np.asarray(owners, dtype=np.int64)
+        self.public = np.asarray(public, dtype=bool)
+        # One row per recipe: calories, protein, carbs, fat
+        self.nutrients = np.asarray(nutrients, dtype=np.float64).reshape(len(self.ids), len(NUTRIENTS))
+        self.dietary_masks = np.asarray(dietary_masks, dtype=np.int64)
+        # Lower-cased ingredient names of each row
+        self.ingredients = [tuple(str(name).strip().lower() for name in names) for names in ingredients]
+        self.tag_bits = dict(tag_bits or {})
+        self.version = version
+        # recipes.changes token the pool was last checked against
+        self.token = None
+        self._ingredient_rows = None
+
+    def __len__(self):
+        return len(self.ids)
+
+    def rows_of(self, recipe_ids) -> np.ndarray:
+        """Rows of the given recipe ids; ids not in the pool are dropped"""
+        recipe_ids = np.asarray(recipe_ids, dtype=np.int64)
+        rows = np.minimum(np.searchsorted(self.ids, recipe_ids), max(len(self) - 1, 0))
+        return rows[self.ids[rows] == recipe_ids] if len(self) else rows[:0]
+
+    @property
+    def ingredient_rows(self) -> Dict[str, np.ndarray]:
+        """``{ingredient name: rows}``, built on first use"""
+        if self._ingredient_rows is None:
+            rows = {}
+            for row, names in enumerate(self.ingredients):
+                for name in names:
+                    rows.setdefault(name, []).append(row)
+            self._ingredient_rows = {name: np.asarray(indexes, dtype=np.int64) for name, indexes in rows.items()}
+        return self._ingredient_rows
+
+    @classmethod
+    def from_database(cls, version=None) -> 'RecipePool':
+        return cls(*_columns(Recipe.objects.all()), tag_vocabulary(), version=version)
+
+    def updated(self, version) -> Optional['RecipePool']:
+        """A new pool with the recipes saved since this one was built merged in.
+
+        Returns None when that cannot account for the table (recipes were
+        deleted, or this pool has no version to diff from).
+        """
+        if self.version is None or self.version[1] is None:
+            return None
+        # >= rather than >: rows saved in the same instant as the last build
+        # may not have been visible to it; merging them again is harmless
+        ids, owners, public, nutrients, masks, ingredients = _columns(
+            Recipe.objects.filter(updated_at__gte=self.version[1])
+        )
+        ids = np.asarray(ids, dtype=np.int64)
+        positions = np.searchsorted(self.ids, ids)
+        existing = positions < len(self)
+        existing[existing] = self.ids[positions[existing]] == ids[existing]
+        added = ~existing
+        if len(self) + int(added.sum()) != version[0]:
+            return None
+
+        def merge(column, values, dtype):
+            values = np.asarray(values, dtype=dtype).reshape((len(ids),) + column.shape[1:])
+            merged = column.copy()
+            merged[positions[existing]] = values[existing]
+            return np.concatenate([merged, values[added]])
+
+        merged_ingredients: List[tuple] = list(self.ingredients)
+        for position, names in zip(positions[existing], (n for n, e in zip(ingredients, existing) if e)):
+            merged_ingredients[position] = names
+        merged_ingredients.extend(n for n, a in zip(ingredients, added) if a)
+
+        pool = RecipePool(
+            merge(self.ids, ids, np.int64),
+            merge(self.owners, owners, np.int64),
+            merge(self.public, public, bool),
+            merge(self.nutrients, nutrients, np.float64),
+            merge(self.dietary_masks, masks, np.int64),
+            merged_ingredients,
+            tag_vocabulary(),
+            version=version,
+        )
+        if len(pool) > 1 and np.any(pool.ids[1:] < pool.ids[:-1]):
+            # New ids normally sort after the existing ones; restore id order if not
+            order = np.argsort(pool.ids, kind='stable')
+            pool = RecipePool(
+                pool.ids[order], pool.owners[order], pool.public[order], pool.nutrients[order],
+                pool.dietary_masks[order], [pool.ingredients[row] for row in order], pool.tag_bits,
+                version=version,
+            )
+        return pool
+
+    def candidate_mask(self, user_id: Optional[int] = None, dietary_tags: Iterable[str] = (),
+                       restrictions: Iterable[str] = ()) -> np.ndarray:
+        """Rows visible to the user, carrying every tag and no restricted ingredient"""
+        mask = self.public.copy()
+        if user_id is not None:
+            mask |= self.owners == user_id
+
+        required = 0
+        for tag in dietary_tags:
+            bit = self.tag_bits.get(normalise_tag(tag))
+            if bit is None:
+                # Nobody uses the tag, so no recipe carries it
+                return np.zeros(len(self), dtype=bool)
+            required |= bit
+        if required:
+            mask &= (self.dietary_masks & required) == required
+
+        for restriction in restrictions:
+            restriction = str(restriction).strip().lower()
+            if not restriction:
+                continue
+            for name, rows in self.ingredient_rows.items():
+                if restriction in name:
+                    mask[rows] = False
+        return mask
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _table_version():
+    return tuple(Recipe.objects.aggregate(count=Count('id'), changed=Max('updated_at')).values())
+
+
+def get_recipe_pool() -> RecipePool:
+    """The process-wide pool, updated if recipes were added or changed and rebuilt if any were removed"""
+    global _pool
+    # Read before the table, so a change made while loading moves it again
+    token = recipe_version()
+    if _pool is not None and _pool.token == token:
+        return _pool
+    with _pool_lock:
+        if _pool is None or _pool.token != token:
+            version = _table_version()
+            if _pool is not None and _pool.version == version:
+                pool = _pool
+            else:
+                pool = _pool.updated(version) if _pool is not None else None
+                pool = pool if pool is not None else RecipePool.from_database(version)
+            pool.token = token
+            _pool = pool
+        return _pool
@@ -0,0 +1,76 @@
+"""
+Copy-free scaling of shared meal templates.
+
+Catalog templates are frozen and shared by every request in the process.
+Instead of copying a template to scale it, a ``ScaledRecipe`` keeps a
+reference to the template and a multiplier and computes scaled amounts and
+macros when they are read. It behaves as a read-only mapping with the same
+keys as the template, and only builds a plain dict in ``to_dict``.
+"""
+from collections.abc import Mapping
+from types import MappingProxyType
+from typing import Any, Dict, Iterator
+
+from recipes import units
+
+SCALED_MACROS = ('calories_per_serving', 'protein', 'carbs', 'fat')
+
+
+def freeze(value):
+    """Recursively turn dicts into read-only mappings and lists into tuples"""
+    if isinstance(value, dict):
+        return MappingProxyType({key: freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(freeze(item) for item in value)
+    return value
+
+
+def thaw(value):
+    """Inverse of ``freeze``: plain dicts and lists, safe to mutate or serialise"""
+    if isinstance(value, Mapping):
+        return {key: thaw(item) for key, item in value.items()}
+    if isinstance(value, tuple):
+        return [thaw(item) for item in value]
+    return value
+
+
+def scale_ingredient(ingredient: Mapping, multiplier: float) -> Dict[str, Any]:
+    """A plain copy of an ingredient at ``multiplier`` times its amount, in a readable unit"""
+    return units.scale_ingredient(thaw(ingredient), multiplier)
+
+
+class ScaledRecipe(Mapping):
+    """A template recipe viewed at ``multiplier`` times its size"""
+    __slots__ = ('template', 'multiplier')
+
+    def __init__(self, template: Mapping, multiplier: float = 1.0):
+        self.template = template
+        self.multiplier = multiplier
+
+    def __getitem__(self, key: str) -> Any:
+        if key == 'ingredients':
+            return [scale_ingredient(ingredient, self.multiplier) for ingredient in self.template['ingredients']]
+        if key in SCALED_MACROS:
+            return int(self.template[key] * self.multiplier)
+        return thaw(self.template[key])
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.template)
+
+    def __len__(self) -> int:
+        return len(self.template)
+
+    def __repr__(self):
+        return f"<ScaledRecipe {self.template.get('title')!r} x{self.multiplier:.3g}>"
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {key: self[key] for key in self.template}
+
+
+def to_json(value):
+    """``json.dumps`` default hook for generated plans containing scaled recipes"""
+    if isinstance(value, ScaledRecipe):
+        return value.to_dict()
+    if isinstance(value, Mapping):
+        return dict(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
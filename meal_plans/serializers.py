@@ -1,21 +1,29 @@
 from rest_framework import serializers
-from .models import MealPlan, MealPlanDay, MealType, Meal
+from .models import MealPlan, MealPlanDay, MealType, Meal, MealPlanJob
+from meal_planner_project.fieldsets import Expandable, ExpandableFieldsMixin
 from recipes.serializers import RecipeSerializer
 from recipes.models import Recipe
+from .totals import TOTAL_FIELDS
 
 class MealTypeSerializer(serializers.ModelSerializer):
     class Meta:
         model = MealType
         fields = '__all__'
 
-class MealSerializer(serializers.ModelSerializer):
-    recipe = RecipeSerializer(read_only=True)
+class MealSerializer(ExpandableFieldsMixin, serializers.ModelSerializer):
+    expandable_fields = {
+        'recipe': Expandable(RecipeSerializer),
+        'meal_type': Expandable(MealTypeSerializer),
+    }
+    field_relations = {
+        'calories': ('recipe',),
+        'nutrients': ('recipe',),
+    }
     recipe_id = serializers.PrimaryKeyRelatedField(
         write_only=True,
         source='recipe',
         queryset=Recipe.objects.all()
     )
-    meal_type = MealTypeSerializer(read_only=True)
     meal_type_id = serializers.PrimaryKeyRelatedField(
         write_only=True,
         source='meal_type',
@@ -34,30 +42,45 @@ class MealSerializer(serializers.ModelSerializer):
     def get_nutrients(self, obj):
         return obj.get_nutrients()
 
-class MealPlanDaySerializer(serializers.ModelSerializer):
-    meals = MealSerializer(many=True, read_only=True)
-    total_calories = serializers.SerializerMethodField()
+class MealPlanDaySerializer(ExpandableFieldsMixin, serializers.ModelSerializer):
+    expandable_fields = {
+        'meals': Expandable(MealSerializer, many=True),
+    }
 
     class Meta:
         model = MealPlanDay
         fields = '__all__'
+        read_only_fields = TOTAL_FIELDS
 
-    def get_total_calories(self, obj):
-        return sum(meal.get_calories() for meal in obj.meals.all())
-
-class MealPlanSerializer(serializers.ModelSerializer):
-    days = MealPlanDaySerializer(many=True, read_only=True)
+class MealPlanSerializer(ExpandableFieldsMixin, serializers.ModelSerializer):
+    """Meal plan with day ids; ``?expand=days.meals.recipe`` nests the full plan"""
+    expandable_fields = {
+        'days': Expandable(MealPlanDaySerializer, many=True),
+    }
+    field_relations = {
+        'total_days': ('days',),
+    }
     total_days = serializers.SerializerMethodField()
 
     class Meta:
         model = MealPlan
         fields = '__all__'
-        read_only_fields = ('user',)
+        read_only_fields = ('user',) + TOTAL_FIELDS
 
     def get_total_days(self, obj):
-        return obj.days.count()
+        # Uses the prefetched days when the view loaded them
+        return len(obj.days.all())
 
     def create(self, validated_data):
         user = self.context['request'].user
         meal_plan = MealPlan.objects.create(user=user, **validated_data)
         return meal_plan
+
+class MealPlanJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = MealPlanJob
+        fields = (
+            'id', 'status', 'preferences', 'attempts', 'max_attempts', 'meal_plan',
+            'error', 'created_at', 'started_at', 'finished_at'
+        )
+        read_only_fields = fields
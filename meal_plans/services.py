@@ -4,7 +4,8 @@ from typing import List, Dict, Any
 import openai
 from django.conf import settings
 from recipes.models import Recipe
-from meal_plans.models import MealPlan, MealPlanDay, MealType, Meal
+from meal_plans.models import MealPlan
+from meal_plans.materialize import materialize_meal_plan
 
 class AIMealPlannerService:
     def __init__(self):
@@ -30,30 +31,30 @@ class AIMealPlannerService:
         5. Macronutrients (protein, carbs, fat)
         
         Format the response as a JSON object with the following structure:
-        {
+        {{
             "days": [
-                {
+                {{
                     "day": 1,
                     "meals": [
-                        {
+                        {{
                             "meal_type": "breakfast/lunch/dinner",
-                            "recipe": {
+                            "recipe": {{
                                 "title": "",
                                 "description": "",
                                 "ingredients": [
-                                    {"name": "", "amount": 0, "unit": ""}
+                                    {{"name": "", "amount": 0, "unit": ""}}
                                 ],
                                 "instructions": [],
                                 "calories_per_serving": 0,
                                 "protein": 0,
                                 "carbs": 0,
                                 "fat": 0
-                            }
-                        }
+                            }}
+                        }}
                     ]
-                }
+                }}
             ]
-        }"""
+        }}"""
         return prompt
 
     def generate_meal_plan(self, user_preferences: Dict[str, Any]) -> Dict[str, Any]:
@@ -81,56 +82,15 @@ class AIMealPlannerService:
     def create_meal_plan_from_ai_response(self, user, meal_plan_data: Dict[str, Any], preferences: Dict[str, Any]) -> MealPlan:
         """Create a MealPlan instance from AI-generated data"""
         try:
-            # Create the meal plan
-            meal_plan = MealPlan.objects.create(
-                user=user,
+            # Everything is written in one transaction, so a failure leaves nothing to clean up
+            return materialize_meal_plan(
+                user,
+                meal_plan_data,
                 name=f"AI Generated Plan - {preferences.get('dietary_preferences', 'Custom')}",
-                caloric_target=preferences.get('target_calories', 2000)
+                caloric_target=preferences.get('target_calories', 2000),
+                start_date=preferences.get('start_date')
             )
-
-            # Get or create meal types
-            meal_types = {
-                'breakfast': MealType.objects.get_or_create(name='Breakfast')[0],
-                'lunch': MealType.objects.get_or_create(name='Lunch')[0],
-                'dinner': MealType.objects.get_or_create(name='Dinner')[0]
-            }
-
-            # Create days and meals
-            for day_data in meal_plan_data['days']:
-                day = MealPlanDay.objects.create(
-                    meal_plan=meal_plan,
-                    date=meal_plan.start_date + timezone.timedelta(days=day_data['day'] - 1)
-                )
-
-                for meal_data in day_data['meals']:
-                    # Create or get recipe
-                    recipe_data = meal_data['recipe']
-                    recipe = Recipe.objects.create(
-                        title=recipe_data['title'],
-                        description=recipe_data['description'],
-                        ingredients=recipe_data['ingredients'],
-                        instructions=recipe_data['instructions'],
-                        calories_per_serving=recipe_data['calories_per_serving'],
-                        protein=recipe_data['protein'],
-                        carbs=recipe_data['carbs'],
-                        fat=recipe_data['fat'],
-                        created_by=user
-                    )
-
-                    # Create meal
-                    Meal.objects.create(
-                        day=day,
-                        meal_type=meal_types[meal_data['meal_type'].lower()],
-                        recipe=recipe,
-                        servings=1  # Default to 1 serving, can be adjusted
-                    )
-
-            return meal_plan
-
         except Exception as e:
-            # Clean up if something goes wrong
-            if 'meal_plan' in locals():
-                meal_plan.delete()
             raise Exception(f"Failed to create meal plan: {str(e)}")
 
     def suggest_recipe_alternatives(self, recipe: Recipe, preferences: Dict[str, Any]) -> List[Dict[str, Any]]:
@@ -0,0 +1,116 @@
+"""
+Signal handlers keeping the stored nutrition totals current (see ``totals``).
+
+Deleting a day or plan does not adjust totals meal by meal: the meals go with
+their parent, and a day deleted on its own takes its stored totals off its
+plan in one update. A ``QuerySet.delete()`` of meals or days is handled in one
+pass (see ``meal_planner_project.deletion``).
+"""
+from django.db.models import F, OuterRef, Subquery, Sum, Value
+from django.db.models.signals import pre_save, post_save, pre_delete
+from django.dispatch import receiver
+
+from meal_planner_project.deletion import deleted_rows, deleted_with
+from recipes.models import Recipe
+from .models import MealPlan, MealPlanDay, Meal
+from .totals import NUTRIENT_TOTALS, TOTAL_FIELDS, apply_deltas, meal_contribution
+
+RECIPE_NUTRIENTS = tuple(NUTRIENT_TOTALS.values())
+MEAL_VALUES = ('day_id', 'day__meal_plan_id', 'recipe_id', 'servings') + tuple(
+    f'recipe__{field}' for field in RECIPE_NUTRIENTS
+)
+
+
+def _stored_contribution(row, sign=1):
+    nutrients = {field: row[f'recipe__{field}'] for field in RECIPE_NUTRIENTS}
+    return row['day_id'], row['day__meal_plan_id'], meal_contribution(nutrients, row['servings'], sign)
+
+
+def _saved_meal(meal_id):
+    """The stored meal's (recipe id, servings, day id) and its (day, plan, negated nutrients) change"""
+    row = Meal.objects.filter(pk=meal_id).values(*MEAL_VALUES).first()
+    if row is None:
+        return None, None
+    return (row['recipe_id'], row['servings'], row['day_id']), _stored_contribution(row, sign=-1)
+
+
+def _current_contribution(meal, sign=1):
+    nutrients = {field: getattr(meal.recipe, field) for field in RECIPE_NUTRIENTS}
+    return meal.day_id, meal.day.meal_plan_id, meal_contribution(nutrients, meal.servings, sign)
+
+
+@receiver(pre_save, sender=Meal)
+def remember_meal_totals(sender, instance, raw=False, **kwargs):
+    # _saved_portion is also read by shopping.signals to skip saves that
+    # change neither the recipe, the servings nor the day
+    instance._saved_portion = instance._saved_contribution = None
+    if not raw and not instance._state.adding and instance.pk is not None:
+        instance._saved_portion, instance._saved_contribution = _saved_meal(instance.pk)
+
+
+@receiver(post_save, sender=Meal)
+def update_totals_on_meal_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    changes = [_current_contribution(instance)]
+    saved = getattr(instance, '_saved_contribution', None)
+    if saved is not None:
+        changes.append(saved)
+    instance._saved_contribution = None
+    apply_deltas(changes)
+
+
+@receiver(pre_delete, sender=Meal)
+def update_totals_on_meal_delete(sender, instance, origin=None, **kwargs):
+    if deleted_with(origin, (MealPlan, MealPlanDay)):
+        return
+    rows = deleted_rows(origin, sender, instance, *MEAL_VALUES, handler='totals')
+    apply_deltas(_stored_contribution(row, sign=-1) for row in rows)
+
+
+@receiver(pre_delete, sender=MealPlanDay)
+def update_totals_on_day_delete(sender, instance, origin=None, **kwargs):
+    if deleted_with(origin, MealPlan):
+        return
+    rows = deleted_rows(origin, sender, instance, 'meal_plan_id', *TOTAL_FIELDS, handler='totals')
+    apply_deltas(
+        (None, row['meal_plan_id'], {field: -row[field] for field in TOTAL_FIELDS})
+        for row in rows
+    )
+
+
+@receiver(pre_save, sender=Recipe)
+def remember_recipe_nutrients(sender, instance, raw=False, update_fields=None, **kwargs):
+    instance._saved_nutrients = None
+    if raw or instance._state.adding or instance.pk is None:
+        return
+    if update_fields is not None and not set(update_fields) & set(RECIPE_NUTRIENTS):
+        return
+    instance._saved_nutrients = Recipe.objects.filter(pk=instance.pk).values(*RECIPE_NUTRIENTS).first()
+
+
+@receiver(post_save, sender=Recipe)
+def update_totals_on_recipe_change(sender, instance, raw=False, **kwargs):
+    saved = getattr(instance, '_saved_nutrients', None)
+    instance._saved_nutrients = None
+    if raw or saved is None:
+        return
+    deltas = {
+        total: getattr(instance, field) - saved[field]
+        for total, field in NUTRIENT_TOTALS.items()
+        if getattr(instance, field) != saved[field]
+    }
+    if not deltas:
+        return
+
+    # Each day and plan moves by the change per serving times the servings
+    # of this recipe it contains
+    meals = Meal.objects.filter(recipe_id=instance.pk).order_by()
+    for model, group_by in ((MealPlanDay, 'day'), (MealPlan, 'day__meal_plan')):
+        servings = Subquery(
+            meals.filter(**{group_by: OuterRef('pk')}).values(group_by)
+            .annotate(servings=Sum('servings')).values('servings')
+        )
+        model.objects.filter(pk__in=meals.values(group_by)).update(**{
+            total: F(total) + servings * Value(delta) for total, delta in deltas.items()
+        })
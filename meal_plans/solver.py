@@ -0,0 +1,129 @@
+"""
+Meal-plan solver over the recipe table.
+
+Chooses one recipe per (day, meal type) so each day's calories and macros
+come close to the targets, without repeating a recipe within
+``variety_days`` days. All scoring runs on NumPy arrays from ``RecipePool``:
+
+1. For each meal type, the ``shortlist`` candidates closest to that meal's
+   share of the daily targets are found once with ``argpartition``.
+2. Each day starts from the best allowed candidate per meal, then a few
+   rounds of coordinate descent re-pick each meal given the others, scoring
+   all shortlisted candidates at once.
+
+The objective is the weighted sum over days of squared relative errors of the
+daily totals against the targets (lower is better).
+"""
+import time
+from dataclasses import dataclass, field
+from typing import List, Sequence
+
+import numpy as np
+
+# Share of daily calories per meal type (normalised over the types in a plan)
+MEAL_SHARES = {'breakfast': 0.25, 'lunch': 0.35, 'dinner': 0.4, 'snack': 0.1}
+
+# Fraction of calories from protein, carbs and fat for each diet
+MACRO_SPLITS = {
+    'balanced': (0.3, 0.4, 0.3),
+    'vegetarian': (0.2, 0.55, 0.25),
+    'vegan': (0.2, 0.55, 0.25),
+    'keto': (0.25, 0.05, 0.7),
+    'high-protein': (0.4, 0.35, 0.25),
+}
+KCAL_PER_GRAM = np.array([4.0, 4.0, 9.0])
+
+# Relative weight of calories, protein, carbs and fat in the objective
+NUTRIENT_WEIGHTS = np.array([1.0, 0.5, 0.5, 0.5])
+
+
+def daily_targets(target_calories: float, diet: str = 'balanced') -> np.ndarray:
+    """Daily (calories, protein g, carbs g, fat g) targets for a diet"""
+    split = np.array(MACRO_SPLITS.get(diet, MACRO_SPLITS['balanced']))
+    return np.concatenate(([target_calories], target_calories * split / KCAL_PER_GRAM))
+
+
+@dataclass
+class SolveResult:
+    # Pool row chosen for each (day, meal type)
+    rows: np.ndarray
+    objective: float
+    solve_seconds: float
+    daily_totals: np.ndarray = field(repr=False)
+
+
+class MealPlanSolver:
+    def __init__(self, nutrients: np.ndarray, targets: Sequence[float], meal_types: Sequence[str],
+                 variety_days: int = 3, shortlist: int = 64, rounds: int = 3):
+        self.nutrients = np.asarray(nutrients, dtype=np.float64)
+        self.targets = np.asarray(targets, dtype=np.float64)
+        self.meal_types = list(meal_types)
+        self.variety_days = variety_days
+        self.shortlist = shortlist
+        self.rounds = rounds
+
+        shares = np.array([MEAL_SHARES.get(meal_type, 1.0) for meal_type in self.meal_types])
+        self.shares = shares / shares.sum()
+        self._scale = 1.0 / np.maximum(self.targets, 1.0) ** 2 * NUTRIENT_WEIGHTS
+
+    def _day_error(self, totals: np.ndarray) -> np.ndarray:
+        """Objective of one or many daily totals (last axis is the nutrient)"""
+        return ((totals - self.targets) ** 2 * self._scale).sum(axis=-1)
+
+    def _shortlists(self, candidates: np.ndarray) -> List[np.ndarray]:
+        """Candidate rows closest to each meal's share of the targets"""
+        pool = self.nutrients[candidates]
+        size = min(self.shortlist, len(candidates))
+        shortlists = []
+        for share in self.shares:
+            error = self._day_error(pool / share)
+            best = np.argpartition(error, size - 1)[:size]
+            shortlists.append(candidates[best[np.argsort(error[best])]])
+        return shortlists
+
+    def solve(self, days: int, candidates: np.ndarray) -> SolveResult:
+        """Assign pool rows (indices into ``nutrients``) to every meal of every day"""
+        started = time.perf_counter()
+        candidates = np.flatnonzero(candidates) if candidates.dtype == bool else np.asarray(candidates)
+        if len(candidates) == 0:
+            raise ValueError("No recipes match the preferences")
+
+        shortlists = self._shortlists(candidates)
+        slots = len(self.meal_types)
+        rows = np.empty((days, slots), dtype=np.int64)
+        last_used = np.full(len(self.nutrients), -self.variety_days - 1, dtype=np.int64)
+
+        for day in range(days):
+            allowed = []
+            for slot in range(slots):
+                options = shortlists[slot]
+                recent = day - last_used[options] <= self.variety_days
+                # Relax the variety rule rather than fail when it leaves nothing
+                allowed.append(options[~recent] if (~recent).any() else options)
+
+            choice = [options[0] for options in allowed]
+            for _ in range(self.rounds):
+                changed = False
+                for slot in range(slots):
+                    others = [choice[i] for i in range(slots) if i != slot]
+                    options = allowed[slot][~np.isin(allowed[slot], others)]
+                    if len(options) == 0:
+                        continue
+                    base = self.nutrients[others].sum(axis=0)
+                    best = options[np.argmin(self._day_error(base + self.nutrients[options]))]
+                    if best != choice[slot]:
+                        choice[slot] = best
+                        changed = True
+                if not changed:
+                    break
+
+            rows[day] = choice
+            last_used[choice] = day
+
+        daily_totals = self.nutrients[rows].sum(axis=1)
+        return SolveResult(
+            rows=rows,
+            objective=float(self._day_error(daily_totals).sum()),
+            solve_seconds=time.perf_counter() - started,
+            daily_totals=daily_totals,
+        )
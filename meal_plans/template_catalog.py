@@ -0,0 +1,169 @@
+"""
+In-memory catalog of meal templates.
+
+The catalog is built once per process from ``data/meal_templates.json`` and
+rebuilt only when the file's mtime changes. Templates are indexed by
+``(diet, meal_type)``, each bucket sorted by calories, so finding the
+templates near a calorie target is a pair of binary searches however large
+the file grows.
+"""
+import json
+import os
+import threading
+from bisect import bisect_left, bisect_right
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from .scaling import freeze
+
+TEMPLATE_PATH = Path(__file__).parent / 'data' / 'meal_templates.json'
+DEFAULT_DIET = 'balanced'
+
+# Templates within this fraction of the calorie target are interchangeable
+CALORIE_WINDOW = 0.25
+
+
+def create_default_templates(template_path: Path):
+    """Create default meal templates if none exist"""
+    default_templates = {
+        "vegetarian": [
+            {
+                "meal_type": "breakfast",
+                "recipe": {
+                    "title": "Overnight Oats with Berries",
+                    "description": "Healthy and filling breakfast with oats and fresh berries",
+                    "ingredients": [
+                        {"name": "rolled oats", "amount": 50, "unit": "g"},
+                        {"name": "almond milk", "amount": 120, "unit": "ml"},
+                        {"name": "mixed berries", "amount": 100, "unit": "g"},
+                        {"name": "honey", "amount": 15, "unit": "ml"}
+                    ],
+                    "instructions": [
+                        "Mix oats and almond milk in a jar",
+                        "Leave overnight in refrigerator",
+                        "Top with berries and honey before serving"
+                    ],
+                    "calories_per_serving": 350,
+                    "protein": 8,
+                    "carbs": 65,
+                    "fat": 7
+                }
+            }
+            # Add more templates...
+        ],
+        "keto": [
+            # Add keto meal templates...
+        ],
+        "balanced": [
+            # Add balanced meal templates...
+        ]
+    }
+
+    template_path.parent.mkdir(exist_ok=True)
+    with open(template_path, 'w') as f:
+        json.dump(default_templates, f, indent=4)
+
+
+class _Bucket:
+    """Templates of one (diet, meal_type), sorted by calories"""
+    __slots__ = ('templates', 'calories')
+
+    def __init__(self, templates: List[Dict[str, Any]]):
+        self.templates = sorted(templates, key=lambda t: t['recipe']['calories_per_serving'])
+        self.calories = [t['recipe']['calories_per_serving'] for t in self.templates]
+
+    def window(self, target_calories: Optional[float]) -> Tuple[int, int]:
+        """Index range of templates within CALORIE_WINDOW of the target"""
+        if target_calories is None:
+            return 0, len(self.templates)
+        lo = bisect_left(self.calories, target_calories * (1 - CALORIE_WINDOW))
+        hi = bisect_right(self.calories, target_calories * (1 + CALORIE_WINDOW))
+        if lo < hi:
+            return lo, hi
+        # Nothing in range: fall back to the single closest template
+        nearest = min(
+            (i for i in (lo - 1, lo) if 0 <= i < len(self.calories)),
+            key=lambda i: abs(self.calories[i] - target_calories)
+        )
+        return nearest, nearest + 1
+
+
+class TemplateCatalog:
+    """Meal templates indexed by diet and meal type"""
+
+    def __init__(self, templates: Dict[str, List[Dict[str, Any]]], mtime_ns: Optional[int] = None):
+        # Frozen so that requests sharing the catalog can never modify it
+        templates = freeze(templates)
+        self.templates = templates
+        self.mtime_ns = mtime_ns
+        self._buckets = {}
+        self._diet_buckets = {}
+        for diet, diet_templates in templates.items():
+            by_meal_type = {}
+            for template in diet_templates:
+                by_meal_type.setdefault(template['meal_type'], []).append(template)
+            for meal_type, bucket_templates in by_meal_type.items():
+                self._buckets[(diet, meal_type)] = _Bucket(bucket_templates)
+            if diet_templates:
+                self._diet_buckets[diet] = _Bucket(diet_templates)
+
+    def __len__(self):
+        return sum(len(bucket.templates) for bucket in self._diet_buckets.values())
+
+    def diet_templates(self, diet: str) -> List[Dict[str, Any]]:
+        """All templates of a diet (the default diet if unknown), by calories"""
+        bucket = self._diet_buckets.get(diet) or self._diet_buckets.get(DEFAULT_DIET)
+        return bucket.templates if bucket else []
+
+    def _bucket(self, diet: str, meal_type: str) -> Optional[_Bucket]:
+        if diet not in self._diet_buckets:
+            diet = DEFAULT_DIET
+        # Fall back to any template of the diet if none match the meal type
+        return self._buckets.get((diet, meal_type)) or self._diet_buckets.get(diet)
+
+    def candidates(self, diet: str, meal_type: str,
+                   target_calories: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Templates suitable for a meal, closest to the calorie target"""
+        bucket = self._bucket(diet, meal_type)
+        if bucket is None:
+            return []
+        lo, hi = bucket.window(target_calories)
+        return bucket.templates[lo:hi]
+
+    def select(self, diet: str, meal_type: str, target_calories: Optional[float] = None,
+               rotation: int = 0) -> Dict[str, Any]:
+        """Pick a template for a meal.
+
+        Successive ``rotation`` values cycle through every template in the
+        calorie window before repeating one.
+        """
+        candidates = self.candidates(diet, meal_type, target_calories)
+        if not candidates:
+            raise LookupError(f"No meal templates for diet '{diet}'")
+        return candidates[rotation % len(candidates)]
+
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+
+def get_template_catalog(path: Path = TEMPLATE_PATH) -> TemplateCatalog:
+    """The process-wide catalog, reloaded if the template file has changed"""
+    global _catalog
+    try:
+        mtime_ns = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        mtime_ns = None
+
+    catalog = _catalog
+    if catalog is not None and mtime_ns is not None and catalog.mtime_ns == mtime_ns:
+        return catalog
+
+    with _catalog_lock:
+        if _catalog is None or mtime_ns is None or _catalog.mtime_ns != mtime_ns:
+            if mtime_ns is None:
+                create_default_templates(path)
+                mtime_ns = os.stat(path).st_mtime_ns
+            with open(path, 'r') as f:
+                _catalog = TemplateCatalog(json.load(f), mtime_ns)
+        return _catalog
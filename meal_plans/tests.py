@@ -1,14 +1,43 @@
-from django.test import TestCase
+from django.test import TestCase, SimpleTestCase
 from django.contrib.auth.models import User
 from django.urls import reverse
 from django.utils import timezone
 from rest_framework.test import APITestCase, APIClient
 from rest_framework import status
+import io
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
 from datetime import timedelta
-from .models import MealPlan, MealPlanDay, MealType, Meal
-from recipes.models import Recipe
+from unittest import mock
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from meal_planner_project.query_plans import QueryPlanTestMixin
+from .models import MealPlan, MealPlanDay, MealType, Meal, MealPlanJob
+from recipes.models import Recipe, RecipeRating
+from recipes.ratings import refresh_rating_aggregates
 from .serializers import MealPlanSerializer
+from .views import MealPlanDayViewSet, MealPlanViewSet, MealViewSet
 from .local_ai_service import LocalAIMealPlannerService
+from .model_registry import ModelRegistry, LoadedModel
+from .jobs import run_pending, queue_metrics, requeue_stale_jobs
+from .materialize import materialize_meal_plan
+from .template_catalog import TemplateCatalog, get_template_catalog
+from .scaling import ScaledRecipe, freeze
+from .recipe_pool import RecipePool, get_recipe_pool
+from .solver import MealPlanSolver, daily_targets
+import numpy as np
+from .inference import (
+    InferenceClient, InferenceServer, InferenceUnavailable, RemoteMealPlannerService
+)
 
 class MealPlanModelTests(TestCase):
     def setUp(self):
@@ -158,3 +187,933 @@ class LocalAIServiceTests(TestCase):
         self.assertEqual(adjusted['protein'], 37)  # 25 * 1.5
         self.assertEqual(adjusted['carbs'], 75)    # 50 * 1.5
         self.assertEqual(adjusted['fat'], 30)      # 20 * 1.5
+
+class ModelRegistryTests(SimpleTestCase):
+    def setUp(self):
+        self.loads = []
+
+        def loader(model_name):
+            self.loads.append(model_name)
+            return LoadedModel(tokenizer=object(), model=object(), device='cpu')
+
+        self.registry = ModelRegistry(loader=loader)
+
+    def test_model_loaded_once_per_process(self):
+        first = LocalAIMealPlannerService(registry=self.registry)
+        second = LocalAIMealPlannerService(registry=self.registry)
+
+        self.assertIs(first.model, second.model)
+        self.assertIs(first.tokenizer, second.tokenizer)
+        self.assertEqual(len(self.loads), 1)
+
+        stats = self.registry.stats()[first.model_name]
+        self.assertEqual(stats['hits'], 3)
+        self.assertGreaterEqual(stats['load_seconds'], 0)
+
+    def test_service_creation_does_not_load_model(self):
+        service = LocalAIMealPlannerService(registry=self.registry)
+        service.generate_meal_plan({'dietary_preferences': ['balanced'], 'days': 1, 'engine': 'templates'})
+
+        self.assertEqual(self.loads, [])
+        self.assertFalse(self.registry.is_loaded())
+
+    def test_warm_up(self):
+        self.registry.warm_up()
+
+        self.assertTrue(self.registry.is_loaded())
+        self.assertEqual(self.registry.stats()[LocalAIMealPlannerService().model_name]['hits'], 0)
+
+class StartupImportTests(SimpleTestCase):
+    def test_urlconf_does_not_import_heavy_ml_modules(self):
+        code = (
+            "import os, sys, django\n"
+            "os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'meal_planner_project.settings')\n"
+            "django.setup()\n"
+            "import meal_planner_project.urls\n"
+            "print(','.join(m for m in ('torch', 'transformers') if m in sys.modules))\n"
+        )
+        result = subprocess.run(
+            [sys.executable, '-c', code],
+            cwd=settings.BASE_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        self.assertEqual(result.stdout.strip(), '')
+
+class InferenceServerTests(SimpleTestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.address = f'unix:{self.tmpdir.name}/inference.sock'
+        self.preferences = {'dietary_preferences': ['balanced'], 'days': 2, 'engine': 'templates'}
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_remote_service_uses_server(self):
+        server = InferenceServer(self.address).start()
+        self.addCleanup(server.stop)
+        service = RemoteMealPlannerService(self.address)
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(service.generate_meal_plan(self.preferences)))
+            for _ in range(4)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(results), 4)
+        self.assertTrue(all(len(plan['days']) == 2 for plan in results))
+        stats = service.client.call('stats')
+        self.assertEqual(stats['requests'], 4)
+
+    def test_full_queue_rejects(self):
+        server = InferenceServer(self.address, max_queue=1)
+        server._queue.put_nowait(object())
+
+        with self.assertRaises(InferenceUnavailable):
+            server.submit('generate_meal_plan', {'preferences': self.preferences})
+
+    def test_falls_back_to_in_process_service(self):
+        service = RemoteMealPlannerService(self.address)
+        meal_plan_data = service.generate_meal_plan(self.preferences)
+
+        self.assertEqual(len(meal_plan_data['days']), 2)
+
+    def _fake_server(self, reply: bytes = b''):
+        """Accept connections on the address, send ``reply`` and hold them open"""
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        listener.bind(self.address[len('unix:'):])
+        listener.listen()
+        connections = []
+
+        def serve():
+            while True:
+                try:
+                    conn, _ = listener.accept()
+                except OSError:
+                    return
+                connections.append(conn)
+                if reply:
+                    conn.sendall(reply)
+
+        threading.Thread(target=serve, daemon=True).start()
+
+        def close():
+            listener.close()
+            for conn in connections:
+                conn.close()
+        self.addCleanup(close)
+
+    def test_silent_server_is_unavailable(self):
+        self._fake_server()
+        client = InferenceClient(self.address, timeout=0.2)
+
+        with self.assertRaises(InferenceUnavailable):
+            client.call('stats')
+
+        service = RemoteMealPlannerService(self.address)
+        service.client.timeout = 0.2
+        meal_plan_data = service.generate_meal_plan(self.preferences)
+        self.assertEqual(len(meal_plan_data['days']), 2)
+
+    def test_invalid_reply_is_unavailable(self):
+        self._fake_server(b'not json\n')
+        client = InferenceClient(self.address, timeout=0.2)
+
+        with self.assertRaises(InferenceUnavailable):
+            client.call('stats')
+
+@override_settings(MEAL_PLAN_JOBS={'RUN_IN_PROCESS': False, 'RETRY_BACKOFF_SECONDS': 0, 'MAX_ATTEMPTS': 2})
+class MealPlanJobTests(APITestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username='testuser',
+            password='testpass123'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.meal_plan = MealPlan.objects.create(
+            user=self.user,
+            name='Generated Plan',
+            start_date=timezone.now().date(),
+            end_date=timezone.now().date() + timedelta(days=6)
+        )
+
+    def _enqueue(self):
+        url = reverse('mealplan-generate-ai-meal-plan')
+        response = self.client.post(url, {'days': 7, 'async': True}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        return response.data['id']
+
+    def _fake_service(self, **kwargs):
+        service = mock.Mock(**kwargs)
+        service.generate_meal_plan.return_value = {'days': []}
+        return mock.patch('meal_plans.inference.get_meal_planner_service', return_value=service)
+
+    def test_enqueue_and_poll(self):
+        job_id = self._enqueue()
+        self.assertEqual(MealPlanJob.objects.get(pk=job_id).status, MealPlanJob.STATUS_QUEUED)
+        self.assertEqual(queue_metrics()['queue_depth'], 1)
+
+        with self._fake_service() as get_service:
+            get_service.return_value.create_meal_plan_from_ai_response.return_value = self.meal_plan
+            self.assertEqual(run_pending(), 1)
+
+        response = self.client.get(reverse('mealplanjob-detail', kwargs={'pk': job_id}))
+        self.assertEqual(response.data['status'], MealPlanJob.STATUS_SUCCEEDED)
+        self.assertEqual(response.data['meal_plan'], self.meal_plan.id)
+        self.assertEqual(queue_metrics()['queue_depth'], 0)
+
+    def test_failed_job_is_retried_then_marked_failed(self):
+        job_id = self._enqueue()
+
+        with self._fake_service() as get_service:
+            get_service.return_value.create_meal_plan_from_ai_response.side_effect = ValueError('boom')
+            self.assertEqual(run_pending(), 2)
+
+        job = MealPlanJob.objects.get(pk=job_id)
+        self.assertEqual(job.status, MealPlanJob.STATUS_FAILED)
+        self.assertEqual(job.attempts, 2)
+        self.assertEqual(job.error, 'boom')
+
+    def test_stale_jobs_are_requeued_until_out_of_attempts(self):
+        started_at = timezone.now() - timedelta(hours=1)
+        retryable = MealPlanJob.objects.create(
+            user=self.user, preferences={}, status=MealPlanJob.STATUS_RUNNING,
+            attempts=1, max_attempts=2, started_at=started_at
+        )
+        exhausted = MealPlanJob.objects.create(
+            user=self.user, preferences={}, status=MealPlanJob.STATUS_RUNNING,
+            attempts=2, max_attempts=2, started_at=started_at
+        )
+
+        self.assertEqual(requeue_stale_jobs(), 1)
+
+        retryable.refresh_from_db()
+        exhausted.refresh_from_db()
+        self.assertEqual(retryable.status, MealPlanJob.STATUS_QUEUED)
+        self.assertEqual(exhausted.status, MealPlanJob.STATUS_FAILED)
+        self.assertTrue(exhausted.error)
+        self.assertIsNotNone(exhausted.finished_at)
+
+class MaterializeMealPlanTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            password='testpass123'
+        )
+        self.service = LocalAIMealPlannerService()
+
+    def _plan_data(self, days):
+        return self.service.generate_meal_plan({'dietary_preferences': ['balanced'], 'days': days, 'engine': 'templates'})
+
+    def _count_queries(self, meal_plan_data):
+        with CaptureQueriesContext(connection) as queries:
+            materialize_meal_plan(self.user, meal_plan_data, name='Plan')
+        return len(queries)
+
+    def test_creates_days_and_meals(self):
+        meal_plan = materialize_meal_plan(self.user, self._plan_data(7), name='Plan', caloric_target=2000)
+
+        self.assertEqual(meal_plan.days.count(), 7)
+        self.assertEqual(Meal.objects.filter(day__meal_plan=meal_plan).count(), 21)
+        self.assertEqual(Recipe.objects.count(), 3)
+        self.assertEqual((meal_plan.end_date - meal_plan.start_date).days, 6)
+        self.assertEqual(MealType.objects.count(), 3)
+
+    def test_reuses_existing_and_near_duplicate_recipes(self):
+        materialize_meal_plan(self.user, self._plan_data(1), name='Plan')
+        meal_plan_data = self._plan_data(2)
+        # A slightly different amount is a near duplicate, not new content
+        meal = meal_plan_data['days'][1]['meals'][0]
+        meal['recipe'] = meal['recipe'].to_dict()
+        meal['recipe']['ingredients'][0]['amount'] += 1
+
+        meal_plan = materialize_meal_plan(self.user, meal_plan_data, name='Plan')
+
+        self.assertEqual(Recipe.objects.count(), 3)
+        self.assertEqual(
+            Meal.objects.filter(day__meal_plan=meal_plan).values('recipe').distinct().count(), 3
+        )
+
+    def test_query_count_does_not_grow_with_plan_length(self):
+        self._count_queries(self._plan_data(1))  # create the meal types
+
+        self.assertEqual(
+            self._count_queries(self._plan_data(2)),
+            self._count_queries(self._plan_data(14))
+        )
+
+    def test_failure_rolls_back_everything(self):
+        meal_plan_data = self._plan_data(3)
+        meal = meal_plan_data['days'][2]['meals'][0]
+        meal['recipe'] = meal['recipe'].to_dict()
+        del meal['recipe']['calories_per_serving']
+
+        with self.assertRaises(KeyError):
+            materialize_meal_plan(self.user, meal_plan_data, name='Plan')
+
+        self.assertFalse(MealPlan.objects.exists())
+        self.assertFalse(Recipe.objects.exists())
+
+def _template(meal_type, title, calories):
+    return {
+        'meal_type': meal_type,
+        'recipe': {
+            'title': title, 'description': '', 'ingredients': [], 'instructions': [],
+            'calories_per_serving': calories, 'protein': 10, 'carbs': 10, 'fat': 10
+        }
+    }
+
+class TemplateCatalogTests(SimpleTestCase):
+    def setUp(self):
+        self.catalog = TemplateCatalog({
+            'balanced': [
+                _template('lunch', f'Lunch {calories}', calories)
+                for calories in range(100, 1100, 100)
+            ] + [_template('breakfast', 'Porridge', 400)],
+            'keto': [_template('dinner', 'Steak', 700)],
+        })
+
+    def test_candidates_are_within_calorie_window(self):
+        titles = [t['recipe']['title'] for t in self.catalog.candidates('balanced', 'lunch', 600)]
+        self.assertEqual(titles, ['Lunch 500', 'Lunch 600', 'Lunch 700'])
+
+    def test_rotation_cycles_through_window(self):
+        picks = [
+            self.catalog.select('balanced', 'lunch', 600, rotation=i)['recipe']['title']
+            for i in range(4)
+        ]
+        self.assertEqual(picks, ['Lunch 500', 'Lunch 600', 'Lunch 700', 'Lunch 500'])
+
+    def test_fallbacks(self):
+        # Unknown diet falls back to balanced, unknown meal type to any of the diet
+        self.assertEqual(self.catalog.select('paleo', 'breakfast', 400)['recipe']['title'], 'Porridge')
+        self.assertEqual(self.catalog.select('keto', 'lunch', 100)['recipe']['title'], 'Steak')
+
+    def test_seeded_plans_vary_by_day_and_repeat_by_seed(self):
+        service = LocalAIMealPlannerService()
+        service.catalog = self.catalog
+        preferences = {'dietary_preferences': ['balanced'], 'meals_per_day': 2, 'days': 3,
+                       'target_calories': 1200, 'seed': 42, 'engine': 'templates'}
+
+        first = service.generate_meal_plan(preferences)
+        second = service.generate_meal_plan(preferences)
+
+        lunches = {day['meals'][1]['recipe']['title'] for day in first['days']}
+        self.assertEqual(len(lunches), 3)
+        self.assertEqual(first, second)
+
+    def test_reloads_when_file_changes(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'templates.json')
+            with open(path, 'w') as f:
+                json.dump({'balanced': [_template('lunch', 'Old', 500)]}, f)
+            catalog = get_template_catalog(path)
+            self.assertIs(get_template_catalog(path), catalog)
+
+            with open(path, 'w') as f:
+                json.dump({'balanced': [_template('lunch', 'New', 500)]}, f)
+            os.utime(path, ns=(catalog.mtime_ns + 10 ** 9, catalog.mtime_ns + 10 ** 9))
+
+            self.assertEqual(get_template_catalog(path).select('balanced', 'lunch')['recipe']['title'], 'New')
+
+class ScaledRecipeTests(SimpleTestCase):
+    def setUp(self):
+        self.template = freeze({
+            'title': 'Overnight Oats',
+            'ingredients': [{'name': 'rolled oats', 'amount': 50, 'unit': 'g'}],
+            'instructions': ['Mix', 'Chill'],
+            'calories_per_serving': 350, 'protein': 8, 'carbs': 65, 'fat': 7
+        })
+
+    def test_scales_amounts_and_macros(self):
+        scaled = ScaledRecipe(self.template, 2)
+
+        self.assertEqual(scaled['ingredients'], [{'name': 'rolled oats', 'amount': 100, 'unit': 'g'}])
+        self.assertEqual(scaled['calories_per_serving'], 700)
+        self.assertEqual(scaled['protein'], 16)
+        self.assertEqual(scaled.to_dict()['instructions'], ['Mix', 'Chill'])
+
+    def test_scaled_amounts_move_to_readable_units(self):
+        template = freeze({'title': 'Stew', 'ingredients': [
+            {'name': 'beef', 'amount': 600, 'unit': 'g'}, {'name': 'stock', 'amount': 2, 'unit': 'cups'},
+            {'name': 'bay leaf', 'amount': 1},
+        ]})
+
+        self.assertEqual(ScaledRecipe(template, 2)['ingredients'], [
+            {'name': 'beef', 'amount': 1.2, 'unit': 'kg'},
+            {'name': 'stock', 'amount': 4, 'unit': 'cup'},
+            {'name': 'bay leaf', 'amount': 2},
+        ])
+
+    def test_serialised_copy_does_not_touch_template(self):
+        recipe = ScaledRecipe(self.template, 3).to_dict()
+        recipe['ingredients'][0]['amount'] = 0
+
+        self.assertEqual(self.template['ingredients'][0]['amount'], 50)
+
+    def test_repeated_generation_does_not_compound_scaling(self):
+        service = LocalAIMealPlannerService()
+        preferences = {'dietary_preferences': ['balanced'], 'target_calories': 3000, 'days': 1, 'seed': 1,
+                       'engine': 'templates'}
+
+        first = service.generate_meal_plan(preferences)
+        for _ in range(3):
+            service.generate_meal_plan(preferences)
+
+        self.assertEqual(service.generate_meal_plan(preferences), first)
+
+def _recipe(user, title, calories, protein, carbs, fat, tags=(), ingredients=('water',)):
+    return Recipe.objects.create(
+        title=title,
+        description='',
+        ingredients=[{'name': name, 'amount': 100, 'unit': 'g'} for name in ingredients],
+        instructions='',
+        prep_time=10,
+        cook_time=10,
+        servings=1,
+        calories_per_serving=calories,
+        protein=protein,
+        carbs=carbs,
+        fat=fat,
+        dietary_tags=list(tags),
+        created_by=user
+    )
+
+class MealPlanSolverTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            password='testpass123'
+        )
+        for i in range(60):
+            calories = 300 + 10 * i
+            _recipe(
+                self.user, f'Recipe {i}', calories,
+                protein=calories * 0.3 / 4, carbs=calories * 0.4 / 4, fat=calories * 0.3 / 9,
+                tags=['vegetarian'] if i % 2 else [],
+                ingredients=['peanuts'] if i % 3 == 0 else ['rice']
+            )
+        self.preferences = {
+            'dietary_preferences': ['vegetarian'],
+            'restrictions': ['nut'],
+            'target_calories': 2000,
+            'days': 7,
+            'user_id': self.user.id,
+            'engine': 'recipes'
+        }
+
+    def test_plan_uses_matching_recipes_with_variety(self):
+        meal_plan_data = LocalAIMealPlannerService().generate_meal_plan(self.preferences)
+
+        recipe_ids = [[meal['recipe_id'] for meal in day['meals']] for day in meal_plan_data['days']]
+        recipes = Recipe.objects.in_bulk([rid for day in recipe_ids for rid in day])
+        for recipe in recipes.values():
+            self.assertIn('vegetarian', recipe.dietary_tags)
+            self.assertNotIn('peanuts', [i['name'] for i in recipe.ingredients])
+        for day in range(len(recipe_ids)):
+            window = [rid for ids in recipe_ids[max(0, day - 3):day + 1] for rid in ids]
+            self.assertEqual(len(window), len(set(window)))
+        self.assertIn('objective', meal_plan_data['solver'])
+
+    def test_materialising_reuses_recipe_rows(self):
+        service = LocalAIMealPlannerService()
+        meal_plan_data = service.generate_meal_plan(self.preferences)
+        meal_plan = service.create_meal_plan_from_ai_response(self.user, meal_plan_data, self.preferences)
+
+        self.assertEqual(Recipe.objects.count(), 60)
+        self.assertEqual(Meal.objects.filter(day__meal_plan=meal_plan).count(), 21)
+
+    def test_pool_filters_on_dietary_masks(self):
+        _recipe(self.user, 'Vegan curry', 500, 30, 50, 15, tags=['Vegan', 'vegetarian'])
+        pool = RecipePool.from_database()
+        by_id = dict(zip(pool.ids.tolist(), pool.dietary_masks.tolist()))
+        recipes = Recipe.objects.all()
+
+        self.assertEqual(by_id, {recipe.id: recipe.dietary_mask for recipe in recipes})
+        vegetarian = pool.candidate_mask(dietary_tags=['vegetarian'])
+        self.assertEqual(int(vegetarian.sum()), 31)
+        vegan = pool.candidate_mask(dietary_tags=['vegetarian', 'VEGAN'])
+        self.assertEqual(pool.ids[vegan].tolist(), [recipes.get(title='Vegan curry').id])
+        self.assertFalse(pool.candidate_mask(dietary_tags=['paleo']).any())
+
+    def test_too_few_candidates(self):
+        preferences = dict(self.preferences, dietary_preferences=['keto'])
+        with self.assertRaises(Exception):
+            LocalAIMealPlannerService().generate_meal_plan(preferences)
+
+        preferences['engine'] = 'auto'
+        meal_plan_data = LocalAIMealPlannerService().generate_meal_plan(preferences)
+        self.assertEqual(meal_plan_data['solver']['engine'], 'templates')
+
+    def test_solver_hits_targets_on_large_pool(self):
+        rng = np.random.default_rng(0)
+        calories = rng.uniform(150, 900, 50000)
+        split = rng.dirichlet([4, 5, 3], 50000)
+        nutrients = np.column_stack([calories, calories[:, None] * split / [4, 4, 9]])
+        targets = daily_targets(2000)
+
+        result = MealPlanSolver(nutrients, targets, ['breakfast', 'lunch', 'dinner']).solve(
+            30, np.ones(50000, dtype=bool)
+        )
+
+        self.assertEqual(result.rows.shape, (30, 3))
+        self.assertLess(result.solve_seconds, 1)
+        np.testing.assert_allclose(result.daily_totals[:, 0], 2000, rtol=0.05)
+
+class RecipeAlternativeTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.other = User.objects.create_user(username='other', password='testpass123')
+        self.curry = _recipe(self.user, 'Lentil curry', 500, 30, 60, 15, tags=['vegetarian'])
+        self.stew = _recipe(self.user, 'Bean stew', 520, 28, 62, 16, tags=['vegetarian'])
+        self.steak = _recipe(self.user, 'Steak', 510, 60, 0, 30)
+        self.salad = _recipe(self.user, 'Peanut salad', 490, 29, 58, 15, tags=['vegetarian'], ingredients=['peanuts'])
+        self.private = _recipe(self.other, 'Private curry', 500, 30, 60, 15, tags=['vegetarian'])
+        self.private.is_public = False
+        self.private.save()
+        self.service = LocalAIMealPlannerService()
+        self.preferences = {'dietary_preferences': ['vegetarian'], 'user_id': self.user.id}
+
+    def _recipe_ids(self, alternatives):
+        return [a['id'] for a in alternatives if a['source'] == 'recipe']
+
+    def test_closest_by_macros_excluding_the_recipe(self):
+        alternatives = self.service.suggest_recipe_alternatives(self.curry, dict(self.preferences, count=2))
+
+        self.assertEqual(self._recipe_ids(alternatives), [self.salad.id, self.stew.id])
+        self.assertEqual([a['distance'] for a in alternatives], sorted(a['distance'] for a in alternatives))
+
+    def test_tags_restrictions_and_visibility(self):
+        preferences = dict(self.preferences, restrictions=['nut'], count=10)
+        recipe_ids = self._recipe_ids(self.service.suggest_recipe_alternatives(self.curry, preferences))
+
+        self.assertEqual(recipe_ids, [self.stew.id])
+        self.assertNotIn(self.private.id, recipe_ids)
+        self.assertIn(self.private.id, self._recipe_ids(self.service.suggest_recipe_alternatives(
+            self.curry, dict(preferences, user_id=self.other.id)
+        )))
+
+    def test_templates_are_ranked_with_recipes(self):
+        template = get_template_catalog().diet_templates('vegetarian')[0]['recipe']
+        recipe = Recipe(title='Porridge', **{
+            n: template[n] for n in ('calories_per_serving', 'protein', 'carbs', 'fat')
+        })
+        alternatives = self.service.suggest_recipe_alternatives(recipe, self.preferences)
+
+        self.assertEqual(alternatives[0]['source'], 'template')
+        self.assertEqual(alternatives[0]['title'], template['title'])
+        self.assertEqual(alternatives[0]['distance'], 0)
+
+        recipe.title = template['title']
+        alternatives = self.service.suggest_recipe_alternatives(recipe, self.preferences)
+        self.assertNotIn(template['title'], [a['title'] for a in alternatives])
+
+    def test_pool_merges_saved_recipes_without_a_reload(self):
+        pool = get_recipe_pool()
+        self.curry.protein = 80
+        self.curry.save()
+        added = _recipe(self.user, 'Tofu bowl', 500, 80, 60, 15, tags=['vegetarian'])
+
+        with mock.patch.object(RecipePool, 'from_database', side_effect=AssertionError):
+            updated = get_recipe_pool()
+        self.assertIsNot(updated, pool)
+        self.assertEqual(updated.ids.tolist(), sorted(Recipe.objects.values_list('id', flat=True)))
+        self.assertEqual(updated.nutrients[updated.rows_of([self.curry.id])[0], 1], 80)
+        self.assertTrue(updated.candidate_mask(dietary_tags=['vegetarian'])[updated.rows_of([added.id])[0]])
+
+        stew_id = self.stew.id
+        self.stew.delete()
+        with mock.patch.object(RecipePool, 'from_database', wraps=RecipePool.from_database) as from_database:
+            rebuilt = get_recipe_pool()
+        from_database.assert_called_once()
+        self.assertEqual(len(rebuilt.rows_of([stew_id])), 0)
+
+    def test_unchanged_pool_costs_no_query(self):
+        pool = get_recipe_pool()
+        with self.assertNumQueries(0):
+            self.assertIs(get_recipe_pool(), pool)
+
+        # Bulk inserts send no post_save, so materialising bumps the version itself
+        materialize_meal_plan(self.user, {'days': [
+            {'day': 1, 'meals': [{'meal_type': 'dinner', 'recipe': {
+                'title': 'Lentil soup', 'calories_per_serving': 350, 'protein': 20, 'carbs': 50, 'fat': 5,
+            }}]},
+        ]}, 'Generated')
+        self.assertIn(Recipe.objects.get(title='Lentil soup').id, get_recipe_pool().ids.tolist())
+
+class NutritionalSummaryTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            password='testpass123'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.recipe = _recipe(self.user, 'Oats', 400, 20, 50, 10)
+        self.breakfast = MealType.objects.create(name='Breakfast', display_order=1)
+        self.dinner = MealType.objects.create(name='Dinner', display_order=3)
+        self.start = timezone.now().date()
+
+    def _plan(self, days):
+        meal_plan = MealPlan.objects.create(
+            user=self.user,
+            name=f'{days} day plan',
+            start_date=self.start,
+            end_date=self.start + timedelta(days=days - 1)
+        )
+        for offset in range(days):
+            day = MealPlanDay.objects.create(meal_plan=meal_plan, date=self.start + timedelta(days=offset))
+            Meal.objects.create(day=day, meal_type=self.breakfast, recipe=self.recipe, servings=1)
+            Meal.objects.create(day=day, meal_type=self.dinner, recipe=self.recipe, servings=2)
+        return meal_plan
+
+    def _summary(self, meal_plan, **params):
+        url = reverse('mealplan-nutritional-summary', args=[meal_plan.id])
+        return self.client.get(url, params)
+
+    def test_totals_and_averages(self):
+        meal_plan = self._plan(3)
+        response = self._summary(meal_plan)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['total_calories'], 3600)
+        self.assertEqual(response.data['total_protein'], 180)
+        self.assertEqual(response.data['average_daily_calories'], 1200)
+        self.assertEqual(len(response.data['daily_averages']), 3)
+        self.assertEqual(set(response.data['meals_per_day'].values()), {2})
+
+    def test_empty_day_is_included(self):
+        meal_plan = self._plan(1)
+        MealPlanDay.objects.create(meal_plan=meal_plan, date=self.start + timedelta(days=1))
+        response = self._summary(meal_plan)
+
+        self.assertEqual(response.data['average_daily_calories'], 600)
+        self.assertEqual(response.data['meals_per_day'][str(self.start + timedelta(days=1))], 0)
+
+    def test_date_range(self):
+        meal_plan = self._plan(7)
+        response = self._summary(
+            meal_plan,
+            start_date=str(self.start + timedelta(days=2)),
+            end_date=str(self.start + timedelta(days=3))
+        )
+
+        self.assertEqual(len(response.data['daily_averages']), 2)
+        self.assertEqual(response.data['total_calories'], 2400)
+
+    def test_invalid_date(self):
+        response = self._summary(self._plan(1), start_date='tomorrow')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_meal_type_breakdown(self):
+        meal_plan = self._plan(2)
+        response = self._summary(meal_plan, breakdown='meal_type')
+
+        day = response.data['meal_types'][str(self.start)]
+        self.assertEqual(day['Breakfast']['calories'], 400)
+        self.assertEqual(day['Dinner']['calories'], 800)
+        self.assertEqual(response.data['total_calories'], 2400)
+
+    def test_query_count_is_constant(self):
+        short_plan, long_plan = self._plan(1), self._plan(28)
+        self._summary(short_plan)
+
+        for params in ({}, {'breakdown': 'meal_type'}):
+            with CaptureQueriesContext(connection) as short_queries:
+                self._summary(short_plan, **params)
+            with CaptureQueriesContext(connection) as long_queries:
+                self._summary(long_plan, **params)
+            self.assertEqual(len(short_queries), len(long_queries))
+            self.assertLessEqual(len(long_queries), 2)
+
+class MealPlanTotalsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            password='testpass123'
+        )
+        self.recipe = _recipe(self.user, 'Oats', 400, 20, 50, 10)
+        self.other = _recipe(self.user, 'Eggs', 200, 15, 1.5, 12)
+        self.breakfast = MealType.objects.create(name='Breakfast', display_order=1)
+        self.dinner = MealType.objects.create(name='Dinner', display_order=3)
+        start = timezone.now().date()
+        self.meal_plan = MealPlan.objects.create(
+            user=self.user,
+            name='Plan',
+            start_date=start,
+            end_date=start + timedelta(days=1)
+        )
+        self.day = MealPlanDay.objects.create(meal_plan=self.meal_plan, date=start)
+        self.next_day = MealPlanDay.objects.create(meal_plan=self.meal_plan, date=start + timedelta(days=1))
+
+    def assertTotals(self, obj, calories, protein, meal_count):
+        obj.refresh_from_db()
+        self.assertEqual(obj.total_calories, calories)
+        self.assertAlmostEqual(obj.total_protein, protein)
+        self.assertEqual(obj.meal_count, meal_count)
+
+    def test_meal_create_update_delete(self):
+        meal = Meal.objects.create(day=self.day, meal_type=self.breakfast, recipe=self.recipe, servings=2)
+        Meal.objects.create(day=self.next_day, meal_type=self.dinner, recipe=self.other)
+        self.assertTotals(self.day, 800, 40, 1)
+        self.assertTotals(self.meal_plan, 1000, 55, 2)
+
+        meal.servings = 1
+        meal.recipe = self.other
+        meal.save()
+        self.assertTotals(self.day, 200, 15, 1)
+
+        meal.day = self.next_day
+        meal.save()
+        self.assertTotals(self.day, 0, 0, 0)
+        self.assertTotals(self.next_day, 400, 30, 2)
+        self.assertTotals(self.meal_plan, 400, 30, 2)
+
+        meal.delete()
+        self.assertTotals(self.next_day, 200, 15, 1)
+        self.assertTotals(self.meal_plan, 200, 15, 1)
+
+    def _total_updates(self, queries):
+        tables = ('UPDATE "meal_plans_mealplan" ', 'UPDATE "meal_plans_mealplanday" ')
+        return [q for q in queries if q['sql'].startswith(tables)]
+
+    def _plan_meals(self):
+        for day in (self.day, self.next_day):
+            Meal.objects.create(day=day, meal_type=self.breakfast, recipe=self.recipe)
+            Meal.objects.create(day=day, meal_type=self.dinner, recipe=self.other, servings=2)
+
+    def test_bulk_meal_delete_updates_each_parent_once(self):
+        self._plan_meals()
+        with CaptureQueriesContext(connection) as queries:
+            Meal.objects.filter(day__meal_plan=self.meal_plan).delete()
+
+        updates = self._total_updates(queries)
+        self.assertEqual(len(updates), 3)
+        self.assertTotals(self.day, 0, 0, 0)
+        self.assertTotals(self.meal_plan, 0, 0, 0)
+
+    def test_day_delete_takes_its_totals_off_the_plan(self):
+        self._plan_meals()
+        with CaptureQueriesContext(connection) as queries:
+            self.day.delete()
+
+        updates = self._total_updates(queries)
+        self.assertEqual(len(updates), 1)
+        self.assertTotals(self.meal_plan, 800, 50, 2)
+
+    def test_plan_delete_skips_meal_adjustments(self):
+        self._plan_meals()
+        with CaptureQueriesContext(connection) as queries:
+            self.meal_plan.delete()
+
+        self.assertFalse(self._total_updates(queries))
+        self.assertFalse(MealPlanDay.objects.exists())
+
+    def test_unchanged_meal_save_skips_updates(self):
+        meal = Meal.objects.create(day=self.day, meal_type=self.breakfast, recipe=self.recipe)
+        meal.notes = 'With berries'
+        with CaptureQueriesContext(connection) as queries:
+            meal.save()
+        self.assertEqual(len(queries), 2)
+
+    def test_recipe_macro_change(self):
+        Meal.objects.create(day=self.day, meal_type=self.breakfast, recipe=self.recipe, servings=2)
+        Meal.objects.create(day=self.next_day, meal_type=self.breakfast, recipe=self.recipe)
+
+        self.recipe.calories_per_serving = 500
+        self.recipe.protein = 25
+        self.recipe.save()
+
+        self.assertTotals(self.day, 1000, 50, 1)
+        self.assertTotals(self.next_day, 500, 25, 1)
+        self.assertTotals(self.meal_plan, 1500, 75, 2)
+
+    def test_materialize_sets_totals(self):
+        meal_plan = materialize_meal_plan(self.user, {'days': [
+            {'day': 1, 'meals': [{'meal_type': 'breakfast', 'recipe_id': self.recipe.id, 'servings': 2}]},
+            {'day': 2, 'meals': [{'meal_type': 'dinner', 'recipe_id': self.other.id}]},
+        ]}, 'Generated')
+
+        self.assertEqual(meal_plan.total_calories, 1000)
+        self.assertEqual(meal_plan.meal_count, 2)
+        self.assertEqual(
+            list(meal_plan.days.values_list('total_calories', flat=True)),
+            [800, 200]
+        )
+
+    def test_rebuild_command(self):
+        Meal.objects.create(day=self.day, meal_type=self.breakfast, recipe=self.recipe)
+        MealPlanDay.objects.filter(pk=self.day.pk).update(total_calories=0)
+
+        with self.assertRaises(CommandError):
+            call_command('rebuild_meal_plan_totals', '--check', stdout=io.StringIO())
+
+        call_command('rebuild_meal_plan_totals', stdout=io.StringIO())
+        self.assertTotals(self.day, 400, 20, 1)
+        call_command('rebuild_meal_plan_totals', '--check', stdout=io.StringIO())
+
+class MealPlanQueryBudgetTests(APITestCase):
+    FULL_PLAN = 'days.meals.recipe.ratings.user,days.meals.recipe.created_by,days.meals.meal_type'
+    # Plan, days, meals with recipes, types and authors, ratings with users
+    EXPANDED_QUERIES = 4
+    # Plan, day ids
+    COMPACT_QUERIES = 2
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            password='testpass123'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.meal_types = [
+            MealType.objects.create(name=name, display_order=order)
+            for order, name in enumerate(('Breakfast', 'Lunch', 'Dinner'), start=1)
+        ]
+        self.recipes = [_recipe(self.user, f'Recipe {i}', 400 + i, 20, 40, 10) for i in range(5)]
+        raters = [User.objects.create_user(username=f'rater{i}', password='testpass123') for i in range(3)]
+        RecipeRating.objects.bulk_create([
+            RecipeRating(recipe=recipe, user=rater, rating=4)
+            for recipe in self.recipes
+            for rater in raters
+        ])
+        refresh_rating_aggregates()
+
+    def _plan(self, days):
+        start = timezone.now().date()
+        meal_plan = MealPlan.objects.create(
+            user=self.user,
+            name=f'{days} day plan',
+            start_date=start,
+            end_date=start + timedelta(days=days - 1)
+        )
+        plan_days = MealPlanDay.objects.bulk_create([
+            MealPlanDay(meal_plan=meal_plan, date=start + timedelta(days=offset))
+            for offset in range(days)
+        ])
+        Meal.objects.bulk_create([
+            Meal(day=day, meal_type=meal_type, recipe=self.recipes[(i + j) % len(self.recipes)])
+            for i, day in enumerate(plan_days)
+            for j, meal_type in enumerate(self.meal_types)
+        ])
+        return meal_plan
+
+    def test_retrieve_query_budget(self):
+        for days in (1, 7, 28, 365):
+            with self.subTest(days=days):
+                meal_plan = self._plan(days)
+                url = reverse('mealplan-detail', args=[meal_plan.id])
+                with self.assertNumQueries(self.EXPANDED_QUERIES):
+                    response = self.client.get(url, {'expand': self.FULL_PLAN})
+
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                self.assertEqual(response.data['total_days'], days)
+                self.assertEqual(len(response.data['days'][-1]['meals']), 3)
+                recipe = response.data['days'][0]['meals'][0]['recipe']
+                self.assertEqual(recipe['average_rating'], 4)
+                self.assertEqual(recipe['ratings'][0]['user']['username'][:5], 'rater')
+
+                with self.assertNumQueries(self.COMPACT_QUERIES):
+                    response = self.client.get(url)
+                self.assertEqual(len(response.data['days']), days)
+
+    def test_list_query_budget(self):
+        for days in (1, 7, 28):
+            self._plan(days)
+        with self.assertNumQueries(self.EXPANDED_QUERIES):
+            response = self.client.get(reverse('mealplan-list'), {'expand': self.FULL_PLAN})
+        self.assertEqual(len(response.data['results']), 3)
+
+    def test_day_and_meal_query_budget(self):
+        self._plan(7)
+        with self.assertNumQueries(3):
+            self.client.get(reverse('mealplanday-list'), {'expand': 'meals.recipe.ratings'})
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('meal-list'))
+        self.assertEqual(len(response.data), 21)
+        self.assertIsInstance(response.data[0]['recipe'], int)
+
+
+class FieldsetTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            password='testpass123'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.recipe = _recipe(self.user, 'Oats', 400, 20, 50, 10)
+        meal_type = MealType.objects.create(name='Breakfast', display_order=1)
+        start = timezone.now().date()
+        self.meal_plan = MealPlan.objects.create(
+            user=self.user,
+            name='Plan',
+            start_date=start,
+            end_date=start
+        )
+        self.day = MealPlanDay.objects.create(meal_plan=self.meal_plan, date=start)
+        self.meal = Meal.objects.create(day=self.day, meal_type=meal_type, recipe=self.recipe)
+        self.url = reverse('mealplan-detail', args=[self.meal_plan.id])
+
+    def test_compact_by_default(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.data['days'], [self.day.id])
+
+    def test_sparse_fields(self):
+        response = self.client.get(self.url, {'fields': 'id,name'})
+        self.assertEqual(set(response.data), {'id', 'name'})
+
+    def test_nested_fields_and_expand(self):
+        response = self.client.get(self.url, {
+            'expand': 'days.meals.recipe',
+            'fields': 'id,days.meals.recipe.title,days.meals.calories',
+        })
+        meal = response.data['days'][0]['meals'][0]
+        self.assertEqual(set(response.data['days'][0]), {'meals'})
+        self.assertEqual(meal, {'recipe': {'title': 'Oats'}, 'calories': 400})
+
+    def test_ratings_only_when_expanded(self):
+        url = reverse('recipe-detail', args=[self.recipe.id])
+        self.assertNotIn('ratings', self.client.get(url).data)
+        self.assertEqual(self.client.get(url, {'expand': 'ratings'}).data['ratings'], [])
+
+    def test_unrendered_fields_still_writable(self):
+        response = self.client.patch(
+            reverse('meal-detail', args=[self.meal.id]) + '?fields=id',
+            {'servings': 3, 'notes': 'Extra'},
+            format='json'
+        )
+        self.assertEqual(response.data, {'id': self.meal.id})
+        self.meal.refresh_from_db()
+        self.assertEqual((self.meal.servings, self.meal.notes), (3, 'Extra'))
+
+class MealPlanQueryPlanTests(QueryPlanTestMixin, TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            password='testpass123'
+        )
+        recipe = _recipe(self.user, 'Oats', 400, 15, 60, 10)
+        self.meal_plan = MealPlan.objects.create(
+            user=self.user,
+            name='Week',
+            start_date=timezone.now().date(),
+            end_date=timezone.now().date() + timedelta(days=6)
+        )
+        day = MealPlanDay.objects.create(meal_plan=self.meal_plan, date=self.meal_plan.start_date)
+        Meal.objects.create(day=day, meal_type=MealType.objects.create(name='Breakfast'), recipe=recipe)
+
+    def test_list_pages(self):
+        for queryset in self.page_querysets(MealPlanViewSet, self.user):
+            self.assertIndexed(queryset)
+
+    def test_days_and_meals(self):
+        for viewset in (MealPlanDayViewSet, MealViewSet):
+            queryset, _ = self.view_queryset(viewset, self.user)
+            self.assertIndexed(queryset)
+        self.assertIndexed(MealPlanDay.objects.filter(
+            meal_plan=self.meal_plan, date__gte=self.meal_plan.start_date, date__lte=self.meal_plan.end_date
+        ))
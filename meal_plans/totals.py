@@ -0,0 +1,125 @@
+"""
+Stored nutrition totals on MealPlanDay and MealPlan.
+
+Every day and plan carries the calories, protein, carbs and fat of its meals
+(each ``recipe value * servings``) and its meal count, so reads use one row
+instead of aggregating every meal. ``meal_plans.signals`` keeps them current
+with F() delta updates when a Meal is created, changed or deleted, or when a
+Recipe's macros change.
+
+Bulk writes (``bulk_create``, ``QuerySet.update``) do not send signals; code
+that uses them calls ``refresh_totals`` afterwards. The
+``rebuild_meal_plan_totals`` command checks and repairs any drift.
+"""
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.db.models import Count, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from .models import MealPlan, MealPlanDay, Meal
+
+# Stored total -> Recipe field it sums (times servings)
+NUTRIENT_TOTALS = {
+    'total_calories': 'calories_per_serving',
+    'total_protein': 'protein',
+    'total_carbs': 'carbs',
+    'total_fat': 'fat',
+}
+TOTAL_FIELDS = tuple(NUTRIENT_TOTALS) + ('meal_count',)
+
+# Float totals are updated incrementally, so allow for rounding drift
+TOLERANCE = 1e-6
+
+
+def meal_contribution(nutrients: Dict[str, float], servings: int, sign: int = 1) -> Dict[str, float]:
+    """What one meal adds to its day and plan, given its recipe's nutrient values"""
+    contribution = {
+        total: sign * nutrients[recipe_field] * servings
+        for total, recipe_field in NUTRIENT_TOTALS.items()
+    }
+    contribution['meal_count'] = sign
+    return contribution
+
+
+def apply_deltas(changes: Iterable[Tuple[int, int, Dict[str, float]]]):
+    """Add each (day_id, meal_plan_id, delta) to the stored totals with F() updates.
+
+    Changes are summed per day and plan first, so each row gets one UPDATE.
+    A ``day_id`` of None changes only the plan.
+    """
+    by_day = defaultdict(lambda: defaultdict(float))
+    by_plan = defaultdict(lambda: defaultdict(float))
+    for day_id, meal_plan_id, delta in changes:
+        for field, value in delta.items():
+            if day_id is not None:
+                by_day[day_id][field] += value
+            by_plan[meal_plan_id][field] += value
+
+    for model, deltas in ((MealPlanDay, by_day), (MealPlan, by_plan)):
+        for pk, delta in deltas.items():
+            update = {field: F(field) + value for field, value in delta.items() if value}
+            if update:
+                model.objects.filter(pk=pk).update(**update)
+
+
+def _total_expressions(group_by: str) -> Dict[str, Coalesce]:
+    """Correlated subqueries computing each total from the meals of the outer row"""
+    meals = Meal.objects.filter(**{group_by: OuterRef('pk')}).order_by().values(group_by)
+    expressions = {
+        total: Coalesce(
+            Subquery(meals.annotate(value=Sum(F(f'recipe__{field}') * F('servings'))).values('value')),
+            Value(0) if total == 'total_calories' else Value(0.0)
+        )
+        for total, field in NUTRIENT_TOTALS.items()
+    }
+    expressions['meal_count'] = Coalesce(
+        Subquery(meals.annotate(value=Count('pk')).values('value')), Value(0)
+    )
+    return expressions
+
+
+def refresh_totals(days=None, meal_plans=None):
+    """Recompute the stored totals of the given querysets from their meals"""
+    if days is not None:
+        days.update(**_total_expressions('day'))
+    if meal_plans is not None:
+        meal_plans.update(**_total_expressions('day__meal_plan'))
+
+
+def refresh_meal_plan_totals(meal_plan: MealPlan):
+    """Recompute the totals of one plan and its days, and reload them on the instance"""
+    refresh_totals(
+        MealPlanDay.objects.filter(meal_plan=meal_plan),
+        MealPlan.objects.filter(pk=meal_plan.pk)
+    )
+    meal_plan.refresh_from_db(fields=TOTAL_FIELDS)
+
+
+def _differs(stored, expected) -> bool:
+    return abs(stored - expected) > TOLERANCE * max(1.0, abs(expected))
+
+
+def find_drift(queryset, group_by: str) -> List[Tuple[int, str, float, float]]:
+    """(pk, field, stored, expected) for every stored total that is out of date"""
+    expected = {f'expected_{field}': expression for field, expression in _total_expressions(group_by).items()}
+    rows = queryset.order_by('pk').values('pk', *TOTAL_FIELDS, **expected)
+    return [
+        (row['pk'], field, row[field], row[f'expected_{field}'])
+        for row in rows
+        for field in TOTAL_FIELDS
+        if _differs(row[field], row[f'expected_{field}'])
+    ]
+
+
+def meal_plan_drift(meal_plans: Optional[Iterable[int]] = None) -> Dict[str, list]:
+    """Out-of-date totals of days and plans, optionally limited to some plan ids"""
+    days = MealPlanDay.objects.all()
+    plans = MealPlan.objects.all()
+    if meal_plans is not None:
+        days = days.filter(meal_plan__in=meal_plans)
+        plans = plans.filter(pk__in=meal_plans)
+    return {
+        'days': find_drift(days, 'day'),
+        'meal_plans': find_drift(plans, 'day__meal_plan'),
+    }
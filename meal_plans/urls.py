@@ -1,12 +1,14 @@
-from django.urls import path
+from django.urls import path, include
+from rest_framework.routers import SimpleRouter
 from . import views
 
-app_name = 'meal_plans'
+router = SimpleRouter()
+router.register('meal-types', views.MealTypeViewSet)
+router.register('days', views.MealPlanDayViewSet, basename='mealplanday')
+router.register('meals', views.MealViewSet, basename='meal')
+router.register('jobs', views.MealPlanJobViewSet, basename='mealplanjob')
+router.register('', views.MealPlanViewSet, basename='mealplan')
 
 urlpatterns = [
-    path('', views.MealPlanList.as_view(), name='meal-plan-list'),
-    path('<int:pk>/', views.MealPlanDetail.as_view(), name='meal-plan-detail'),
-    path('generate/', views.GenerateMealPlan.as_view(), name='generate-meal-plan'),
-    path('<int:plan_id>/meals/', views.PlanMealList.as_view(), name='plan-meal-list'),
-    path('<int:plan_id>/meals/<int:pk>/', views.PlanMealDetail.as_view(), name='plan-meal-detail'),
+    path('', include(router.urls)),
 ]
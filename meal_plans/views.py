@@ -2,29 +2,46 @@ from django.shortcuts import render
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAuthenticated, IsAdminUser
+from django.db.models import Count, F, Sum
+from django.db.models.functions import Coalesce
 from django.utils import timezone
+from django.utils.dateparse import parse_date
 from datetime import timedelta
+from meal_planner_project.fieldsets import ExpandableQuerysetMixin
+from meal_planner_project.pagination import KeysetPagination
 from recipes.models import Recipe
 
-from .models import MealPlan, MealPlanDay, MealType, Meal
+from .models import MealPlan, MealPlanDay, MealType, Meal, MealPlanJob
 from .serializers import (
     MealPlanSerializer, MealPlanDaySerializer,
-    MealTypeSerializer, MealSerializer
+    MealTypeSerializer, MealSerializer, MealPlanJobSerializer
 )
 from .local_ai_service import LocalAIMealPlannerService
+from .inference import get_meal_planner_service
+from .jobs import enqueue_meal_plan_job, queue_metrics
+from .model_registry import model_registry
+
+def _is_truthy(value):
+    return str(value).lower() in ('1', 'true', 'yes')
 
 class MealTypeViewSet(viewsets.ModelViewSet):
     queryset = MealType.objects.all()
     serializer_class = MealTypeSerializer
     permission_classes = [IsAuthenticated]
 
-class MealPlanViewSet(viewsets.ModelViewSet):
+class MealPlanViewSet(ExpandableQuerysetMixin, viewsets.ModelViewSet):
     serializer_class = MealPlanSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
+    keyset_ordering = ('-start_date',)
 
     def get_queryset(self):
-        return MealPlan.objects.filter(user=self.request.user)
+        queryset = MealPlan.objects.filter(user=self.request.user)
+        # Only the serialised plan needs its nested rows; other actions load their own
+        if self.action in ('list', 'retrieve'):
+            queryset = self.optimize_queryset(queryset)
+        return queryset
 
     @action(detail=False, methods=['POST'])
     def create_weekly(self, request):
@@ -54,7 +71,11 @@ class MealPlanViewSet(viewsets.ModelViewSet):
 
     @action(detail=False, methods=['POST'])
     def generate_ai_meal_plan(self, request):
-        """Generate a meal plan using local AI based on user preferences"""
+        """Generate a meal plan using local AI based on user preferences.
+
+        With ``async`` set, the generation is queued and a 202 with the job is
+        returned; poll ``/api/meal-plans/jobs/{id}/`` for the resulting plan.
+        """
         try:
             # Validate user preferences
             preferences = {
@@ -62,11 +83,21 @@ class MealPlanViewSet(viewsets.ModelViewSet):
                 'restrictions': request.data.get('restrictions', []),
                 'target_calories': request.data.get('target_calories', 2000),
                 'meals_per_day': request.data.get('meals_per_day', 3),
-                'days': request.data.get('days', 7)
+                'days': request.data.get('days', 7),
+                'engine': request.data.get('engine', 'auto'),
+                'seed': request.data.get('seed'),
+                'user_id': request.user.id
             }
 
-            # Initialize local AI service
-            ai_service = LocalAIMealPlannerService()
+            if _is_truthy(request.data.get('async', request.query_params.get('async'))):
+                job = enqueue_meal_plan_job(request.user, preferences)
+                return Response(
+                    MealPlanJobSerializer(job).data,
+                    status=status.HTTP_202_ACCEPTED
+                )
+
+            # Initialize local AI service (or the shared inference server)
+            ai_service = get_meal_planner_service()
 
             # Generate meal plan data
             meal_plan_data = ai_service.generate_meal_plan(preferences)
@@ -79,7 +110,10 @@ class MealPlanViewSet(viewsets.ModelViewSet):
             )
 
             serializer = self.get_serializer(meal_plan)
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
+            data = serializer.data
+            # Which engine produced the plan, and the solver's score and time
+            data['generation'] = meal_plan_data.get('solver')
+            return Response(data, status=status.HTTP_201_CREATED)
 
         except Exception as e:
             return Response(
@@ -106,10 +140,11 @@ class MealPlanViewSet(viewsets.ModelViewSet):
 
             preferences = {
                 'dietary_preferences': request.data.get('dietary_preferences', []),
-                'restrictions': request.data.get('restrictions', [])
+                'restrictions': request.data.get('restrictions', []),
+                'user_id': request.user.id
             }
 
-            ai_service = LocalAIMealPlannerService()
+            ai_service = get_meal_planner_service()
             alternatives = ai_service.suggest_recipe_alternatives(
                 meal.recipe,
                 preferences
@@ -166,10 +201,54 @@ class MealPlanViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
+    @action(detail=False, methods=['GET'], permission_classes=[IsAdminUser])
+    def ai_status(self, request):
+        """Report load time, memory use and hit counters of the local models"""
+        return Response(model_registry.stats())
+
     @action(detail=True, methods=['GET'])
     def nutritional_summary(self, request, pk=None):
-        """Get nutritional summary for the meal plan"""
+        """Get nutritional summary for the meal plan.
+
+        Optional query parameters: ``start_date`` and ``end_date`` (YYYY-MM-DD)
+        restrict the days summarised, and ``breakdown=meal_type`` adds per-day
+        totals for each meal type. Reads the days' stored totals, or runs one
+        aggregate query over the meals for the breakdown.
+        """
         meal_plan = self.get_object()
+        days = MealPlanDay.objects.filter(meal_plan=meal_plan)
+        for param, lookup in (('start_date', 'date__gte'), ('end_date', 'date__lte')):
+            value = request.query_params.get(param)
+            if value:
+                date = parse_date(value)
+                if date is None:
+                    return Response(
+                        {'error': f'{param} must be a date in YYYY-MM-DD format'},
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
+                days = days.filter(**{lookup: date})
+
+        by_meal_type = request.query_params.get('breakdown') == 'meal_type'
+        if by_meal_type:
+            group_by = ['date', 'meals__meal_type__name']
+            rows = days.values(*group_by).annotate(
+                calories=Coalesce(Sum(F('meals__recipe__calories_per_serving') * F('meals__servings')), 0),
+                protein=Coalesce(Sum(F('meals__recipe__protein') * F('meals__servings')), 0.0),
+                carbs=Coalesce(Sum(F('meals__recipe__carbs') * F('meals__servings')), 0.0),
+                fat=Coalesce(Sum(F('meals__recipe__fat') * F('meals__servings')), 0.0),
+                num_meals=Count('meals'),
+            ).order_by(*group_by)
+        else:
+            # Days store their own totals, so no meals need to be read
+            rows = days.values(
+                'date',
+                calories=F('total_calories'),
+                protein=F('total_protein'),
+                carbs=F('total_carbs'),
+                fat=F('total_fat'),
+                num_meals=F('meal_count'),
+            ).order_by('date')
+
         summary = {
             'total_calories': 0,
             'total_protein': 0,
@@ -178,39 +257,27 @@ class MealPlanViewSet(viewsets.ModelViewSet):
             'daily_averages': {},
             'meals_per_day': {}
         }
+        if by_meal_type:
+            summary['meal_types'] = {}
 
-        for day in meal_plan.days.all():
-            day_calories = 0
-            day_protein = 0
-            day_carbs = 0
-            day_fat = 0
-            day_meals = 0
-
-            for meal in day.meals.all():
-                calories = meal.get_calories()
-                nutrients = meal.get_nutrients()
-                
-                day_calories += calories
-                day_protein += nutrients['protein']
-                day_carbs += nutrients['carbs']
-                day_fat += nutrients['fat']
-                day_meals += 1
-
-            date_str = day.date.strftime('%Y-%m-%d')
-            summary['daily_averages'][date_str] = {
-                'calories': day_calories,
-                'protein': day_protein,
-                'carbs': day_carbs,
-                'fat': day_fat
-            }
-            summary['meals_per_day'][date_str] = day_meals
-
-            summary['total_calories'] += day_calories
-            summary['total_protein'] += day_protein
-            summary['total_carbs'] += day_carbs
-            summary['total_fat'] += day_fat
-
-        days_count = meal_plan.days.count()
+        for row in rows:
+            date_str = row['date'].strftime('%Y-%m-%d')
+            day = summary['daily_averages'].setdefault(
+                date_str, {'calories': 0, 'protein': 0, 'carbs': 0, 'fat': 0}
+            )
+            for nutrient in ('calories', 'protein', 'carbs', 'fat'):
+                day[nutrient] += row[nutrient]
+                summary[f'total_{nutrient}'] += row[nutrient]
+            summary['meals_per_day'][date_str] = summary['meals_per_day'].get(date_str, 0) + row['num_meals']
+
+            if by_meal_type:
+                meal_types = summary['meal_types'].setdefault(date_str, {})
+                if row['meals__meal_type__name'] is not None:
+                    meal_types[row['meals__meal_type__name']] = {
+                        nutrient: row[nutrient] for nutrient in ('calories', 'protein', 'carbs', 'fat')
+                    }
+
+        days_count = len(summary['daily_averages'])
         if days_count > 0:
             summary['average_daily_calories'] = summary['total_calories'] / days_count
             summary['average_daily_protein'] = summary['total_protein'] / days_count
@@ -219,19 +286,19 @@ class MealPlanViewSet(viewsets.ModelViewSet):
 
         return Response(summary)
 
-class MealPlanDayViewSet(viewsets.ModelViewSet):
+class MealPlanDayViewSet(ExpandableQuerysetMixin, viewsets.ModelViewSet):
     serializer_class = MealPlanDaySerializer
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        return MealPlanDay.objects.filter(meal_plan__user=self.request.user)
+        return self.optimize_queryset(MealPlanDay.objects.filter(meal_plan__user=self.request.user))
 
-class MealViewSet(viewsets.ModelViewSet):
+class MealViewSet(ExpandableQuerysetMixin, viewsets.ModelViewSet):
     serializer_class = MealSerializer
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        return Meal.objects.filter(day__meal_plan__user=self.request.user)
+        return self.optimize_queryset(Meal.objects.filter(day__meal_plan__user=self.request.user))
 
     def perform_create(self, serializer):
         # Ensure the meal plan belongs to the user
@@ -239,3 +306,16 @@ class MealViewSet(viewsets.ModelViewSet):
         if day.meal_plan.user != self.request.user:
             raise PermissionError("You don't have permission to add meals to this plan")
         serializer.save()
+
+class MealPlanJobViewSet(viewsets.ReadOnlyModelViewSet):
+    """Status of queued meal-plan generations"""
+    serializer_class = MealPlanJobSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return MealPlanJob.objects.filter(user=self.request.user).order_by('-created_at')
+
+    @action(detail=False, methods=['GET'], permission_classes=[IsAdminUser])
+    def metrics(self, request):
+        """Queue depth and job counts by status"""
+        return Response(queue_metrics())
@@ -0,0 +1,42 @@
+"""
+A version token for the recipe table, kept in the Django cache.
+
+Per-process caches built from recipes (``meal_plans.recipe_pool``) compare
+the token instead of querying the table on every request. ``recipes.signals``
+replaces it whenever a Recipe is saved or deleted; bulk writes that change
+recipe rows without signals (``bulk_create``, ``bulk_update``,
+``QuerySet.update``) call ``bump_recipe_version`` themselves.
+
+The token is random rather than a counter, so a cache that loses the key
+hands out a new token instead of repeating an old one. With several processes
+the cache must be shared (see ``CACHES`` in settings).
+"""
+import uuid
+
+from django.core.cache import cache
+from django.db import transaction
+
+RECIPE_VERSION_KEY = 'recipes:version'
+
+
+def recipe_version() -> str:
+    """The current token, starting one if the cache has none"""
+    version = cache.get(RECIPE_VERSION_KEY)
+    if version is None:
+        cache.add(RECIPE_VERSION_KEY, uuid.uuid4().hex, None)
+        version = cache.get(RECIPE_VERSION_KEY)
+    return version
+
+
+def _new_version():
+    cache.set(RECIPE_VERSION_KEY, uuid.uuid4().hex, None)
+
+
+def bump_recipe_version():
+    """Mark the recipe table changed, now and again once the transaction commits.
+
+    A reader that sees the first token before the commit may load the old
+    rows; the second token makes it look again.
+    """
+    _new_version()
+    transaction.on_commit(_new_version)
@@ -0,0 +1,131 @@
+"""
+Recipe fingerprints for deduplication.
+
+``content_hash`` is a SHA-256 over the normalised title, ingredients and
+macros, so two recipes with the same content always hash the same.
+``minhash_signature`` summarises the set of ingredient names; recipes whose
+signatures land in the same LSH bucket and agree on nearly all positions share
+most of their ingredients and are candidates for folding together.
+"""
+import hashlib
+import json
+import random
+import re
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Sequence, Set
+
+NUM_PERMUTATIONS = 64
+LSH_BANDS = 16
+LSH_ROWS = NUM_PERMUTATIONS // LSH_BANDS
+
+# A near duplicate must share this much of its ingredient set...
+NEAR_DUPLICATE_JACCARD = 0.8
+# ...and have every macro within this fraction of the other recipe
+NEAR_DUPLICATE_MACRO_TOLERANCE = 0.1
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_rng = random.Random(0x5EED)
+_PERMUTATIONS = [
+    (_rng.randrange(1, _MERSENNE_PRIME), _rng.randrange(0, _MERSENNE_PRIME))
+    for _ in range(NUM_PERMUTATIONS)
+]
+_WHITESPACE = re.compile(r'\s+')
+_PUNCTUATION = re.compile(r'[^\w\s]')
+
+MACRO_FIELDS = ('calories_per_serving', 'protein', 'carbs', 'fat')
+
+
+def normalise_text(value: str) -> str:
+    return _WHITESPACE.sub(' ', _PUNCTUATION.sub(' ', str(value or '').lower())).strip()
+
+
+def normalise_ingredients(ingredients: Iterable[Dict[str, Any]]) -> List[List[Any]]:
+    """Ingredients as sorted ``[name, amount, unit]`` triples, amounts rounded"""
+    return sorted(
+        [
+            normalise_text(ingredient.get('name')),
+            round(float(ingredient.get('amount') or 0), 1),
+            normalise_text(ingredient.get('unit')),
+        ]
+        for ingredient in ingredients or []
+    )
+
+
+def content_hash(title: str, ingredients: Iterable[Dict[str, Any]], macros: Sequence[float]) -> str:
+    """Canonical hash of a recipe's title, ingredients and macros"""
+    payload = [
+        normalise_text(title),
+        normalise_ingredients(ingredients),
+        [round(float(value or 0), 1) for value in macros],
+    ]
+    return hashlib.sha256(json.dumps(payload, separators=(',', ':')).encode()).hexdigest()
+
+
+def ingredient_names(ingredients: Iterable[Dict[str, Any]]) -> Set[str]:
+    return {normalise_text(ingredient.get('name')) for ingredient in ingredients or []} - {''}
+
+
+def _token_hash(token: str) -> int:
+    return int.from_bytes(hashlib.blake2b(token.encode(), digest_size=8).digest(), 'big')
+
+
+def minhash_signature(tokens: Iterable[str]) -> List[int]:
+    """MinHash signature of a token set (empty for an empty set)"""
+    hashes = [_token_hash(token) for token in set(tokens)]
+    if not hashes:
+        return []
+    return [
+        min((a * h + b) % _MERSENNE_PRIME for h in hashes)
+        for a, b in _PERMUTATIONS
+    ]
+
+
+def estimate_jaccard(first: Sequence[int], second: Sequence[int]) -> float:
+    if not first or len(first) != len(second):
+        return 0.0
+    return sum(1 for a, b in zip(first, second) if a == b) / len(first)
+
+
+def macros_close(first: Sequence[float], second: Sequence[float],
+                 tolerance: float = NEAR_DUPLICATE_MACRO_TOLERANCE) -> bool:
+    return all(
+        abs(a - b) <= tolerance * max(abs(a), abs(b), 1)
+        for a, b in zip(first, second)
+    )
+
+
+class NearDuplicateIndex:
+    """Banded LSH over MinHash signatures for finding near-duplicate recipes"""
+
+    def __init__(self):
+        self._buckets = defaultdict(list)
+        self._entries = {}
+
+    def add(self, key, signature: Sequence[int], macros: Sequence[float]):
+        if not signature:
+            return
+        self._entries[key] = (list(signature), list(macros))
+        for bucket in self._bands(signature):
+            self._buckets[bucket].append(key)
+
+    def find(self, signature: Sequence[int], macros: Sequence[float]):
+        """Key of the closest near duplicate, or None"""
+        if not signature:
+            return None
+        best_key, best_score = None, NEAR_DUPLICATE_JACCARD
+        seen = set()
+        for bucket in self._bands(signature):
+            for key in self._buckets.get(bucket, ()):
+                if key in seen:
+                    continue
+                seen.add(key)
+                other_signature, other_macros = self._entries[key]
+                score = estimate_jaccard(signature, other_signature)
+                if score >= best_score and macros_close(macros, other_macros):
+                    best_key, best_score = key, score
+        return best_key
+
+    @staticmethod
+    def _bands(signature: Sequence[int]):
+        for band in range(LSH_BANDS):
+            yield (band, tuple(signature[band * LSH_ROWS:(band + 1) * LSH_ROWS]))
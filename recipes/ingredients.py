@@ -0,0 +1,90 @@
+"""
+The RecipeIngredient index derived from ``Recipe.ingredients``.
+
+Each JSON ingredient becomes a row with a normalised name, its category and
+its quantity in a base unit (see ``units``; volumes of ingredients with a
+known density become grams), so ingredient filters and aggregates are
+indexed joins instead of JSON parsing. Rows are rewritten by
+the Recipe post_save handler in ``recipes.signals``, by ``sync_recipe_ingredients``
+after bulk inserts, and by ``manage.py backfill_recipe_ingredients``.
+"""
+import re
+from typing import Any, Iterable, List
+
+from django.db import transaction
+
+from .dedup import normalise_text
+from .models import Recipe, RecipeIngredient
+from .units import to_base
+
+_IRREGULAR_PLURALS = {'leaves': 'leaf', 'loaves': 'loaf', 'potatoes': 'potato', 'tomatoes': 'tomato'}
+_KEEP_TRAILING_S = re.compile(r'(ss|us|is|ous)$')
+
+
+def _singular(word: str) -> str:
+    if word in _IRREGULAR_PLURALS:
+        return _IRREGULAR_PLURALS[word]
+    if len(word) > 4 and word.endswith('ies'):
+        return word[:-3] + 'y'
+    if len(word) > 3 and word.endswith('s') and not _KEEP_TRAILING_S.search(word):
+        return word[:-1]
+    return word
+
+
+def normalise_ingredient_name(name: Any) -> str:
+    """Lower-case, punctuation-free name with a singular last word ("Chickpeas" -> "chickpea")"""
+    words = normalise_text(name).split(' ')
+    words[-1] = _singular(words[-1])
+    return ' '.join(words)[:200]
+
+
+def build_ingredient_rows(recipe: Recipe) -> List[RecipeIngredient]:
+    rows = []
+    for position, ingredient in enumerate(recipe.ingredients or []):
+        if not isinstance(ingredient, dict) or not ingredient.get('name'):
+            continue
+        try:
+            amount = float(ingredient['amount']) if ingredient.get('amount') is not None else None
+        except (TypeError, ValueError):
+            amount = None
+        name = normalise_ingredient_name(ingredient['name'])
+        quantity, unit = to_base(amount, ingredient.get('unit'), name)
+        rows.append(RecipeIngredient(
+            recipe_id=recipe.pk,
+            position=position,
+            name=name,
+            category=str(ingredient.get('category') or '')[:100],
+            quantity=quantity,
+            unit=unit[:20],
+        ))
+    return rows
+
+
+@transaction.atomic
+def sync_recipe_ingredients(recipes: Iterable[Recipe]):
+    """Replace the ingredient rows of saved recipes: one DELETE and one bulk INSERT"""
+    recipes = [recipe for recipe in recipes if recipe.pk is not None]
+    if not recipes:
+        return
+    RecipeIngredient.objects.filter(recipe__in=[recipe.pk for recipe in recipes]).delete()
+    RecipeIngredient.objects.bulk_create(
+        [row for recipe in recipes for row in build_ingredient_rows(recipe)]
+    )
+
+
+def filter_by_ingredients(queryset, include: Iterable[str] = (), exclude: Iterable[str] = ()):
+    """Recipes containing every ``include`` ingredient and none of ``exclude``.
+
+    Names are matched after normalisation, through the indexed ingredient rows.
+    """
+    for name in {normalise_ingredient_name(name) for name in include if str(name).strip()}:
+        queryset = queryset.filter(
+            id__in=RecipeIngredient.objects.filter(name=name).values('recipe_id')
+        )
+    excluded = {normalise_ingredient_name(name) for name in exclude if str(name).strip()}
+    if excluded:
+        queryset = queryset.exclude(
+            id__in=RecipeIngredient.objects.filter(name__in=excluded).values('recipe_id')
+        )
+    return queryset
+
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from recipes.changes import bump_recipe_version
+from recipes.models import Recipe
+from recipes.tags import set_dietary_masks
+
+
+class Command(BaseCommand):
+    help = 'Intern the dietary tags of every recipe and recompute Recipe.dietary_mask'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        recipes = Recipe.objects.order_by('id').only('id', 'dietary_tags', 'dietary_mask', 'updated_at')
+        done = changed = 0
+        last_id = 0
+        while True:
+            batch = list(recipes.filter(id__gt=last_id)[:batch_size])
+            if not batch:
+                break
+            previous = {recipe.id: recipe.dietary_mask for recipe in batch}
+            set_dietary_masks(batch)
+            stale = [recipe for recipe in batch if recipe.dietary_mask != previous[recipe.id]]
+            # bulk_update skips auto_now and signals; touching updated_at and
+            # the recipe version makes running processes refresh their
+            # meal-plan recipe pools
+            now = timezone.now()
+            for recipe in stale:
+                recipe.updated_at = now
+            Recipe.objects.bulk_update(stale, ['dietary_mask', 'updated_at'])
+            if stale:
+                bump_recipe_version()
+            done += len(batch)
+            changed += len(stale)
+            last_id = batch[-1].id
+            self.stdout.write(f"Checked {done} recipes", ending='\r')
+        self.stdout.write(self.style.SUCCESS(f"Checked {done} recipes, updated {changed} dietary masks"))
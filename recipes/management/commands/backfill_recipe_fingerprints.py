@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Recompute Recipe.content_hash and Recipe.ingredient_signature of every recipe'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        recipes = Recipe.objects.order_by('id').only(
+            'id', 'title', 'ingredients', 'calories_per_serving', 'protein', 'carbs', 'fat',
+            'content_hash', 'ingredient_signature'
+        )
+        done = changed = 0
+        last_id = 0
+        while True:
+            batch = list(recipes.filter(id__gt=last_id)[:batch_size])
+            if not batch:
+                break
+            stale = []
+            for recipe in batch:
+                previous = (recipe.content_hash, recipe.ingredient_signature)
+                recipe.update_fingerprint()
+                if (recipe.content_hash, recipe.ingredient_signature) != previous:
+                    stale.append(recipe)
+            Recipe.objects.bulk_update(stale, ['content_hash', 'ingredient_signature'])
+            done += len(batch)
+            changed += len(stale)
+            last_id = batch[-1].id
+            self.stdout.write(f"Checked {done} recipes", ending='\r')
+        self.stdout.write(self.style.SUCCESS(f"Checked {done} recipes, updated {changed} fingerprints"))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from recipes.ingredients import sync_recipe_ingredients
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the RecipeIngredient rows of every recipe from Recipe.ingredients'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        recipes = Recipe.objects.order_by('id').only('id', 'ingredients')
+        done = 0
+        last_id = 0
+        while True:
+            batch = list(recipes.filter(id__gt=last_id)[:batch_size])
+            if not batch:
+                break
+            sync_recipe_ingredients(batch)
+            done += len(batch)
+            last_id = batch[-1].id
+            self.stdout.write(f"Indexed ingredients of {done} recipes", ending='\r')
+        self.stdout.write(self.style.SUCCESS(f"Indexed ingredients of {done} recipes"))
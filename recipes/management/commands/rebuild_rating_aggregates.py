@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from recipes.ratings import refresh_rating_aggregates
+
+
+class Command(BaseCommand):
+    help = 'Recompute recipe rating_count and rating_sum from the ratings table and reset the leaderboards'
+
+    def handle(self, *args, **options):
+        refresh_rating_aggregates()
+        self.stdout.write(self.style.SUCCESS("Rebuilt recipe rating aggregates"))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from recipes.search import rebuild_search_index, supports_fts
+
+
+class Command(BaseCommand):
+    help = 'Recreate the full-text recipe search index from the recipe table'
+
+    def handle(self, *args, **options):
+        if not supports_fts():
+            self.stdout.write("The database has no FTS5 support; search uses plain matching")
+            return
+        count = rebuild_search_index()
+        self.stdout.write(self.style.SUCCESS(f"Indexed {count} recipes"))
@@ -0,0 +1,23 @@
+# Generated by Django 5.0 on 2026-10-18 07:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='content_hash',
+            field=models.CharField(blank=True, db_index=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='ingredient_signature',
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.0 on 2026-10-18 06:08
+
+from django.db import migrations
+
+# Kept in step with recipes.search, written out here so the migration does
+# not change when that module does
+CREATE_INDEX = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS recipes_recipe_fts USING fts5("
+    "title, description, instructions, ingredients, "
+    "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3 4')"
+)
+FILL_INDEX = (
+    "INSERT INTO recipes_recipe_fts (rowid, title, description, instructions, ingredients) "
+    "SELECT r.id, r.title, r.description, r.instructions, "
+    "(SELECT group_concat(json_extract(i.value, '$.name'), ' ') FROM json_each(r.ingredients) i) "
+    "FROM recipes_recipe r"
+)
+
+
+def create_search_index(apps, schema_editor):
+    # FTS5 is SQLite only; elsewhere recipes.search falls back to icontains
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(CREATE_INDEX)
+    schema_editor.execute("DELETE FROM recipes_recipe_fts")
+    schema_editor.execute(FILL_INDEX)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute("DROP TABLE IF EXISTS recipes_recipe_fts")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0003_rating_stats'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.0 on 2026-10-18 07:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0004_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeIngredient',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.PositiveSmallIntegerField()),
+                ('name', models.CharField(help_text='Normalised ingredient name', max_length=200)),
+                ('category', models.CharField(blank=True, max_length=100)),
+                ('quantity', models.FloatField(blank=True, help_text='Amount in the base unit', null=True)),
+                ('unit', models.CharField(help_text='Base unit: g, ml, pcs or an unconverted unit', max_length=20)),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ingredient_rows', to='recipes.recipe')),
+            ],
+            options={
+                'ordering': ['recipe', 'position'],
+                'indexes': [models.Index(fields=['name', 'recipe'], name='recipeingredient_name_idx')],
+                'unique_together': {('recipe', 'position')},
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.0 on 2026-10-18 07:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0005_recipe_ingredient'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DietaryTag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('bit', models.PositiveSmallIntegerField(unique=True)),
+            ],
+            options={
+                'ordering': ['bit'],
+            },
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='dietary_mask',
+            field=models.BigIntegerField(db_index=True, default=0),
+        ),
+    ]
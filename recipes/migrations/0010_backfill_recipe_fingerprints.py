@@ -0,0 +1,36 @@
+from django.db import migrations
+
+from recipes import dedup
+
+MACRO_FIELDS = ('calories_per_serving', 'protein', 'carbs', 'fat')
+
+
+def fill_fingerprints(apps, schema_editor):
+    # Recipes saved before 0002_recipe_fingerprints have empty fingerprints and
+    # would never be reused; the historical model has no update_fingerprint
+    Recipe = apps.get_model('recipes', 'Recipe')
+    recipes = Recipe.objects.filter(content_hash='').order_by('id').only(
+        'id', 'title', 'ingredients', *MACRO_FIELDS, 'content_hash', 'ingredient_signature'
+    )
+    batch = []
+    for recipe in recipes.iterator(chunk_size=1000):
+        recipe.content_hash = dedup.content_hash(
+            recipe.title, recipe.ingredients, [getattr(recipe, field) for field in MACRO_FIELDS]
+        )
+        recipe.ingredient_signature = dedup.minhash_signature(dedup.ingredient_names(recipe.ingredients))
+        batch.append(recipe)
+        if len(batch) == 1000:
+            Recipe.objects.bulk_update(batch, ['content_hash', 'ingredient_signature'])
+            batch = []
+    Recipe.objects.bulk_update(batch, ['content_hash', 'ingredient_signature'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0009_recipe_updated_at_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_fingerprints, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth.models import User
+from . import dedup
 
 class Recipe(models.Model):
     title = models.CharField(max_length=200)
@@ -16,15 +17,92 @@ class Recipe(models.Model):
     dietary_tags = models.JSONField(default=list)  # ['vegan', 'keto', etc.]
     image = models.ImageField(upload_to='recipe_images/', null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
-    updated_at = models.DateTimeField(auto_now=True)
-    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True)
+    # Indexed for the incremental refresh of meal_plans.recipe_pool
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+    # Indexed by recipe_owner_created_idx
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, db_index=False)
     is_public = models.BooleanField(default=True)
+    # Fingerprints used to reuse identical and near-identical recipes
+    content_hash = models.CharField(max_length=64, blank=True, db_index=True)
+    ingredient_signature = models.JSONField(default=list, blank=True)
+    # Rating aggregates, maintained by recipes.ratings.rate_recipe
+    rating_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
+    # Bits of dietary_tags, see recipes.tags; recomputed on save
+    dietary_mask = models.BigIntegerField(default=0, db_index=True)
 
     def __str__(self):
         return self.title
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Keyset pagination, see meal_planner_project.pagination
+            models.Index(fields=['-created_at', '-id'], name='recipe_created_idx'),
+            # my_recipes and the per-user dedup pool in meal_plans.materialize
+            models.Index(fields=['created_by', '-created_at', '-id'], name='recipe_owner_created_idx'),
+        ]
+
+    @property
+    def average_rating(self):
+        if not self.rating_count:
+            return None
+        return self.rating_sum / self.rating_count
+
+    @property
+    def macros(self):
+        return [getattr(self, field) for field in dedup.MACRO_FIELDS]
+
+    def update_fingerprint(self):
+        """Recompute content_hash and ingredient_signature from the content"""
+        self.content_hash = dedup.content_hash(self.title, self.ingredients, self.macros)
+        self.ingredient_signature = dedup.minhash_signature(dedup.ingredient_names(self.ingredients))
+
+    def update_dietary_mask(self):
+        """Recompute dietary_mask from dietary_tags, interning new tags"""
+        from .tags import set_dietary_masks
+        set_dietary_masks([self])
+
+    def save(self, *args, **kwargs):
+        self.update_fingerprint()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'dietary_tags' in update_fields:
+            self.update_dietary_mask()
+        if update_fields is not None:
+            kwargs['update_fields'] = set(update_fields) | {'content_hash', 'ingredient_signature'}
+            if 'dietary_tags' in update_fields:
+                kwargs['update_fields'].add('dietary_mask')
+        super().save(*args, **kwargs)
+
+class DietaryTag(models.Model):
+    """A dietary tag and its bit in Recipe.dietary_mask, see recipes.tags"""
+    name = models.CharField(max_length=50, unique=True)
+    bit = models.PositiveSmallIntegerField(unique=True)
+
+    class Meta:
+        ordering = ['bit']
+
+    def __str__(self):
+        return self.name
+
+class RecipeIngredient(models.Model):
+    """One ingredient of a recipe, derived from Recipe.ingredients by recipes.ingredients"""
+    recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE, related_name='ingredient_rows')
+    position = models.PositiveSmallIntegerField()
+    name = models.CharField(max_length=200, help_text="Normalised ingredient name")
+    category = models.CharField(max_length=100, blank=True)
+    quantity = models.FloatField(null=True, blank=True, help_text="Amount in the base unit")
+    unit = models.CharField(max_length=20, help_text="Base unit: g, ml, pcs or an unconverted unit")
+
+    class Meta:
+        ordering = ['recipe', 'position']
+        unique_together = ['recipe', 'position']
+        indexes = [
+            models.Index(fields=['name', 'recipe'], name='recipeingredient_name_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.quantity} {self.unit} of {self.name}"
 
 class RecipeRating(models.Model):
     recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE, related_name='ratings')
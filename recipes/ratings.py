@@ -0,0 +1,195 @@
+"""
+Recipe rating aggregates and the top-rated leaderboard.
+
+Each Recipe stores ``rating_count`` and ``rating_sum``, adjusted in the same
+transaction that writes a rating, so averages never need the ratings table.
+
+The leaderboard keeps the best ``LEADERBOARD_SIZE`` recipes per ranking in the
+Django cache. After each rating commits, only the rated recipe is moved,
+inserted or dropped. The list is rebuilt from the stored aggregates when it is
+missing, has expired, or has lost members and become shorter than a request
+needs. Updates to a board are serialised by a lock taken with ``cache.add``
+in the same cache, so with several processes the cache must be a shared
+backend (see ``CACHES`` in settings); a local-memory cache gives each process
+its own boards.
+
+Rankings:
+
+* ``average``: ``rating_sum / rating_count``
+* ``bayesian``: the average pulled towards ``PRIOR_MEAN`` as if each recipe
+  had ``PRIOR_WEIGHT`` extra ratings of that value, so a single 5-star rating
+  does not outrank many 4.8s. The prior is fixed (not the live global mean)
+  so one rating never changes the score of other recipes.
+"""
+import bisect
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F, FloatField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Cast, Coalesce
+
+from .models import Recipe, RecipeRating
+
+DEFAULT_RATING_SETTINGS = {
+    'PRIOR_MEAN': 3.0,
+    'PRIOR_WEIGHT': 5,
+    'LEADERBOARD_SIZE': 50,
+    'CACHE_TIMEOUT': 300,
+}
+RANKINGS = ('average', 'bayesian')
+LEADERBOARD_KEY = 'recipes:leaderboard:{}'
+LEADERBOARD_LOCK_KEY = 'recipes:leaderboard:{}:lock'
+# Seconds a lock outlives a holder that died, and a writer waits for it
+LOCK_TIMEOUT = 10
+LOCK_WAIT = 2.0
+
+
+class InvalidRating(ValueError):
+    """The rating is not an integer from 1 to 5"""
+
+
+def rating_settings() -> Dict[str, Any]:
+    return {**DEFAULT_RATING_SETTINGS, **getattr(settings, 'RECIPE_RATINGS', {})}
+
+
+def rating_score(rating_sum: float, rating_count: int, ranking: str = 'average') -> Optional[float]:
+    """Score of a recipe under a ranking, or None if it has no ratings"""
+    if not rating_count:
+        return None
+    if ranking == 'bayesian':
+        options = rating_settings()
+        weight = options['PRIOR_WEIGHT']
+        return (weight * options['PRIOR_MEAN'] + rating_sum) / (weight + rating_count)
+    return rating_sum / rating_count
+
+
+def _score_expression(ranking: str):
+    total = Cast(F('rating_sum'), FloatField())
+    count = F('rating_count')
+    if ranking == 'bayesian':
+        options = rating_settings()
+        weight = options['PRIOR_WEIGHT']
+        return (total + Value(weight * options['PRIOR_MEAN'])) / (count + Value(weight))
+    return total / count
+
+
+def _sort_key(entry) -> Tuple[float, int, int]:
+    score, count, recipe_id = entry
+    return -score, -count, recipe_id
+
+
+def rate_recipe(recipe: Recipe, user, rating, comment: str = '') -> RecipeRating:
+    """Create or replace the user's rating and adjust the recipe's aggregates"""
+    try:
+        rating = int(rating)
+    except (TypeError, ValueError):
+        raise InvalidRating("Rating must be an integer from 1 to 5")
+    if not 1 <= rating <= 5:
+        raise InvalidRating("Rating must be an integer from 1 to 5")
+
+    with transaction.atomic():
+        previous = RecipeRating.objects.select_for_update().filter(
+            recipe=recipe, user=user
+        ).values_list('rating', flat=True).first()
+        recipe_rating, created = RecipeRating.objects.update_or_create(
+            recipe=recipe,
+            user=user,
+            defaults={'rating': rating, 'comment': comment}
+        )
+        Recipe.objects.filter(pk=recipe.pk).update(
+            rating_count=F('rating_count') + (1 if previous is None else 0),
+            rating_sum=F('rating_sum') + rating - (previous or 0),
+        )
+        recipe.refresh_from_db(fields=['rating_count', 'rating_sum'])
+        rating_sum, rating_count = recipe.rating_sum, recipe.rating_count
+        transaction.on_commit(lambda: update_leaderboards(recipe.pk, rating_sum, rating_count))
+    return recipe_rating
+
+
+def refresh_rating_aggregates(queryset=None):
+    """Recompute stored aggregates from the ratings table and drop the leaderboards"""
+    ratings = RecipeRating.objects.filter(recipe=OuterRef('pk')).order_by().values('recipe')
+    (queryset if queryset is not None else Recipe.objects.all()).update(
+        rating_count=Coalesce(Subquery(ratings.annotate(value=Count('pk')).values('value')), Value(0)),
+        rating_sum=Coalesce(Subquery(ratings.annotate(value=Sum('rating')).values('value')), Value(0)),
+    )
+    cache.delete_many([LEADERBOARD_KEY.format(ranking) for ranking in RANKINGS])
+
+
+def _build_leaderboard(ranking: str) -> Dict[str, Any]:
+    size = rating_settings()['LEADERBOARD_SIZE']
+    rows = Recipe.objects.filter(rating_count__gt=0).annotate(
+        score=_score_expression(ranking)
+    ).order_by('-score', '-rating_count', 'id').values_list('score', 'rating_count', 'id')[:size]
+    entries = [list(row) for row in rows]
+    # Fewer rated recipes than the board holds: every rated recipe is on it
+    return {'entries': entries, 'complete': len(entries) < size}
+
+
+def get_leaderboard(ranking: str = 'average', limit: Optional[int] = None) -> List[List]:
+    """The cached ``[score, rating_count, recipe_id]`` entries, best first"""
+    key = LEADERBOARD_KEY.format(ranking)
+    board = cache.get(key)
+    if board is None or (not board['complete'] and len(board['entries']) < (limit or 0)):
+        board = _build_leaderboard(ranking)
+        cache.set(key, board, rating_settings()['CACHE_TIMEOUT'])
+    return board['entries'][:limit]
+
+
+def _acquire_lock(key: str) -> Optional[str]:
+    """Take a cache lock shared by every process using the cache, or None on timeout"""
+    token = uuid.uuid4().hex
+    deadline = time.monotonic() + LOCK_WAIT
+    while not cache.add(key, token, LOCK_TIMEOUT):
+        if time.monotonic() > deadline:
+            return None
+        time.sleep(0.01)
+    return token
+
+
+def _release_lock(key: str, token: str):
+    # Only drop the lock if it has not expired and been taken by another writer
+    if cache.get(key) == token:
+        cache.delete(key)
+
+
+def update_leaderboards(recipe_id: int, rating_sum: float, rating_count: int):
+    """Move one recipe within each cached leaderboard after its aggregates changed"""
+    options = rating_settings()
+    for ranking in RANKINGS:
+        key = LEADERBOARD_KEY.format(ranking)
+        lock_key = LEADERBOARD_LOCK_KEY.format(ranking)
+        token = _acquire_lock(lock_key)
+        if token is None:
+            # Rather than risk losing this change, let the next read rebuild
+            cache.delete(key)
+            continue
+        try:
+            board = cache.get(key)
+            if board is None:
+                continue
+            score = rating_score(rating_sum, rating_count, ranking)
+            entry = [score, rating_count, recipe_id]
+            entries = [item for item in board['entries'] if item[2] != recipe_id]
+            complete = board['complete']
+
+            # Recipes missing from an incomplete board rank no higher than its
+            # last entry, so the recipe only belongs on it if it ranks above that
+            boundary = board['entries'][-1] if board['entries'] else None
+            if score is not None and (complete or boundary is None or _sort_key(entry) <= _sort_key(boundary)):
+                keys = [_sort_key(item) for item in entries]
+                entries.insert(bisect.bisect(keys, _sort_key(entry)), entry)
+            if len(entries) > options['LEADERBOARD_SIZE']:
+                entries = entries[:options['LEADERBOARD_SIZE']]
+                complete = False
+            cache.set(key, {'entries': entries, 'complete': complete}, options['CACHE_TIMEOUT'])
+        finally:
+            _release_lock(lock_key, token)
+
+
+def top_rated_ids(ranking: str = 'average', limit: int = 10) -> List[int]:
+    return [recipe_id for _, _, recipe_id in get_leaderboard(ranking, limit)]
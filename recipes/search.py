@@ -0,0 +1,141 @@
+"""
+Full-text recipe search backed by an SQLite FTS5 index.
+
+``recipes_recipe_fts`` holds one row per recipe (rowid = recipe id) with its
+title, description, instructions and ingredient names. It is created by
+migration ``0004_search_index``, kept in sync by the Recipe signal handlers
+in ``recipes.signals`` (and by ``index_recipes`` after bulk inserts), and can
+be rebuilt from the recipe table with ``manage.py rebuild_recipe_search_index``.
+
+``search_recipes`` joins the index into an ordinary Recipe queryset, so the
+match, BM25 ranking and any other filters run as a single query. Every search
+term matches as a prefix ("chick" finds "chickpea"). On databases without
+FTS5 it falls back to unranked ``icontains`` matching.
+"""
+import re
+from typing import Iterable, List
+
+from django.db import connections, router, transaction
+from django.db.models import Q
+
+from .models import Recipe
+
+FTS_TABLE = 'recipes_recipe_fts'
+SEARCH_FIELDS = ('title', 'description', 'instructions', 'ingredients')
+# BM25 weight of each indexed column, in SEARCH_FIELDS order
+COLUMN_WEIGHTS = (10.0, 2.0, 1.0, 5.0)
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def _connection():
+    return connections[router.db_for_write(Recipe)]
+
+
+def supports_fts(connection=None) -> bool:
+    return (connection or _connection()).vendor == 'sqlite'
+
+
+def ensure_search_index(connection=None):
+    """Create the FTS5 table if it does not exist"""
+    connection = connection or _connection()
+    if not supports_fts(connection):
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+            f"{', '.join(SEARCH_FIELDS)}, "
+            "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3 4')"
+        )
+
+
+def ingredient_text(ingredients) -> str:
+    return ' '.join(
+        str(ingredient.get('name', '')) for ingredient in ingredients or []
+        if isinstance(ingredient, dict)
+    )
+
+
+def index_recipes(recipes: Iterable[Recipe]):
+    """Write (or replace) the index rows of saved recipes"""
+    connection = _connection()
+    if not supports_fts(connection):
+        return
+    rows = [
+        (recipe.pk, recipe.title, recipe.description, recipe.instructions, ingredient_text(recipe.ingredients))
+        for recipe in recipes
+    ]
+    if not rows:
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [(row[0],) for row in rows])
+        cursor.executemany(
+            f"INSERT INTO {FTS_TABLE} (rowid, {', '.join(SEARCH_FIELDS)}) VALUES (%s, %s, %s, %s, %s)",
+            rows
+        )
+
+
+def unindex_recipes(recipe_ids: Iterable[int]):
+    connection = _connection()
+    if not supports_fts(connection):
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [(pk,) for pk in recipe_ids])
+
+
+def rebuild_search_index() -> int:
+    """Recreate the index from the recipe table in one statement; returns the row count.
+
+    The rebuild is one transaction, so searches never see a missing or
+    half-filled index and a failure leaves the old one in place.
+    """
+    connection = _connection()
+    if not supports_fts(connection):
+        return 0
+    recipe_table = Recipe._meta.db_table
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        cursor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+        ensure_search_index(connection)
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE} (rowid, {', '.join(SEARCH_FIELDS)}) "
+            f"SELECT r.id, r.title, r.description, r.instructions, "
+            f"(SELECT group_concat(json_extract(i.value, '$.name'), ' ') FROM json_each(r.ingredients) i) "
+            f"FROM {recipe_table} r"
+        )
+        cursor.execute(f"SELECT count(*) FROM {FTS_TABLE}")
+        return cursor.fetchone()[0]
+
+
+def search_terms(query: str) -> List[str]:
+    return _TOKEN_RE.findall(query.lower())
+
+
+def match_expression(query: str) -> str:
+    """FTS5 query matching every term of ``query`` as a prefix"""
+    return ' '.join(f'"{term}"*' for term in search_terms(query))
+
+
+def search_recipes(query: str, queryset=None):
+    """Recipes matching ``query``, best first, with a ``search_rank`` (lower is better)"""
+    queryset = queryset if queryset is not None else Recipe.objects.all()
+    terms = search_terms(query)
+    if not terms:
+        return queryset.none()
+
+    if not supports_fts(connections[queryset.db]):
+        condition = Q()
+        for term in terms:
+            condition &= (
+                Q(title__icontains=term) | Q(description__icontains=term)
+                | Q(instructions__icontains=term) | Q(ingredients__icontains=term)
+            )
+        return queryset.filter(condition).order_by('title')
+
+    weights = ', '.join(str(weight) for weight in COLUMN_WEIGHTS)
+    return queryset.extra(
+        tables=[FTS_TABLE],
+        where=[f'{FTS_TABLE}.rowid = {Recipe._meta.db_table}.id', f'{FTS_TABLE} MATCH %s'],
+        params=[match_expression(query)],
+        select={'search_rank': f'bm25({FTS_TABLE}, {weights})'},
+        order_by=['search_rank'],
+    )
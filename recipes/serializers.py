@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
+from meal_planner_project.fieldsets import Expandable, ExpandableFieldsMixin
 from .models import Recipe, RecipeRating
 
 class UserSerializer(serializers.ModelSerializer):
@@ -7,29 +8,28 @@ class UserSerializer(serializers.ModelSerializer):
         model = User
         fields = ('id', 'username')
 
-class RecipeRatingSerializer(serializers.ModelSerializer):
-    user = UserSerializer(read_only=True)
+class RecipeRatingSerializer(ExpandableFieldsMixin, serializers.ModelSerializer):
+    expandable_fields = {
+        'user': Expandable(UserSerializer),
+    }
 
     class Meta:
         model = RecipeRating
         fields = '__all__'
         read_only_fields = ('user',)
 
-class RecipeSerializer(serializers.ModelSerializer):
-    created_by = UserSerializer(read_only=True)
-    ratings = RecipeRatingSerializer(many=True, read_only=True)
-    average_rating = serializers.SerializerMethodField()
+class RecipeSerializer(ExpandableFieldsMixin, serializers.ModelSerializer):
+    """Recipe with its author as an id; ``?expand=ratings`` adds the ratings"""
+    expandable_fields = {
+        'created_by': Expandable(UserSerializer),
+        'ratings': Expandable(RecipeRatingSerializer, many=True, compact=None),
+    }
+    average_rating = serializers.FloatField(read_only=True)
 
     class Meta:
         model = Recipe
         fields = '__all__'
-        read_only_fields = ('created_by',)
-
-    def get_average_rating(self, obj):
-        ratings = obj.ratings.all()
-        if not ratings:
-            return None
-        return sum(r.rating for r in ratings) / len(ratings)
+        read_only_fields = ('created_by', 'rating_count', 'rating_sum', 'dietary_mask')
 
     def create(self, validated_data):
         user = self.context['request'].user
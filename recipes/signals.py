@@ -0,0 +1,37 @@
+"""
+Signal handlers keeping the search index (see ``search``), the ingredient
+rows (see ``ingredients``) and the recipe table version (see ``changes``) in
+sync with recipes.
+"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .changes import bump_recipe_version
+from .ingredients import sync_recipe_ingredients
+from .models import Recipe
+from .search import SEARCH_FIELDS, index_recipes, unindex_recipes
+
+
+@receiver(post_save, sender=Recipe)
+def index_saved_recipe(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and not set(update_fields) & set(SEARCH_FIELDS):
+        return
+    index_recipes([instance])
+
+
+@receiver(post_save, sender=Recipe)
+def sync_saved_recipe_ingredients(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and 'ingredients' not in update_fields:
+        return
+    sync_recipe_ingredients([instance])
+
+
+@receiver(post_delete, sender=Recipe)
+def unindex_deleted_recipe(sender, instance, **kwargs):
+    unindex_recipes([instance.pk])
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def bump_version_on_recipe_change(sender, **kwargs):
+    bump_recipe_version()
@@ -0,0 +1,118 @@
+"""
+Dietary tags interned into a bitmask.
+
+Every distinct tag gets a row in ``DietaryTag`` with a fixed bit, assigned in
+order of first use and never reused. ``Recipe.dietary_mask`` ORs the bits of
+the recipe's ``dietary_tags`` (it is recomputed in ``Recipe.save``), so tag
+filters are integer predicates on one column instead of JSON matching:
+
+* all of ``mask``:  ``dietary_mask & mask == mask``
+* any of ``mask``:  ``dietary_mask & mask != 0``
+* none of ``mask``: ``dietary_mask & mask == 0``
+
+Bits stop at 62 so masks stay positive in a signed 64-bit column.
+"""
+from typing import Dict, Iterable, List
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Max
+
+from .models import DietaryTag
+
+MAX_TAGS = 63
+
+
+class TagVocabularyFull(ValueError):
+    """Every bit of the dietary mask is already assigned"""
+
+
+def normalise_tag(name) -> str:
+    return str(name).strip().lower()[:50]
+
+
+def _normalised(names: Iterable[str]) -> List[str]:
+    return sorted({normalise_tag(name) for name in names if str(name).strip()})
+
+
+def tag_bits(names: Iterable[str], create: bool = False) -> Dict[str, int]:
+    """``{tag: bit value}`` for the known tags among ``names``.
+
+    With ``create``, unknown tags are interned first, taking the next free bits.
+    """
+    names = _normalised(names)
+    if not names:
+        return {}
+    bits = dict(DietaryTag.objects.filter(name__in=names).values_list('name', 'bit'))
+    missing = [name for name in names if name not in bits]
+    if create and missing:
+        bits.update(_intern(missing))
+    return {name: 1 << bit for name, bit in bits.items()}
+
+
+def _intern(names: List[str], attempts: int = 3) -> Dict[str, int]:
+    for attempt in range(attempts):
+        try:
+            with transaction.atomic():
+                bits = dict(DietaryTag.objects.filter(name__in=names).values_list('name', 'bit'))
+                next_bit = DietaryTag.objects.aggregate(top=Max('bit'))['top']
+                next_bit = 0 if next_bit is None else next_bit + 1
+                new_tags = []
+                for name in names:
+                    if name in bits:
+                        continue
+                    if next_bit >= MAX_TAGS:
+                        raise TagVocabularyFull(f"No dietary tag bit left for {name!r}")
+                    new_tags.append(DietaryTag(name=name, bit=next_bit))
+                    bits[name] = next_bit
+                    next_bit += 1
+                DietaryTag.objects.bulk_create(new_tags)
+                return bits
+        except IntegrityError:
+            # Another writer took the same name or bit; read its rows and retry
+            if attempt == attempts - 1:
+                raise
+
+
+def tag_mask(names: Iterable[str], create: bool = False) -> int:
+    """OR of the bits of the known tags among ``names``"""
+    mask = 0
+    for bit in tag_bits(names, create=create).values():
+        mask |= bit
+    return mask
+
+
+def set_dietary_masks(recipes: Iterable) -> None:
+    """Recompute ``dietary_mask`` of each recipe, interning all their tags at once"""
+    recipes = list(recipes)
+    bits = tag_bits((tag for recipe in recipes for tag in recipe.dietary_tags or []), create=True)
+    for recipe in recipes:
+        recipe.dietary_mask = 0
+        for tag in recipe.dietary_tags or []:
+            recipe.dietary_mask |= bits.get(normalise_tag(tag), 0)
+
+
+def filter_by_tags(queryset, all_of: Iterable[str] = (), any_of: Iterable[str] = (),
+                   none_of: Iterable[str] = ()):
+    """Recipes carrying every ``all_of`` tag, at least one ``any_of`` tag and no ``none_of`` tag"""
+    all_of, any_of = _normalised(all_of), _normalised(any_of)
+    if all_of:
+        bits = tag_bits(all_of)
+        if len(bits) < len(all_of):
+            # No recipe carries a tag nobody has used
+            return queryset.none()
+        mask = sum(bits.values())
+        queryset = queryset.alias(all_tags=F('dietary_mask').bitand(mask)).filter(all_tags=mask)
+    if any_of:
+        mask = tag_mask(any_of)
+        if not mask:
+            return queryset.none()
+        queryset = queryset.alias(any_tags=F('dietary_mask').bitand(mask)).exclude(any_tags=0)
+    mask = tag_mask(none_of)
+    if mask:
+        queryset = queryset.alias(no_tags=F('dietary_mask').bitand(mask)).filter(no_tags=0)
+    return queryset
+
+
+def tag_vocabulary() -> Dict[str, int]:
+    """Every interned tag with its bit value"""
+    return {name: 1 << bit for name, bit in DietaryTag.objects.values_list('name', 'bit')}
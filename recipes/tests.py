@@ -1,10 +1,24 @@
-from django.test import TestCase
+import io
+from datetime import timedelta
+from unittest import mock
+
+import numpy as np
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import DatabaseError, connection
+from django.test import TestCase, SimpleTestCase, override_settings
 from django.contrib.auth.models import User
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework.test import APITestCase, APIClient
 from rest_framework import status
-from .models import Recipe, RecipeRating
+from meal_planner_project.query_plans import QueryPlanTestMixin, query_plan
+from .models import DietaryTag, Recipe, RecipeIngredient, RecipeRating
 from .serializers import RecipeSerializer
+from .views import RecipeViewSet
+from . import dedup, search, tags, units
+from .ratings import LEADERBOARD_KEY, LEADERBOARD_LOCK_KEY, rate_recipe
 
 class RecipeModelTests(TestCase):
     def setUp(self):
@@ -69,7 +83,7 @@ class RecipeAPITests(APITestCase):
         serializer = RecipeSerializer(recipes, many=True)
         
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(response.data, serializer.data)
+        self.assertEqual(response.data['results'], serializer.data)
 
     def test_create_recipe(self):
         url = reverse('recipe-list')
@@ -84,7 +98,7 @@ class RecipeAPITests(APITestCase):
         response = self.client.get(url, {'max_calories': 400})
         
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
+        self.assertEqual(len(response.data['results']), 1)
 
     def test_rate_recipe(self):
         url = reverse('recipe-rate', kwargs={'pk': self.recipe.id})
@@ -97,3 +111,517 @@ class RecipeAPITests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(RecipeRating.objects.count(), 1)
         self.assertEqual(RecipeRating.objects.first().rating, 5)
+
+class RecipeFingerprintTests(SimpleTestCase):
+    def setUp(self):
+        self.ingredients = [
+            {'name': 'Rolled Oats', 'amount': 50, 'unit': 'g'},
+            {'name': 'almond milk', 'amount': 120, 'unit': 'ml'},
+            {'name': 'mixed berries', 'amount': 100, 'unit': 'g'},
+            {'name': 'honey', 'amount': 15, 'unit': 'ml'},
+        ]
+        self.macros = [350, 8, 65, 7]
+
+    def test_content_hash_ignores_formatting_and_order(self):
+        self.assertEqual(
+            dedup.content_hash('Overnight Oats', self.ingredients, self.macros),
+            dedup.content_hash(' overnight  OATS ', list(reversed(self.ingredients)), [350.0, 8, 65, 7])
+        )
+        self.assertNotEqual(
+            dedup.content_hash('Overnight Oats', self.ingredients, self.macros),
+            dedup.content_hash('Overnight Oats', self.ingredients, [400, 8, 65, 7])
+        )
+
+    def test_near_duplicate_index(self):
+        index = dedup.NearDuplicateIndex()
+        signature = dedup.minhash_signature(dedup.ingredient_names(self.ingredients))
+        index.add('oats', signature, self.macros)
+
+        same_ingredients = dedup.minhash_signature(dedup.ingredient_names(reversed(self.ingredients)))
+        other_ingredients = dedup.minhash_signature({'chicken breast', 'rice', 'broccoli'})
+
+        self.assertEqual(index.find(same_ingredients, [355, 8, 66, 7]), 'oats')
+        self.assertIsNone(index.find(same_ingredients, [600, 30, 65, 7]))
+        self.assertIsNone(index.find(other_ingredients, self.macros))
+
+class RecipeFingerprintBackfillTests(TestCase):
+    def test_backfill_command(self):
+        user = User.objects.create_user(username='testuser', password='testpass123')
+        recipe = Recipe.objects.create(
+            title='Overnight Oats', description='', ingredients=[{'name': 'oats', 'amount': 50, 'unit': 'g'}],
+            instructions='', prep_time=5, cook_time=0, servings=1, calories_per_serving=350,
+            protein=8, carbs=65, fat=7, created_by=user
+        )
+        expected = (recipe.content_hash, recipe.ingredient_signature)
+        Recipe.objects.update(content_hash='', ingredient_signature=[])
+
+        call_command('backfill_recipe_fingerprints', '--batch-size', '1', stdout=io.StringIO())
+        recipe.refresh_from_db()
+        self.assertEqual((recipe.content_hash, recipe.ingredient_signature), expected)
+
+class RecipeRatingAggregateTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='testuser',
+            password='testpass123'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.raters = [
+            User.objects.create_user(username=f'rater{i}', password='testpass123')
+            for i in range(4)
+        ]
+        self.recipes = [self._recipe(f'Recipe {i}') for i in range(4)]
+
+    def _recipe(self, title):
+        return Recipe.objects.create(
+            title=title,
+            description='',
+            ingredients=[{'name': title, 'amount': 100, 'unit': 'g'}],
+            instructions='',
+            prep_time=5,
+            cook_time=5,
+            servings=1,
+            calories_per_serving=300,
+            protein=20,
+            carbs=30,
+            fat=10,
+            created_by=self.user
+        )
+
+    def _rate(self, recipe, user, rating):
+        with self.captureOnCommitCallbacks(execute=True):
+            rate_recipe(recipe, user, rating)
+
+    def _top_rated(self, **params):
+        response = self.client.get(reverse('recipe-top-rated'), params)
+        return [recipe['title'] for recipe in response.data]
+
+    def test_rate_keeps_aggregates(self):
+        recipe = self.recipes[0]
+        self._rate(recipe, self.raters[0], 4)
+        self._rate(recipe, self.raters[1], 2)
+        self._rate(recipe, self.raters[0], 5)
+
+        recipe.refresh_from_db()
+        self.assertEqual((recipe.rating_count, recipe.rating_sum), (2, 7))
+        self.assertEqual(recipe.average_rating, 3.5)
+
+    def test_rate_endpoint_validates(self):
+        url = reverse('recipe-rate', kwargs={'pk': self.recipes[0].id})
+        for rating in (0, 6, 'great'):
+            response = self.client.post(url, {'rating': rating}, format='json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(url, {'rating': '4'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(Recipe.objects.get(pk=self.recipes[0].id).rating_sum, 4)
+
+    def test_leaderboard_is_updated_incrementally(self):
+        self._rate(self.recipes[0], self.raters[0], 3)
+        self._rate(self.recipes[1], self.raters[0], 4)
+        self.assertEqual(self._top_rated(), ['Recipe 1', 'Recipe 0'])
+
+        self._rate(self.recipes[0], self.raters[0], 5)
+        self._rate(self.recipes[2], self.raters[0], 1)
+        with self.assertNumQueries(1):
+            self.assertEqual(self._top_rated(), ['Recipe 0', 'Recipe 1', 'Recipe 2'])
+
+    @override_settings(RECIPE_RATINGS={'LEADERBOARD_SIZE': 2})
+    def test_full_leaderboard_drops_and_rebuilds(self):
+        for recipe, rating in zip(self.recipes, (5, 4, 3)):
+            self._rate(recipe, self.raters[0], rating)
+        self.assertEqual(self._top_rated(), ['Recipe 0', 'Recipe 1'])
+
+        # Recipe 0 falls below recipes the board no longer tracks
+        self._rate(self.recipes[0], self.raters[0], 1)
+        self.assertEqual(self._top_rated(limit=1), ['Recipe 1'])
+        self.assertEqual(self._top_rated(limit=2), ['Recipe 1', 'Recipe 2'])
+
+    def test_update_blocked_by_lock_drops_the_board(self):
+        self._rate(self.recipes[0], self.raters[0], 3)
+        self.assertEqual(self._top_rated(), ['Recipe 0'])
+
+        # Another process is updating the board and does not let go in time
+        cache.add(LEADERBOARD_LOCK_KEY.format('average'), 'other-writer')
+        with mock.patch('recipes.ratings.LOCK_WAIT', 0):
+            self._rate(self.recipes[1], self.raters[0], 4)
+
+        self.assertIsNone(cache.get(LEADERBOARD_KEY.format('average')))
+        self.assertEqual(self._top_rated(), ['Recipe 1', 'Recipe 0'])
+
+    def test_bayesian_ranking(self):
+        self._rate(self.recipes[0], self.raters[0], 5)
+        for rater in self.raters:
+            self._rate(self.recipes[1], rater, 5 if rater != self.raters[0] else 4)
+
+        self.assertEqual(self._top_rated()[:2], ['Recipe 0', 'Recipe 1'])
+        self.assertEqual(self._top_rated(ranking='bayesian')[:2], ['Recipe 1', 'Recipe 0'])
+
+    def test_rebuild_command(self):
+        RecipeRating.objects.create(recipe=self.recipes[3], user=self.raters[0], rating=2)
+        call_command('rebuild_rating_aggregates', stdout=io.StringIO())
+
+        recipe = Recipe.objects.get(pk=self.recipes[3].pk)
+        self.assertEqual((recipe.rating_count, recipe.rating_sum), (1, 2))
+        self.assertEqual(self._top_rated(), ['Recipe 3'])
+
+class RecipeSearchTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            password='testpass123'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.curry = self._recipe(
+            'Chickpea Curry', 'A warming curry', ['chickpeas', 'coconut milk'], calories=550
+        )
+        self.salad = self._recipe(
+            'Summer Salad', 'Crisp greens with chickpeas', ['lettuce', 'chickpeas'], calories=250
+        )
+        self.oats = self._recipe('Overnight Oats', 'Creamy breakfast', ['rolled oats', 'milk'], calories=350)
+
+    def _recipe(self, title, description, ingredients, calories):
+        return Recipe.objects.create(
+            title=title,
+            description=description,
+            ingredients=[{'name': name, 'amount': 100, 'unit': 'g'} for name in ingredients],
+            instructions='Mix everything.',
+            prep_time=10,
+            cook_time=10,
+            servings=2,
+            calories_per_serving=calories,
+            protein=10,
+            carbs=40,
+            fat=10,
+            created_by=self.user
+        )
+
+    def _search(self, **params):
+        response = self.client.get(reverse('recipe-search'), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [recipe['title'] for recipe in response.data]
+
+    def test_ranked_prefix_search(self):
+        # A title match outranks a description or ingredient match
+        self.assertEqual(self._search(q='chick'), ['Chickpea Curry', 'Summer Salad'])
+        self.assertEqual(self._search(q='oat milk'), ['Overnight Oats'])
+        self.assertEqual(self._search(q=''), [])
+
+    def test_filters_apply_in_one_query(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(self._search(q='chickpeas', max_calories=300), ['Summer Salad'])
+
+    def test_index_follows_writes(self):
+        self.oats.title = 'Bircher Muesli'
+        self.oats.save()
+        self.assertEqual(self._search(q='bircher'), ['Bircher Muesli'])
+        self.assertEqual(self._search(q='overnight'), [])
+
+        self.curry.delete()
+        self.assertEqual(self._search(q='chickpea'), ['Summer Salad'])
+
+    def test_rebuild_command(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {search.FTS_TABLE}")
+        self.assertEqual(self._search(q='salad'), [])
+
+        call_command('rebuild_recipe_search_index', stdout=io.StringIO())
+        self.assertEqual(self._search(q='salad'), ['Summer Salad'])
+        self.assertEqual(self._search(q='coconut'), ['Chickpea Curry'])
+
+    def test_failed_rebuild_keeps_the_index(self):
+        with mock.patch.object(search, 'ensure_search_index', side_effect=DatabaseError('boom')):
+            with self.assertRaises(DatabaseError):
+                search.rebuild_search_index()
+
+        self.assertEqual(self._search(q='salad'), ['Summer Salad'])
+
+    def test_match_expression_escapes_syntax(self):
+        self.assertEqual(search.match_expression('AND "x" (OR*'), '"and"* "x"* "or"*')
+
+class RecipeIngredientIndexTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            password='testpass123'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.curry = self._recipe('Curry', [('Chickpeas', 1, 'cup'), ('Coconut milk', 0.4, 'l')])
+        self.salad = self._recipe('Salad', [('chickpea', 200, 'grams'), ('Walnuts', 30, 'g')])
+        self.toast = self._recipe('Toast', [('Bread', 2, 'slices'), ('Peanut butter', 1, 'tbsp')])
+
+    def _recipe(self, title, ingredients):
+        return Recipe.objects.create(
+            title=title,
+            description='',
+            ingredients=[{'name': name, 'amount': amount, 'unit': unit} for name, amount, unit in ingredients],
+            instructions='',
+            prep_time=5,
+            cook_time=5,
+            servings=1,
+            calories_per_serving=400,
+            protein=10,
+            carbs=40,
+            fat=10,
+            created_by=self.user
+        )
+
+    def _titles(self, **params):
+        response = self.client.get(reverse('recipe-list'), params)
+        return sorted(recipe['title'] for recipe in response.data['results'])
+
+    def test_rows_are_normalised(self):
+        rows = list(RecipeIngredient.objects.filter(recipe=self.curry).values_list('name', 'quantity', 'unit'))
+        self.assertEqual(rows[0][0], 'chickpea')
+        self.assertAlmostEqual(rows[0][1], 236.588, places=3)
+        self.assertEqual(rows[1], ('coconut milk', 400.0, 'ml'))
+        self.assertEqual(
+            RecipeIngredient.objects.get(recipe=self.toast, position=0).unit, 'slices'
+        )
+
+    def test_rows_follow_writes(self):
+        self.curry.ingredients = [{'name': 'Lentils', 'amount': 1, 'unit': 'kg'}]
+        self.curry.save()
+        self.assertEqual(
+            list(self.curry.ingredient_rows.values_list('name', 'quantity')), [('lentil', 1000.0)]
+        )
+
+    def test_include_and_exclude_filters(self):
+        self.assertEqual(self._titles(include_ingredients='Chickpeas'), ['Curry', 'Salad'])
+        self.assertEqual(self._titles(include_ingredients='chickpea,walnut'), ['Salad'])
+        self.assertEqual(self._titles(exclude_ingredients=['walnuts', 'peanut butter']), ['Curry'])
+        self.assertEqual(
+            self._titles(include_ingredients='chickpeas', exclude_ingredients='coconut milk'), ['Salad']
+        )
+
+    def test_backfill_command(self):
+        RecipeIngredient.objects.all().delete()
+        call_command('backfill_recipe_ingredients', '--batch-size', '2', stdout=io.StringIO())
+        self.assertEqual(RecipeIngredient.objects.count(), 6)
+
+    def test_unit_conversion(self):
+        self.assertEqual(units.to_base(2, 'Kilograms'), (2000.0, 'g'))
+        self.assertEqual(units.to_base(None, 'tsp'), (None, 'ml'))
+        self.assertEqual(units.to_base(3, 'pinch'), (3.0, 'pinch'))
+
+    def test_densities_and_readable_units(self):
+        self.assertEqual(units.to_base(1, 'cup', 'plain flour'), (236.5882365 * 0.53, 'g'))
+        self.assertEqual(units.to_base(1, 'cup', 'almond milk'), (236.5882365, 'ml'))
+        self.assertEqual(units.humanize(1500, 'g'), (1.5, 'kg'))
+        self.assertEqual(units.humanize(10, 'ml'), (2.03, 'tsp'))
+        self.assertEqual(units.humanize(3, 'pinch'), (3, 'pinch'))
+        self.assertEqual(units.scale(2, 'cups', 1.5), (3, 'cup'))
+        self.assertEqual(units.scale(600, 'g', 2), (1.2, 'kg'))
+
+    def test_adjust_servings_scales_into_readable_units(self):
+        recipe = self._recipe('Bread', [('Flour', 1000, 'g'), ('Water', 2, 'cups'), ('Salt', None, 'tsp')])
+        response = self.client.post(
+            reverse('recipe-adjust-servings', kwargs={'pk': recipe.pk}), {'servings': 1.5}, format='json'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [(i['amount'], i['unit']) for i in response.data['ingredients']],
+            [(1.5, 'kg'), (3, 'cup'), (None, 'tsp')]
+        )
+
+    def test_vectorised_conversion_matches_scalar(self):
+        rows = [(200, 'g', 'flour'), (0.5, 'kg', 'flour'), (2, 'Cups', 'flour'), (3, 'tbsp', 'olive oil'),
+                (None, 'tsp', 'salt'), (2, 'pieces', 'egg'), (1, 'pinch', 'pepper')]
+        amounts, bases = units.to_base_many(*zip(*rows))
+
+        for (amount, unit, name), converted, base in zip(rows, amounts, bases):
+            expected, expected_base = units.to_base(amount, unit, name)
+            self.assertEqual(base, expected_base)
+            if expected is None:
+                self.assertTrue(np.isnan(converted))
+            else:
+                self.assertAlmostEqual(converted, expected)
+
+        quantities = [0, 4, 45, 999, 1500, 250, 2500, 3]
+        base_units = ['g', 'ml', 'ml', 'ml', 'ml', 'g', 'g', 'pcs']
+        self.assertEqual(
+            list(zip(*units.humanize_many(quantities, base_units))),
+            [units.humanize(q, u) for q, u in zip(quantities, base_units)]
+        )
+
+class DietaryTagMaskTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            password='testpass123'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.tofu = self._recipe('Tofu bowl', ['Vegan', 'gluten-free'])
+        self.omelette = self._recipe('Omelette', ['vegetarian', 'gluten-free'])
+        self.steak = self._recipe('Steak', ['keto'])
+        self.toast = self._recipe('Toast', [])
+
+    def _recipe(self, title, tags):
+        return Recipe.objects.create(
+            title=title,
+            description='',
+            ingredients=[],
+            instructions='',
+            prep_time=5,
+            cook_time=5,
+            servings=1,
+            calories_per_serving=400,
+            protein=10,
+            carbs=40,
+            fat=10,
+            dietary_tags=tags,
+            created_by=self.user
+        )
+
+    def _titles(self, **params):
+        response = self.client.get(reverse('recipe-list'), params)
+        return sorted(recipe['title'] for recipe in response.data['results'])
+
+    def test_tags_are_interned(self):
+        bits = tags.tag_vocabulary()
+        self.assertEqual(sorted(bits), ['gluten-free', 'keto', 'vegan', 'vegetarian'])
+        self.assertEqual(self.tofu.dietary_mask, bits['vegan'] | bits['gluten-free'])
+        self.assertEqual(self.toast.dietary_mask, 0)
+        self.assertEqual(DietaryTag.objects.filter(name='gluten-free').count(), 1)
+
+    def test_mask_follows_tags(self):
+        self.toast.dietary_tags = ['vegan']
+        self.toast.save(update_fields=['dietary_tags'])
+        self.toast.refresh_from_db()
+        self.assertEqual(self.toast.dietary_mask, tags.tag_vocabulary()['vegan'])
+
+    def test_filters(self):
+        self.assertEqual(self._titles(dietary_tags='gluten-free'), ['Omelette', 'Tofu bowl'])
+        self.assertEqual(self._titles(dietary_tags=['gluten-free', 'VEGAN']), ['Tofu bowl'])
+        self.assertEqual(self._titles(dietary_tags='paleo'), [])
+        self.assertEqual(self._titles(any_dietary_tags='vegan,keto,paleo'), ['Steak', 'Tofu bowl'])
+        self.assertEqual(self._titles(any_dietary_tags='paleo'), [])
+        self.assertEqual(
+            self._titles(exclude_dietary_tags='gluten-free,paleo'), ['Steak', 'Toast']
+        )
+        self.assertEqual(
+            self._titles(dietary_tags='gluten-free', exclude_dietary_tags='vegan'), ['Omelette']
+        )
+
+    def test_vocabulary_is_bounded(self):
+        DietaryTag.objects.bulk_create(
+            DietaryTag(name=f'tag{bit}', bit=bit) for bit in range(4, tags.MAX_TAGS)
+        )
+        with self.assertRaises(tags.TagVocabularyFull):
+            tags.tag_mask(['one-too-many'], create=True)
+
+    def test_backfill_command(self):
+        Recipe.objects.update(dietary_mask=0)
+        call_command('backfill_dietary_masks', '--batch-size', '3', stdout=io.StringIO())
+        self.tofu.refresh_from_db()
+        bits = tags.tag_vocabulary()
+        self.assertEqual(self.tofu.dietary_mask, bits['vegan'] | bits['gluten-free'])
+
+class RecipePaginationTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            password='testpass123'
+        )
+        self.client.force_authenticate(user=self.user)
+        Recipe.objects.bulk_create([
+            Recipe(
+                title=f'Recipe {i}',
+                description='',
+                ingredients=[],
+                instructions='',
+                prep_time=5,
+                cook_time=5,
+                servings=1,
+                calories_per_serving=400,
+                protein=10,
+                carbs=40,
+                fat=10,
+                created_by=self.user
+            )
+            for i in range(25)
+        ])
+        # Three timestamps only, so most of the order comes from the id tie-breaker
+        for recipe in Recipe.objects.all():
+            Recipe.objects.filter(pk=recipe.pk).update(
+                created_at=timezone.now() - timedelta(days=recipe.pk % 3)
+            )
+        self.expected = list(Recipe.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+
+    def _page(self, url, params=None):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_pages_follow_ordering(self):
+        seen = []
+        page = self._page(reverse('recipe-list'), {'page_size': 10})
+        self.assertIsNone(page['previous'])
+        while True:
+            seen.extend(recipe['id'] for recipe in page['results'])
+            if page['next'] is None:
+                break
+            page = self._page(page['next'])
+        self.assertEqual(seen, self.expected)
+
+    def test_previous_pages(self):
+        first = self._page(reverse('recipe-list'), {'page_size': 10})
+        second = self._page(first['next'])
+        third = self._page(second['next'])
+        self.assertEqual([recipe['id'] for recipe in third['results']], self.expected[20:])
+
+        back = self._page(third['previous'])
+        self.assertEqual(back['results'], second['results'])
+        back = self._page(back['previous'])
+        self.assertEqual(back['results'], first['results'])
+        self.assertIsNone(back['previous'])
+
+    def test_new_rows_do_not_shift_pages(self):
+        first = self._page(reverse('recipe-list'), {'page_size': 10})
+        Recipe.objects.create(
+            title='Newest', description='', ingredients=[], instructions='', prep_time=5, cook_time=5,
+            servings=1, calories_per_serving=400, protein=10, carbs=40, fat=10, created_by=self.user
+        )
+        second = self._page(first['next'])
+        self.assertEqual([recipe['id'] for recipe in second['results']], self.expected[10:20])
+
+    def test_invalid_cursor(self):
+        response = self.client.get(reverse('recipe-list'), {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+class RecipeQueryPlanTests(QueryPlanTestMixin, TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            password='testpass123'
+        )
+        Recipe.objects.create(
+            title='Rice bowl',
+            description='',
+            ingredients=[{'name': 'rice', 'amount': 100, 'unit': 'g'}],
+            instructions='',
+            prep_time=5,
+            cook_time=5,
+            servings=1,
+            calories_per_serving=400,
+            protein=10,
+            carbs=40,
+            fat=10,
+            dietary_tags=['vegan'],
+            created_by=self.user
+        )
+
+    def test_list_pages(self):
+        for params in ({}, {'dietary_tags': 'vegan'}, {'include_ingredients': 'rice', 'exclude_ingredients': 'nut'}):
+            for queryset in self.page_querysets(RecipeViewSet, self.user, params):
+                self.assertIndexed(queryset)
+
+    def test_my_recipes(self):
+        queryset = Recipe.objects.filter(created_by=self.user)
+        self.assertIndexed(queryset)
+        self.assertIn('recipe_owner_created_idx', ' '.join(query_plan(queryset)))
+
+    def test_search(self):
+        self.assertIndexed(search.search_recipes('rice')[:20])
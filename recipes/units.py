@@ -0,0 +1,226 @@
+"""
+Ingredient units and conversion to base units.
+
+Every known unit belongs to one dimension with a base unit: mass in grams,
+volume in millilitres and counts in pieces. Quantities are stored in the base
+unit so amounts written in different units can be compared and summed.
+Unknown units are kept as they are, with a factor of 1.
+
+Ingredients with a known density (``DENSITIES``) are bought by weight, so
+their volumes are converted to grams when the ingredient is given: "1 cup
+flour" and "200 g flour" sum to one amount. ``humanize`` renders a base
+quantity back in a readable unit ("1500 g" -> "1.5 kg").
+
+``to_base_many`` and ``humanize_many`` do the same over NumPy arrays, looking
+each distinct unit and ingredient up once, for converting a whole plan at a
+time.
+"""
+import math
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+# unit -> (base unit, factor to the base unit)
+UNITS = {
+    'mg': ('g', 0.001),
+    'g': ('g', 1.0),
+    'kg': ('g', 1000.0),
+    'oz': ('g', 28.349523125),
+    'lb': ('g', 453.59237),
+    'ml': ('ml', 1.0),
+    'cl': ('ml', 10.0),
+    'dl': ('ml', 100.0),
+    'l': ('ml', 1000.0),
+    'tsp': ('ml', 4.92892159375),
+    'tbsp': ('ml', 14.78676478125),
+    'fl oz': ('ml', 29.5735295625),
+    'cup': ('ml', 236.5882365),
+    'pcs': ('pcs', 1.0),
+}
+
+ALIASES = {
+    'gram': 'g', 'grams': 'g', 'gr': 'g',
+    'kilogram': 'kg', 'kilograms': 'kg', 'kilo': 'kg', 'kilos': 'kg',
+    'milligram': 'mg', 'milligrams': 'mg',
+    'ounce': 'oz', 'ounces': 'oz',
+    'pound': 'lb', 'pounds': 'lb', 'lbs': 'lb',
+    'millilitre': 'ml', 'millilitres': 'ml', 'milliliter': 'ml', 'milliliters': 'ml',
+    'litre': 'l', 'litres': 'l', 'liter': 'l', 'liters': 'l',
+    'teaspoon': 'tsp', 'teaspoons': 'tsp',
+    'tablespoon': 'tbsp', 'tablespoons': 'tbsp', 'tbs': 'tbsp',
+    'cups': 'cup',
+    'piece': 'pcs', 'pieces': 'pcs', 'pc': 'pcs', 'whole': 'pcs', '': 'pcs',
+}
+
+# Grams per millilitre of ingredients bought by weight, by normalised name
+# (see ``recipes.ingredients.normalise_ingredient_name``). A name not listed
+# falls back to its last word, so "plain flour" uses "flour".
+DENSITIES = {
+    'flour': 0.53,
+    'almond flour': 0.4,
+    'sugar': 0.85,
+    'brown sugar': 0.93,
+    'icing sugar': 0.56,
+    'powdered sugar': 0.56,
+    'salt': 1.2,
+    'butter': 0.91,
+    'peanut butter': 1.08,
+    'honey': 1.42,
+    'rice': 0.85,
+    'oat': 0.41,
+    'rolled oat': 0.41,
+    'lentil': 0.85,
+    'quinoa': 0.72,
+    'chia seed': 0.65,
+    'cocoa powder': 0.42,
+    'yogurt': 1.03,
+}
+
+# Display units of each base unit, smallest first, with the base quantity
+# each one is used below
+DISPLAY_UNITS = {
+    'g': (('g', 1000.0), ('kg', math.inf)),
+    'ml': (('tsp', 15.0), ('tbsp', 60.0), ('ml', 1000.0), ('l', math.inf)),
+}
+
+# Preferred units are kept while they read between these amounts
+PREFERRED_RANGE = (0.25, 1000.0)
+
+
+def normalise_unit(unit: Optional[str]) -> str:
+    unit = str(unit or '').strip().lower().rstrip('.')
+    return ALIASES.get(unit, unit)
+
+
+def base_unit(unit: Optional[str]) -> str:
+    unit = normalise_unit(unit)
+    return UNITS.get(unit, (unit, 1.0))[0]
+
+
+def density(ingredient: Optional[str]) -> Optional[float]:
+    """Grams per millilitre of a normalised ingredient name, if known"""
+    if not ingredient:
+        return None
+    if ingredient in DENSITIES:
+        return DENSITIES[ingredient]
+    return DENSITIES.get(ingredient.rsplit(' ', 1)[-1])
+
+
+def to_base(amount: Optional[float], unit: Optional[str], ingredient: Optional[str] = None) -> Tuple[Optional[float], str]:
+    """``(amount in the base unit, base unit)``; a missing amount stays None.
+
+    Volumes of an ``ingredient`` with a known density are converted to grams.
+    """
+    unit = normalise_unit(unit)
+    base, factor = UNITS.get(unit, (unit, 1.0))
+    if base == 'ml':
+        grams_per_ml = density(ingredient)
+        if grams_per_ml is not None:
+            base, factor = 'g', factor * grams_per_ml
+    if amount is None:
+        return None, base
+    return float(amount) * factor, base
+
+
+def tidy(value: float) -> float:
+    """Round to three significant figures, keeping every whole digit"""
+    if not value or not math.isfinite(value):
+        return value
+    return round(value, max(0, 2 - math.floor(math.log10(abs(value)))))
+
+
+def humanize(quantity: float, unit: str, prefer: Optional[str] = None) -> Tuple[float, str]:
+    """A base quantity in a readable unit.
+
+    ``prefer`` (say, the unit a recipe was written in) is kept if it measures
+    the same dimension and reads within ``PREFERRED_RANGE``.
+    """
+    if prefer is not None:
+        prefer = normalise_unit(prefer)
+        preferred_base, factor = UNITS.get(prefer, (prefer, 1.0))
+        if preferred_base == unit:
+            amount = quantity / factor
+            if PREFERRED_RANGE[0] <= abs(amount) < PREFERRED_RANGE[1]:
+                return tidy(amount), prefer
+    for display_unit, below in DISPLAY_UNITS.get(unit, ()):
+        if abs(quantity) < below:
+            return tidy(quantity / UNITS[display_unit][1]), display_unit
+    return tidy(quantity), unit
+
+
+def scale(amount: float, unit: Optional[str], multiplier: float) -> Tuple[float, str]:
+    """``amount unit`` times ``multiplier``, in the original unit while it reads well"""
+    quantity, base = to_base(amount * multiplier, unit)
+    return humanize(quantity, base, prefer=unit)
+
+
+def scale_ingredient(ingredient: dict, multiplier: float) -> dict:
+    """A copy of an ingredient dict at ``multiplier`` times its amount, in a readable unit"""
+    ingredient = dict(ingredient)
+    if ingredient.get('amount') is None:
+        return ingredient
+    amount, unit = scale(ingredient['amount'], ingredient.get('unit'), multiplier)
+    ingredient['amount'] = amount
+    if 'unit' in ingredient:
+        ingredient['unit'] = unit
+    return ingredient
+
+
+def _factorise(values) -> Tuple[list, List[int]]:
+    """(distinct values in first-seen order, index of each value among them)"""
+    positions = {}
+    codes = [positions.setdefault(value, len(positions)) for value in values]
+    return list(positions), codes
+
+
+def to_base_many(amounts: Sequence[Optional[float]], units: Sequence[Optional[str]],
+                 ingredients: Optional[Sequence[Optional[str]]] = None):
+    """Vectorised ``to_base``: (float array of base amounts, array of base units).
+
+    Missing amounts become NaN. Each distinct unit and ingredient is looked
+    up once.
+    """
+    # numpy is only needed here, keep it off the startup import path
+    import numpy as np
+
+    amounts = np.array(amounts, dtype=np.float64)
+    unit_keys, unit_codes = _factorise(units)
+    unit_codes = np.asarray(unit_codes, dtype=np.intp)
+    known = [UNITS.get(normalise_unit(unit), (normalise_unit(unit), 1.0)) for unit in unit_keys]
+    base_keys = np.array([base for base, _ in known] + ['g'], dtype=object)
+    factors = np.array([factor for _, factor in known], dtype=np.float64)[unit_codes]
+
+    if ingredients is not None:
+        name_keys, name_codes = _factorise(ingredients)
+        densities = np.array([density(name) or np.nan for name in name_keys], dtype=np.float64)
+        densities = densities[np.asarray(name_codes, dtype=np.intp)]
+        is_volume = np.array([base == 'ml' for base, _ in known])[unit_codes]
+        by_weight = is_volume & ~np.isnan(densities)
+        factors[by_weight] *= densities[by_weight]
+        # Weighed volumes take the extra 'g' entry of base_keys
+        unit_codes = np.where(by_weight, len(known), unit_codes)
+    bases = base_keys[unit_codes]
+    return amounts * factors, bases
+
+
+def humanize_many(quantities, units: Iterable[str]) -> Tuple[List[float], List[str]]:
+    """Vectorised ``humanize`` (without a preferred unit) of base quantities"""
+    # numpy is only needed here, keep it off the startup import path
+    import numpy as np
+
+    quantities = np.asarray(quantities, dtype=np.float64)
+    units = np.asarray(list(units), dtype=object)
+    display_units = units.copy()
+    factors = np.ones(len(quantities))
+    # Walk each base unit's display units from the largest down, so the
+    # smallest one that fits is applied last
+    for base, display in DISPLAY_UNITS.items():
+        is_base = units == base
+        for display_unit, below in reversed(display):
+            fits = is_base & (np.abs(quantities) < below)
+            display_units[fits] = display_unit
+            factors[fits] = UNITS[display_unit][1]
+    amounts = quantities / factors
+
+    magnitude = np.floor(np.log10(np.where(amounts == 0, 1, np.abs(amounts))))
+    decimals = np.clip(2 - magnitude, 0, None)
+    amounts = np.round(amounts * 10 ** decimals) / 10 ** decimals
+    return amounts.tolist(), display_units.tolist()
@@ -1,36 +1,60 @@
 from django.shortcuts import render
-from rest_framework import viewsets, status
+from rest_framework import generics, viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from django.db.models import Avg
+from meal_planner_project.fieldsets import ExpandableQuerysetMixin
+from meal_planner_project.pagination import KeysetPagination
 from .models import Recipe, RecipeRating
+from .ingredients import filter_by_ingredients
+from .search import search_recipes
+from .tags import filter_by_tags
+from .units import scale_ingredient
+from .ratings import RANKINGS, InvalidRating, rate_recipe, rating_settings, top_rated_ids
 from .serializers import RecipeSerializer, RecipeRatingSerializer
 
-class RecipeViewSet(viewsets.ModelViewSet):
+def _query_list(params, key):
+    """Values of a repeated or comma-separated query parameter"""
+    return [value.strip() for raw in params.getlist(key) for value in raw.split(',') if value.strip()]
+
+def filter_recipes(queryset, params):
+    """Apply the dietary tag, ingredient, calorie and prep time query parameters"""
+    # Filter by dietary tags, e.g. dietary_tags=vegan,gluten-free&exclude_dietary_tags=spicy
+    queryset = filter_by_tags(
+        queryset,
+        all_of=_query_list(params, 'dietary_tags'),
+        any_of=_query_list(params, 'any_dietary_tags'),
+        none_of=_query_list(params, 'exclude_dietary_tags'),
+    )
+
+    # Filter by max calories
+    max_calories = params.get('max_calories')
+    if max_calories:
+        queryset = queryset.filter(calories_per_serving__lte=max_calories)
+
+    # Filter by preparation time
+    max_prep_time = params.get('max_prep_time')
+    if max_prep_time:
+        queryset = queryset.filter(prep_time__lte=max_prep_time)
+
+    # Filter by ingredients, e.g. include_ingredients=chickpeas&exclude_ingredients=peanut,walnut
+    queryset = filter_by_ingredients(
+        queryset,
+        include=_query_list(params, 'include_ingredients'),
+        exclude=_query_list(params, 'exclude_ingredients'),
+    )
+
+    return queryset
+
+class RecipeViewSet(ExpandableQuerysetMixin, viewsets.ModelViewSet):
     queryset = Recipe.objects.all()
     serializer_class = RecipeSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
+    keyset_ordering = ('-created_at',)
 
     def get_queryset(self):
-        queryset = Recipe.objects.all()
-        
-        # Filter by dietary tags
-        dietary_tags = self.request.query_params.getlist('dietary_tags')
-        if dietary_tags:
-            queryset = queryset.filter(dietary_tags__contains=dietary_tags)
-        
-        # Filter by max calories
-        max_calories = self.request.query_params.get('max_calories')
-        if max_calories:
-            queryset = queryset.filter(calories_per_serving__lte=max_calories)
-        
-        # Filter by preparation time
-        max_prep_time = self.request.query_params.get('max_prep_time')
-        if max_prep_time:
-            queryset = queryset.filter(prep_time__lte=max_prep_time)
-        
-        return queryset
+        return self.optimize_queryset(filter_recipes(Recipe.objects.all(), self.request.query_params))
 
     @action(detail=True, methods=['POST'])
     def rate(self, request, pk=None):
@@ -44,29 +68,40 @@ class RecipeViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        rating, created = RecipeRating.objects.update_or_create(
-            recipe=recipe,
-            user=request.user,
-            defaults={'rating': rating_value, 'comment': comment}
-        )
+        try:
+            rating = rate_recipe(recipe, request.user, rating_value, comment)
+        except InvalidRating as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
         serializer = RecipeRatingSerializer(rating)
         return Response(serializer.data)
 
     @action(detail=False, methods=['GET'])
     def top_rated(self, request):
-        top_recipes = Recipe.objects.annotate(
-            avg_rating=Avg('ratings__rating')
-        ).filter(
-            avg_rating__isnull=False
-        ).order_by('-avg_rating')[:10]
+        """Best rated recipes, served from the cached leaderboard.
+
+        ``ranking=bayesian`` ranks by the Bayesian average instead of the plain
+        average; ``limit`` (default 10) caps the number of recipes.
+        """
+        ranking = request.query_params.get('ranking', 'average')
+        if ranking not in RANKINGS:
+            return Response(
+                {'error': f"ranking must be one of {', '.join(RANKINGS)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            limit = min(int(request.query_params.get('limit', 10)), rating_settings()['LEADERBOARD_SIZE'])
+        except ValueError:
+            return Response({'error': 'limit must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
 
-        serializer = self.get_serializer(top_recipes, many=True)
+        ids = top_rated_ids(ranking, max(limit, 0))
+        recipes = self.optimize_queryset(Recipe.objects.filter(id__in=ids)).in_bulk()
+        serializer = self.get_serializer([recipes[pk] for pk in ids if pk in recipes], many=True)
         return Response(serializer.data)
 
     @action(detail=False, methods=['GET'])
     def my_recipes(self, request):
-        recipes = Recipe.objects.filter(created_by=request.user)
+        recipes = self.optimize_queryset(Recipe.objects.filter(created_by=request.user))
         serializer = self.get_serializer(recipes, many=True)
         return Response(serializer.data)
 
@@ -89,10 +124,7 @@ class RecipeViewSet(viewsets.ModelViewSet):
             'title': recipe.title,
             'description': recipe.description,
             'ingredients': [
-                {
-                    **ingredient,
-                    'amount': ingredient['amount'] * multiplier
-                }
+                scale_ingredient(ingredient, multiplier)
                 for ingredient in recipe.ingredients
             ],
             'instructions': recipe.instructions,
@@ -104,3 +136,25 @@ class RecipeViewSet(viewsets.ModelViewSet):
         }
 
         return Response(adjusted_recipe)
+
+class RecipeSearch(ExpandableQuerysetMixin, generics.ListAPIView):
+    """Ranked full-text search over recipes.
+
+    ``q`` is matched against title, description, instructions and ingredient
+    names, each term as a prefix; results come best first. The recipe list
+    filters (``dietary_tags``, ``max_calories``, ``max_prep_time``) apply in
+    the same query, and ``limit`` (default 20, at most 100) caps the results.
+    """
+    serializer_class = RecipeSerializer
+    permission_classes = [IsAuthenticated]
+    DEFAULT_LIMIT = 20
+    MAX_LIMIT = 100
+
+    def get_queryset(self):
+        params = self.request.query_params
+        try:
+            limit = min(max(int(params.get('limit', self.DEFAULT_LIMIT)), 1), self.MAX_LIMIT)
+        except ValueError:
+            limit = self.DEFAULT_LIMIT
+        queryset = search_recipes(params.get('q', ''), filter_recipes(Recipe.objects.all(), params))
+        return self.optimize_queryset(queryset)[:limit]
@@ -0,0 +1,297 @@
+"""
+Shopping-list generation from a meal plan.
+
+A list is generated in one pass: a single joined query reads every meal's
+servings with its recipe's indexed ingredient rows (``RecipeIngredient``,
+already normalised to base units), amounts are summed in memory per
+(ingredient, unit), the user's pantry is subtracted after the same
+conversion (``recipes.units.to_base_many``, over the whole pantry at
+once), and the totals, in readable units, replace the list's previously
+generated items with one bulk INSERT inside a transaction. Items added by hand are left alone and purchased items stay
+purchased, so generating again is idempotent.
+
+Each meal's share of each ingredient is stored as a
+``ShoppingListContribution``. When a meal of the plan is added, re-served or
+moved to another day or plan, ``update_for_meal`` replaces that meal's
+contributions and moves only the items of its ingredients by the
+difference; ``remove_meals`` takes deleted meals out the same way (see
+``shopping.signals``). An edit costs the same however long the plan is.
+"""
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.db import connection, transaction
+from django.db.models import Q, Sum
+from django.utils import timezone
+
+from meal_plans.models import Meal
+from recipes.ingredients import normalise_ingredient_name
+from recipes.units import humanize, humanize_many, to_base_many
+
+from .models import IngredientCategory, PantryItem, ShoppingList, ShoppingListContribution, ShoppingListItem
+from .purchases import refresh_unpurchased
+
+# (normalised name, base unit)
+IngredientKey = Tuple[str, str]
+
+
+def meal_ingredients(meals) -> Dict[int, Dict[IngredientKey, List]]:
+    """``{meal id: {(name, unit): [quantity, category]}}`` of a Meal queryset, in one query"""
+    rows = meals.values_list(
+        'id',
+        'servings',
+        'recipe__servings',
+        'recipe__ingredient_rows__name',
+        'recipe__ingredient_rows__unit',
+        'recipe__ingredient_rows__category',
+        'recipe__ingredient_rows__quantity',
+    ).order_by()
+
+    ingredients = defaultdict(dict)
+    for meal_id, servings, recipe_servings, name, unit, category, quantity in rows:
+        if name is None:
+            # A recipe without ingredients
+            continue
+        entry = ingredients[meal_id].setdefault((name, unit), [0.0, category])
+        if quantity is not None:
+            entry[0] += quantity * servings / max(recipe_servings or 1, 1)
+        entry[1] = entry[1] or category
+    return ingredients
+
+
+def pantry_quantities(user_id: int, keys: Optional[Iterable[IngredientKey]] = None) -> Dict[IngredientKey, float]:
+    """What the user's pantry holds of each ingredient (of ``keys``, if given), in base units"""
+    keys = set(keys) if keys is not None else None
+    items = list(PantryItem.objects.filter(user_id=user_id).order_by().values_list('name', 'quantity', 'unit'))
+    if not items:
+        return {}
+    names = [normalise_ingredient_name(name) for name, _, _ in items]
+    amounts, units = to_base_many([quantity for _, quantity, _ in items], [unit for _, _, unit in items], names)
+    quantities = {}
+    for name, quantity, unit in zip(names, amounts.tolist(), units.tolist()):
+        if keys is None or (name, unit) in keys:
+            quantities[(name, unit)] = quantities.get((name, unit), 0.0) + quantity
+    return quantities
+
+
+def to_buy(required: float, in_pantry: Optional[float]) -> Optional[float]:
+    """What is left to buy of ``required``, or None if the pantry covers it"""
+    if in_pantry is None:
+        return required
+    return required - in_pantry if in_pantry < required else None
+
+
+def resolve_categories(categories: Iterable[str]) -> Dict[str, int]:
+    """``{category: IngredientCategory id}`` for categories given by id or by name"""
+    categories = {category for category in categories if category}
+    if not categories:
+        return {}
+    ids = [int(category) for category in categories if category.isdigit()]
+    by_id, by_name = {}, {}
+    matches = IngredientCategory.objects.filter(Q(id__in=ids) | Q(name__in=categories))
+    for pk, name in matches.values_list('id', 'name'):
+        by_id[str(pk)] = pk
+        by_name[name] = pk
+    return {
+        category: by_id.get(category, by_name.get(category))
+        for category in categories if category in by_id or category in by_name
+    }
+
+
+def build_items(shopping_list: ShoppingList, totals: Dict[IngredientKey, Tuple[float, str]],
+                pantry: Dict[IngredientKey, float]) -> List[ShoppingListItem]:
+    """Generated items for ``totals`` less ``pantry``, by name"""
+    categories = resolve_categories(category for _, category in totals.values())
+    needed = []
+    for key, (required, category) in sorted(totals.items()):
+        quantity = to_buy(required, pantry.get(key))
+        if quantity is not None:
+            needed.append((key, required, quantity, category))
+    # Totals are in base units; list them in readable ones ("1.5 kg", not "1500 g")
+    quantities, units = humanize_many(
+        [quantity for _, _, quantity, _ in needed], [base_unit for (_, base_unit), *_ in needed]
+    )
+    return [
+        ShoppingListItem(
+            shopping_list=shopping_list,
+            category_id=categories.get(category),
+            name=name,
+            quantity=quantity,
+            unit=unit,
+            is_generated=True,
+            required=required,
+            base_unit=base_unit,
+        )
+        for ((name, base_unit), required, _, category), quantity, unit in zip(needed, quantities, units)
+    ]
+
+
+def insert_contributions(rows: Iterable[Tuple[int, int, str, str, float]]):
+    """Insert (shopping list id, meal id, name, unit, quantity) contributions.
+
+    A plan has a row per meal and ingredient, thousands for a long plan, so
+    they are written with one executemany rather than as model instances.
+    """
+    table = connection.ops.quote_name(ShoppingListContribution._meta.db_table)
+    columns = ', '.join(
+        connection.ops.quote_name(ShoppingListContribution._meta.get_field(field).column)
+        for field in ('shopping_list', 'meal', 'name', 'unit', 'quantity')
+    )
+    with connection.cursor() as cursor:
+        cursor.executemany(f"INSERT INTO {table} ({columns}) VALUES (%s, %s, %s, %s, %s)", list(rows))
+
+
+def generate_shopping_list(shopping_list: ShoppingList) -> List[ShoppingListItem]:
+    """Replace the generated items of a list with what its meal plan needs beyond the owner's pantry"""
+    by_meal = meal_ingredients(Meal.objects.filter(day__meal_plan_id=shopping_list.meal_plan_id))
+    totals = {}
+    contributions = []
+    for meal_id, ingredients in by_meal.items():
+        for (name, unit), (quantity, category) in ingredients.items():
+            total, first_category = totals.get((name, unit), (0.0, category))
+            totals[(name, unit)] = (total + quantity, first_category or category)
+            contributions.append((shopping_list.pk, meal_id, name, unit, quantity))
+    items = build_items(shopping_list, totals, pantry_quantities(shopping_list.user_id, totals))
+
+    with transaction.atomic():
+        generated = shopping_list.items.filter(is_generated=True)
+        purchased = set(generated.filter(is_purchased=True).values_list('name', 'base_unit'))
+        for item in items:
+            item.is_purchased = (item.name, item.base_unit) in purchased
+        generated.delete()
+        shopping_list.contributions.all().delete()
+        insert_contributions(contributions)
+        shopping_list.generated_at = timezone.now()
+        ShoppingList.objects.filter(pk=shopping_list.pk).update(generated_at=shopping_list.generated_at)
+        items = ShoppingListItem.objects.bulk_create(items)
+        refresh_unpurchased(ShoppingList.objects.filter(pk=shopping_list.pk))
+        return items
+
+
+def _apply_deltas(shopping_list_id: int, user_id: int, deltas: Dict[IngredientKey, float],
+                  categories: Dict[IngredientKey, str]):
+    """Move the generated items of a list by ``deltas`` of their required amounts"""
+    items = {
+        (item.name, item.base_unit): item
+        for item in ShoppingListItem.objects.filter(
+            shopping_list_id=shopping_list_id, is_generated=True, name__in={name for name, _ in deltas}
+        )
+        if (item.name, item.base_unit) in deltas
+    }
+    required = {key: item.required + deltas[key] for key, item in items.items()}
+
+    # Ingredients without an item (new to the list, or covered by the
+    # pantry) and those whose amount fell to nothing are summed afresh;
+    # None means no meal of the plan uses them any more
+    recount = [key for key in deltas if key not in items or required[key] <= 1e-9]
+    if recount:
+        totals = {
+            (row['name'], row['unit']): row['total']
+            for row in ShoppingListContribution.objects.filter(
+                shopping_list_id=shopping_list_id, name__in={name for name, _ in recount}
+            ).values('name', 'unit').annotate(total=Sum('quantity')).order_by()
+        }
+        for key in recount:
+            required[key] = totals.get(key)
+
+    pantry = pantry_quantities(user_id, deltas)
+    category_ids = resolve_categories(categories.get(key) for key in deltas if key not in items)
+    changed, created, removed = [], [], []
+    for key, item in ((key, items.get(key)) for key in deltas):
+        quantity = None if required[key] is None else to_buy(max(required[key], 0.0), pantry.get(key))
+        if quantity is None:
+            if item is not None:
+                removed.append(item.pk)
+            continue
+        amount, unit = humanize(quantity, key[1])
+        if item is None:
+            created.append(ShoppingListItem(
+                shopping_list_id=shopping_list_id, category_id=category_ids.get(categories.get(key)),
+                name=key[0], quantity=amount, unit=unit, is_generated=True,
+                required=required[key], base_unit=key[1],
+            ))
+        else:
+            # is_purchased is left as it is
+            item.quantity, item.unit, item.required = amount, unit, required[key]
+            changed.append(item)
+
+    if removed:
+        ShoppingListItem.objects.filter(pk__in=removed).delete()
+    if changed:
+        ShoppingListItem.objects.bulk_update(changed, ['quantity', 'unit', 'required'])
+    if created:
+        ShoppingListItem.objects.bulk_create(created)
+
+
+@transaction.atomic
+def update_for_meal(meal_id: int):
+    """Bring the generated lists of a meal's plan up to date with the meal.
+
+    Replaces the meal's contributions and applies the difference to the
+    items of the ingredients it changes. Lists of another plan that still
+    hold the meal (it was moved) have it taken out.
+    """
+    meal_plan_id = Meal.objects.filter(pk=meal_id).values_list('day__meal_plan_id', flat=True).first()
+    lists = list(ShoppingList.objects.filter(
+        Q(meal_plan_id=meal_plan_id) | Q(contributions__meal_id=meal_id), generated_at__isnull=False
+    ).distinct().values_list('id', 'user_id', 'meal_plan_id'))
+    if not lists:
+        return
+    ingredients = meal_ingredients(Meal.objects.filter(pk=meal_id)).get(meal_id, {})
+
+    stored = defaultdict(dict)
+    contributions = ShoppingListContribution.objects.filter(
+        meal_id=meal_id, shopping_list_id__in=[list_id for list_id, _, _ in lists]
+    )
+    for list_id, name, unit, quantity in contributions.values_list('shopping_list_id', 'name', 'unit', 'quantity'):
+        stored[list_id][(name, unit)] = quantity
+
+    changes = []
+    for list_id, user_id, list_plan_id in lists:
+        current = ingredients if list_plan_id == meal_plan_id else {}
+        saved = stored[list_id]
+        deltas = {
+            key: (current[key][0] if key in current else 0.0) - saved.get(key, 0.0)
+            for key in current.keys() | saved.keys()
+        }
+        # An ingredient joining or leaving the meal matters even at no amount
+        deltas = {key: delta for key, delta in deltas.items() if delta or (key in current) != (key in saved)}
+        if deltas:
+            changes.append((list_id, user_id, deltas))
+    if not changes:
+        return
+
+    contributions.filter(shopping_list_id__in=[list_id for list_id, _, _ in changes]).delete()
+    plan_lists = {list_id for list_id, _, list_plan_id in lists if list_plan_id == meal_plan_id}
+    insert_contributions(
+        (list_id, meal_id, name, unit, quantity)
+        for list_id, _, _ in changes if list_id in plan_lists
+        for (name, unit), (quantity, _) in ingredients.items()
+    )
+    categories = {key: category for key, (_, category) in ingredients.items()}
+    for list_id, user_id, deltas in changes:
+        _apply_deltas(list_id, user_id, deltas, categories)
+    refresh_unpurchased(ShoppingList.objects.filter(pk__in=[list_id for list_id, _, _ in changes]))
+
+
+@transaction.atomic
+def remove_meals(meal_ids: Iterable[int]):
+    """Take meals out of the generated lists holding them, before they are deleted.
+
+    The meals' contributions are summed per list and ingredient in one query
+    and each list's items move by the totals, however many meals go.
+    """
+    contributions = ShoppingListContribution.objects.filter(meal_id__in=list(meal_ids))
+    deltas = defaultdict(dict)
+    rows = contributions.values_list('shopping_list_id', 'shopping_list__user_id', 'name', 'unit').annotate(
+        total=Sum('quantity')
+    ).order_by()
+    for list_id, user_id, name, unit, total in rows:
+        deltas[(list_id, user_id)][(name, unit)] = -(total or 0.0)
+    if not deltas:
+        return
+
+    contributions.delete()
+    for (list_id, user_id), list_deltas in deltas.items():
+        _apply_deltas(list_id, user_id, list_deltas, {})
+    refresh_unpurchased(ShoppingList.objects.filter(pk__in=[list_id for list_id, _ in deltas]))
@@ -0,0 +1,20 @@
+# Generated by Django 5.0 on 2026-10-18 07:45
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('meal_plans', '0004_keyset_indexes'),
+        ('shopping', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='shoppinglist',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='shoppinglist_user_created_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0 on 2026-10-18 07:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shopping', '0003_user_scoped_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='shoppinglistitem',
+            name='is_generated',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.0 on 2026-10-18 07:51
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('meal_plans', '0005_user_scoped_indexes'),
+        ('shopping', '0004_shoppinglistitem_is_generated'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='shoppinglist',
+            name='generated_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='shoppinglistitem',
+            name='base_unit',
+            field=models.CharField(blank=True, max_length=20),
+        ),
+        migrations.AddField(
+            model_name='shoppinglistitem',
+            name='required',
+            field=models.FloatField(default=0),
+        ),
+        migrations.CreateModel(
+            name='ShoppingListContribution',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(help_text='Normalised ingredient name', max_length=200)),
+                ('unit', models.CharField(help_text='Base unit', max_length=20)),
+                ('quantity', models.FloatField()),
+                ('meal', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shopping_contributions', to='meal_plans.meal')),
+                ('shopping_list', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='contributions', to='shopping.shoppinglist')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['shopping_list', 'name', 'unit'], name='contribution_ingredient_idx')],
+                'unique_together': {('shopping_list', 'meal', 'name', 'unit')},
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.0 on 2026-10-18 07:10
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def count_unpurchased(apps, schema_editor):
+    # Written out rather than calling shopping.purchases, so the migration
+    # does not change when that module does
+    ShoppingList = apps.get_model('shopping', 'ShoppingList')
+    ShoppingListItem = apps.get_model('shopping', 'ShoppingListItem')
+    unpurchased = ShoppingListItem.objects.filter(
+        shopping_list=OuterRef('pk'), is_purchased=False
+    ).order_by().values('shopping_list').annotate(value=Count('pk')).values('value')
+    ShoppingList.objects.update(unpurchased_count=Coalesce(Subquery(unpurchased), Value(0)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shopping', '0005_shopping_list_contributions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='shoppinglist',
+            name='unpurchased_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(count_unpurchased, migrations.RunPython.noop),
+    ]
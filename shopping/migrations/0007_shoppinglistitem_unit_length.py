@@ -0,0 +1,18 @@
+# Generated by Django 5.0 on 2026-10-18 08:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shopping', '0006_unpurchased_count'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='shoppinglistitem',
+            name='unit',
+            field=models.CharField(choices=[('g', 'Grams'), ('kg', 'Kilograms'), ('ml', 'Milliliters'), ('l', 'Liters'), ('pcs', 'Pieces'), ('tbsp', 'Tablespoons'), ('tsp', 'Teaspoons'), ('cup', 'Cups')], max_length=20),
+        ),
+    ]
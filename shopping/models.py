@@ -1,6 +1,6 @@
 from django.db import models
 from django.contrib.auth.models import User
-from meal_plans.models import MealPlan
+from meal_plans.models import Meal, MealPlan
 
 class IngredientCategory(models.Model):
     name = models.CharField(max_length=100, unique=True)
@@ -14,19 +14,29 @@ class IngredientCategory(models.Model):
         verbose_name_plural = 'Ingredient Categories'
 
 class ShoppingList(models.Model):
-    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    # Indexed by shoppinglist_user_created_idx
+    user = models.ForeignKey(User, on_delete=models.CASCADE, db_index=False)
     meal_plan = models.ForeignKey(MealPlan, on_delete=models.CASCADE, related_name='shopping_lists')
     name = models.CharField(max_length=200)
     notes = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     is_completed = models.BooleanField(default=False)
+    # Items not yet purchased, kept current by shopping.purchases so that
+    # is_completed flips in the same UPDATE
+    unpurchased_count = models.PositiveIntegerField(default=0)
+    # Set by shopping.generation; generated lists follow edits to their plan
+    generated_at = models.DateTimeField(null=True, blank=True)
 
     def __str__(self):
         return f"{self.name} for {self.meal_plan.name}"
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Keyset pagination of a user's lists, see meal_planner_project.pagination
+            models.Index(fields=['user', '-created_at', '-id'], name='shoppinglist_user_created_idx'),
+        ]
 
 class ShoppingListItem(models.Model):
     UNIT_CHOICES = [
@@ -44,10 +54,18 @@ class ShoppingListItem(models.Model):
     category = models.ForeignKey(IngredientCategory, on_delete=models.SET_NULL, null=True)
     name = models.CharField(max_length=200)
     quantity = models.FloatField()
-    unit = models.CharField(max_length=10, choices=UNIT_CHOICES)
+    # As long as RecipeIngredient.unit, so generated items can carry any
+    # unconverted recipe unit whole
+    unit = models.CharField(max_length=20, choices=UNIT_CHOICES)
     is_purchased = models.BooleanField(default=False)
     notes = models.TextField(blank=True)
     estimated_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    # Written by shopping.generation, which replaces these on regeneration
+    is_generated = models.BooleanField(default=False)
+    # Of generated items: the amount the plan's meals need, before the
+    # pantry is taken off, in base_unit (see recipes.units)
+    required = models.FloatField(default=0)
+    base_unit = models.CharField(max_length=20, blank=True)
 
     def __str__(self):
         return f"{self.quantity} {self.unit} of {self.name}"
@@ -55,9 +73,28 @@ class ShoppingListItem(models.Model):
     class Meta:
         ordering = ['category__display_order', 'name']
 
+class ShoppingListContribution(models.Model):
+    """The amount of an ingredient one meal adds to a generated shopping list"""
+    shopping_list = models.ForeignKey(ShoppingList, on_delete=models.CASCADE, related_name='contributions')
+    meal = models.ForeignKey(Meal, on_delete=models.CASCADE, related_name='shopping_contributions')
+    name = models.CharField(max_length=200, help_text="Normalised ingredient name")
+    unit = models.CharField(max_length=20, help_text="Base unit")
+    quantity = models.FloatField()
+
+    class Meta:
+        unique_together = ['shopping_list', 'meal', 'name', 'unit']
+        indexes = [
+            # Totals of one ingredient of a list, see shopping.generation
+            models.Index(fields=['shopping_list', 'name', 'unit'], name='contribution_ingredient_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.quantity} {self.unit} of {self.name}"
+
 class PantryItem(models.Model):
     """Track ingredients the user already has"""
-    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    # Indexed by pantryitem_user_expiry_idx
+    user = models.ForeignKey(User, on_delete=models.CASCADE, db_index=False)
     category = models.ForeignKey(IngredientCategory, on_delete=models.SET_NULL, null=True)
     name = models.CharField(max_length=200)
     quantity = models.FloatField()
@@ -73,3 +110,7 @@ class PantryItem(models.Model):
     class Meta:
         ordering = ['category__display_order', 'name']
         verbose_name_plural = 'Pantry Items'
+        indexes = [
+            # expiring_soon: a user's items in an expiry date range
+            models.Index(fields=['user', 'expiry_date'], name='pantryitem_user_expiry_idx'),
+        ]
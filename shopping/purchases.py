@@ -0,0 +1,66 @@
+"""
+Purchase state of shopping-list items and the lists' completion.
+
+Every list stores how many of its items are not yet purchased
+(``ShoppingList.unpurchased_count``). Marking items is one conditional
+UPDATE of the items whose state actually changes, and its row count moves
+the list's counter with an F() update that sets ``is_completed`` in the same
+statement. Two people checking items off the same list at once therefore
+neither scan the list nor lose each other's changes.
+
+``shopping.signals`` applies the change of an item saved or deleted.
+Bulk writes (``bulk_create`` and ``QuerySet.update``) send no signals, so
+code that uses them adjusts the counter itself or calls
+``refresh_unpurchased`` afterwards.
+"""
+from typing import Iterable, Optional
+
+from django.db import transaction
+from django.db.models import BooleanField, Count, Exists, ExpressionWrapper, F, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from .models import ShoppingList, ShoppingListItem
+
+
+def adjust_unpurchased(shopping_list_id: int, delta: int):
+    """Add ``delta`` to a list's unpurchased count, completing it when none are left"""
+    if not delta:
+        return
+    if delta > 0:
+        is_completed = Value(False)
+    else:
+        # The SET expressions see the row as it was before the update
+        is_completed = ExpressionWrapper(Q(unpurchased_count__lte=-delta), output_field=BooleanField())
+    ShoppingList.objects.filter(pk=shopping_list_id).update(
+        unpurchased_count=F('unpurchased_count') + delta, is_completed=is_completed
+    )
+
+
+def refresh_unpurchased(shopping_lists):
+    """Recount the unpurchased items of a ShoppingList queryset, in one UPDATE"""
+    items = ShoppingListItem.objects.filter(shopping_list=OuterRef('pk'))
+    unpurchased = items.filter(is_purchased=False).order_by().values('shopping_list')
+    shopping_lists.update(
+        unpurchased_count=Coalesce(Subquery(unpurchased.annotate(value=Count('pk')).values('value')), Value(0)),
+        is_completed=ExpressionWrapper(Exists(items) & ~Exists(unpurchased), output_field=BooleanField()),
+    )
+
+
+@transaction.atomic
+def set_purchased(shopping_list_id: int, item_ids: Iterable[int], is_purchased: Optional[bool] = None) -> int:
+    """Mark items of a list purchased or not, or toggle each when ``is_purchased`` is None.
+
+    Returns the number of items changed; ids of other lists are ignored.
+    """
+    items = ShoppingListItem.objects.filter(shopping_list_id=shopping_list_id, pk__in=list(item_ids))
+    if is_purchased is None:
+        changed = items.update(is_purchased=ExpressionWrapper(Q(is_purchased=False), output_field=BooleanField()))
+        # The updated rows stay locked until commit, so they can be counted
+        # after the fact: items now unpurchased were purchased before
+        now_unpurchased = items.filter(is_purchased=False).count()
+        delta = now_unpurchased - (changed - now_unpurchased)
+    else:
+        changed = items.filter(is_purchased=not is_purchased).update(is_purchased=is_purchased)
+        delta = -changed if is_purchased else changed
+    adjust_unpurchased(shopping_list_id, delta)
+    return changed
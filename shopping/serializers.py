@@ -1,4 +1,9 @@
+from decimal import Decimal
+
+from django.db.models import Count, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
 from rest_framework import serializers
+from meal_planner_project.fieldsets import Expandable, ExpandableFieldsMixin
 from .models import IngredientCategory, ShoppingList, ShoppingListItem, PantryItem
 
 class IngredientCategorySerializer(serializers.ModelSerializer):
@@ -6,8 +11,10 @@ class IngredientCategorySerializer(serializers.ModelSerializer):
         model = IngredientCategory
         fields = '__all__'
 
-class ShoppingListItemSerializer(serializers.ModelSerializer):
-    category = IngredientCategorySerializer(read_only=True)
+class ShoppingListItemSerializer(ExpandableFieldsMixin, serializers.ModelSerializer):
+    expandable_fields = {
+        'category': Expandable(IngredientCategorySerializer),
+    }
     category_id = serializers.PrimaryKeyRelatedField(
         write_only=True,
         source='category',
@@ -19,9 +26,26 @@ class ShoppingListItemSerializer(serializers.ModelSerializer):
     class Meta:
         model = ShoppingListItem
         fields = '__all__'
+        read_only_fields = ('is_generated',)
 
-class ShoppingListSerializer(serializers.ModelSerializer):
-    items = ShoppingListItemSerializer(many=True, read_only=True)
+def _item_total(aggregate, default=0, **filters):
+    """Correlated subquery aggregating the items of the outer list, ``default`` if it has none"""
+    items = ShoppingListItem.objects.filter(shopping_list=OuterRef('pk'), **filters).order_by().values('shopping_list')
+    return Coalesce(Subquery(items.annotate(value=aggregate).values('value')), Value(default))
+
+class ShoppingListSerializer(ExpandableFieldsMixin, serializers.ModelSerializer):
+    """Shopping list with item ids; ``?expand=items`` nests the items"""
+    expandable_fields = {
+        'items': Expandable(ShoppingListItemSerializer, many=True),
+        'meal_plan': Expandable('meal_plans.serializers.MealPlanSerializer'),
+    }
+    # The totals are annotated on the list query, so they cost no query per
+    # list and need no items loaded
+    field_annotations = {
+        'total_items': {'item_count': _item_total(Count('pk'))},
+        'total_purchased': {'purchased_count': _item_total(Count('pk'), is_purchased=True)},
+        'estimated_total_cost': {'items_cost': _item_total(Sum('estimated_price'), Decimal(0))},
+    }
     total_items = serializers.SerializerMethodField()
     total_purchased = serializers.SerializerMethodField()
     estimated_total_cost = serializers.SerializerMethodField()
@@ -29,20 +53,17 @@ class ShoppingListSerializer(serializers.ModelSerializer):
     class Meta:
         model = ShoppingList
         fields = '__all__'
-        read_only_fields = ('user',)
+        # Kept by shopping.purchases and shopping.generation
+        read_only_fields = ('user', 'unpurchased_count', 'is_completed', 'generated_at')
 
     def get_total_items(self, obj):
-        return obj.items.count()
+        return obj.item_count
 
     def get_total_purchased(self, obj):
-        return obj.items.filter(is_purchased=True).count()
+        return obj.purchased_count
 
     def get_estimated_total_cost(self, obj):
-        total = sum(
-            item.estimated_price or 0 
-            for item in obj.items.all()
-        )
-        return round(total, 2)
+        return round(obj.items_cost, 2)
 
     def create(self, validated_data):
         user = self.context['request'].user
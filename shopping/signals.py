@@ -0,0 +1,88 @@
+"""
+Signal handlers keeping generated shopping lists in step with their meal
+plans (see ``generation.update_for_meal`` and ``generation.remove_meals``),
+and lists' unpurchased counts in step with items saved on their own (see
+``purchases``).
+
+Deleting a plan deletes its lists too, so the meals going with it are not
+taken out of them one by one, and neither the lists' nor the plan's items
+move any counters.
+"""
+from collections import Counter
+
+from django.db.models.signals import post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from meal_planner_project.deletion import deleted_rows, deleted_with
+from meal_plans.models import Meal, MealPlan, MealPlanDay
+from .generation import remove_meals, update_for_meal
+from .models import ShoppingList, ShoppingListItem
+from .purchases import adjust_unpurchased
+
+# Meal fields that change what the meal adds to a shopping list, or which list
+SHOPPING_FIELDS = {'recipe', 'recipe_id', 'servings', 'day', 'day_id'}
+
+
+@receiver(post_save, sender=Meal)
+def update_lists_on_meal_save(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    if raw:
+        return
+    if update_fields is not None and not set(update_fields) & SHOPPING_FIELDS:
+        return
+    # Stored by meal_plans.signals before the save
+    saved = getattr(instance, '_saved_portion', None)
+    if not created and saved == (instance.recipe_id, instance.servings, instance.day_id):
+        return
+    update_for_meal(instance.pk)
+
+
+@receiver(pre_delete, sender=Meal)
+def update_lists_on_meal_delete(sender, instance, origin=None, **kwargs):
+    # Before the delete, while the meal's contributions are still stored
+    if deleted_with(origin, (MealPlan, MealPlanDay)):
+        return
+    rows = deleted_rows(origin, sender, instance, handler='shopping')
+    remove_meals([row['pk'] for row in rows])
+
+
+@receiver(pre_delete, sender=MealPlanDay)
+def update_lists_on_day_delete(sender, instance, origin=None, **kwargs):
+    if deleted_with(origin, MealPlan):
+        return
+    rows = deleted_rows(origin, sender, instance, handler='shopping')
+    remove_meals(Meal.objects.filter(day__in=[row['pk'] for row in rows]).values_list('pk', flat=True))
+
+
+@receiver(pre_save, sender=ShoppingListItem)
+def remember_item_state(sender, instance, raw=False, **kwargs):
+    instance._saved_state = None
+    if not raw and not instance._state.adding and instance.pk is not None:
+        instance._saved_state = ShoppingListItem.objects.filter(pk=instance.pk).values_list(
+            'shopping_list_id', 'is_purchased'
+        ).first()
+
+
+@receiver(post_save, sender=ShoppingListItem)
+def update_unpurchased_on_item_save(sender, instance, created, raw=False, **kwargs):
+    saved = getattr(instance, '_saved_state', None)
+    instance._saved_state = None
+    if raw or saved == (instance.shopping_list_id, instance.is_purchased):
+        return
+    if saved is not None and not saved[1]:
+        adjust_unpurchased(saved[0], -1)
+    if not instance.is_purchased:
+        adjust_unpurchased(instance.shopping_list_id, 1)
+
+
+@receiver(pre_delete, sender=ShoppingListItem)
+def update_unpurchased_on_item_delete(sender, instance, origin=None, **kwargs):
+    # Before the delete, to read the stored state of a QuerySet.delete()'s rows
+    if deleted_with(origin, (MealPlan, ShoppingList)):
+        return
+    removed = Counter(
+        row['shopping_list_id']
+        for row in deleted_rows(origin, sender, instance, 'shopping_list_id', 'is_purchased', handler='unpurchased')
+        if not row['is_purchased']
+    )
+    for shopping_list_id, count in removed.items():
+        adjust_unpurchased(shopping_list_id, -count)
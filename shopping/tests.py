@@ -8,10 +8,16 @@ from django.utils import timezone
 from rest_framework.test import APITestCase, APIClient
 from rest_framework import status
 from datetime import timedelta
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from .models import IngredientCategory, ShoppingList, ShoppingListItem, PantryItem
-from meal_plans.models import MealPlan
+from meal_plans.models import Meal, MealPlan, MealPlanDay, MealType
 from recipes.models import Recipe
 from .serializers import ShoppingListSerializer, PantryItemSerializer
+from .generation import generate_shopping_list
+from .purchases import set_purchased
+from .views import PantryItemViewSet, ShoppingListItemViewSet, ShoppingListViewSet
+from meal_planner_project.query_plans import QueryPlanTestMixin, query_plan
 
 class ShoppingModelTests(TestCase):
     def setUp(self):
@@ -144,6 +150,204 @@ class ShoppingAPITests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertTrue(PantryItem.objects.filter(name='Apples').exists())
 
+class ShoppingPlanMixin:
+    """A week of porridge breakfasts and salad lunches with a list to generate"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            password='testpass123'
+        )
+        self.produce = IngredientCategory.objects.create(name='Produce')
+        self.porridge = self._recipe('Porridge', servings=2, ingredients=[
+            {'name': 'Rolled oats', 'amount': 100, 'unit': 'g'},
+            {'name': 'Milk', 'amount': 0.5, 'unit': 'l'},
+            {'name': 'Apples', 'amount': 2, 'unit': 'pieces', 'category': self.produce.id},
+        ])
+        self.salad = self._recipe('Salad', servings=1, ingredients=[
+            {'name': 'Apple', 'amount': 1, 'unit': 'pcs', 'category': 'Produce'},
+            {'name': 'Oats', 'amount': 1, 'unit': 'tbsp'},
+        ])
+        self.breakfast = MealType.objects.create(name='Breakfast')
+        self.lunch = MealType.objects.create(name='Lunch')
+        self.meal_plan = self._meal_plan(7)
+        self.shopping_list = ShoppingList.objects.create(
+            user=self.user,
+            name='Week',
+            meal_plan=self.meal_plan
+        )
+
+    def _recipe(self, title, servings, ingredients):
+        return Recipe.objects.create(
+            title=title, description='', ingredients=ingredients, instructions='',
+            prep_time=5, cook_time=5, servings=servings, calories_per_serving=300,
+            protein=10, carbs=40, fat=8, created_by=self.user
+        )
+
+    def _meal_plan(self, days):
+        start = timezone.now().date()
+        meal_plan = MealPlan.objects.create(
+            user=self.user, name=f'{days} days', start_date=start, end_date=start + timedelta(days=days - 1)
+        )
+        for i in range(days):
+            day = MealPlanDay.objects.create(meal_plan=meal_plan, date=start + timedelta(days=i))
+            Meal.objects.create(day=day, meal_type=self.breakfast, recipe=self.porridge, servings=1)
+            Meal.objects.create(day=day, meal_type=self.lunch, recipe=self.salad, servings=2)
+        return meal_plan
+
+    def _items(self):
+        return {
+            (item.name, item.unit): (item.quantity, item.category_id)
+            for item in self.shopping_list.items.filter(is_generated=True)
+        }
+
+class ShoppingGenerationTests(ShoppingPlanMixin, TestCase):
+    def test_sums_scaled_base_quantities(self):
+        PantryItem.objects.create(user=self.user, name='Milk', quantity=1, unit='l')
+        PantryItem.objects.create(user=self.user, name='Rolled Oats', quantity=1, unit='kg')
+        generate_shopping_list(self.shopping_list)
+
+        self.assertEqual(self._items(), {
+            # 7 * (2 / 2) from porridge + 7 * 2 from salad
+            ('apple', 'pcs'): (21, self.produce.id),
+            # 1.75 l less the litre in the pantry
+            ('milk', 'ml'): (750, None),
+            # 14 tbsp of oats, weighed
+            ('oat', 'g'): (84.9, None),
+        })
+
+    def test_regenerating_replaces_generated_items_only(self):
+        ShoppingListItem.objects.create(
+            shopping_list=self.shopping_list, name='Coffee', quantity=1, unit='pcs'
+        )
+        generate_shopping_list(self.shopping_list)
+        first = self._items()
+        generate_shopping_list(self.shopping_list)
+
+        self.assertEqual(self._items(), first)
+        self.assertEqual(self.shopping_list.items.count(), len(first) + 1)
+        self.shopping_list.refresh_from_db()
+        self.assertEqual(self.shopping_list.unpurchased_count, len(first) + 1)
+
+    def test_unconverted_units_are_kept_whole(self):
+        stew = self._recipe('Stew', servings=1, ingredients=[
+            {'name': 'Parsley', 'amount': 1, 'unit': 'heaped dessertspoon'},
+        ])
+        Meal.objects.create(day=self.meal_plan.days.first(), meal_type=MealType.objects.create(name='Dinner'),
+                            recipe=stew, servings=2)
+        generate_shopping_list(self.shopping_list)
+
+        self.assertEqual(self._items()[('parsley', 'heaped dessertspoon')], (2, None))
+
+    def _reads(self, func):
+        with CaptureQueriesContext(connection) as queries:
+            func()
+        return [query['sql'] for query in queries if query['sql'].startswith('SELECT')]
+
+    def test_reads_do_not_grow_with_plan_length(self):
+        long_list = ShoppingList.objects.create(user=self.user, name='Quarter', meal_plan=self._meal_plan(90))
+
+        short_reads = self._reads(lambda: generate_shopping_list(self.shopping_list))
+        self.assertEqual(len(self._reads(lambda: generate_shopping_list(long_list))), len(short_reads))
+        self.assertEqual(long_list.items.get(name='apple').quantity, 270)
+
+class IncrementalShoppingListTests(ShoppingPlanMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        generate_shopping_list(self.shopping_list)
+        self.apples = self.shopping_list.items.get(name='apple')
+        self.apples.is_purchased = True
+        self.apples.save()
+        self.lunch_meal = Meal.objects.filter(day__meal_plan=self.meal_plan, meal_type=self.lunch).first()
+
+    def test_reserving_a_meal_moves_its_ingredients(self):
+        self.lunch_meal.servings = 4
+        self.lunch_meal.save()
+
+        self.apples.refresh_from_db()
+        self.assertEqual((self.apples.quantity, self.apples.unit), (23, 'pcs'))
+        self.assertTrue(self.apples.is_purchased)
+        self.assertEqual(self._items()[('oat', 'g')], (97, None))
+
+    def test_adding_and_removing_meals(self):
+        soup = self._recipe('Soup', servings=1, ingredients=[{'name': 'Leeks', 'amount': 2, 'unit': 'pcs'}])
+        day = self.lunch_meal.day
+        dinner = Meal.objects.create(day=day, meal_type=MealType.objects.create(name='Dinner'), recipe=soup)
+        self.assertEqual(self._items()[('leek', 'pcs')], (2, None))
+
+        dinner.delete()
+        Meal.objects.filter(day__meal_plan=self.meal_plan, meal_type=self.lunch).delete()
+        items = self._items()
+        self.assertNotIn(('leek', 'pcs'), items)
+        self.assertNotIn(('oat', 'g'), items)
+        self.assertEqual(items[('apple', 'pcs')], (7, self.produce.id))
+        self.assertFalse(self.shopping_list.contributions.filter(name='oat').exists())
+
+    def test_matches_a_full_regeneration(self):
+        self.lunch_meal.recipe = self.porridge
+        self.lunch_meal.save()
+        Meal.objects.filter(day__meal_plan=self.meal_plan, meal_type=self.breakfast).first().delete()
+        incremental = self._items()
+
+        generate_shopping_list(self.shopping_list)
+        self.assertEqual(self._items(), incremental)
+        self.assertTrue(self.shopping_list.items.get(name='apple').is_purchased)
+
+    def test_edit_cost_does_not_grow_with_plan_length(self):
+        long_list = ShoppingList.objects.create(user=self.user, name='Quarter', meal_plan=self._meal_plan(90))
+        generate_shopping_list(long_list)
+        long_meal = Meal.objects.filter(day__meal_plan=long_list.meal_plan, meal_type=self.lunch).first()
+
+        def edit(meal):
+            meal.servings += 1
+            with CaptureQueriesContext(connection) as queries:
+                meal.save()
+            return len(queries)
+
+        self.assertEqual(edit(long_meal), edit(self.lunch_meal))
+        self.assertEqual(long_list.items.get(name='apple').quantity, 271)
+
+    def test_moving_a_meal_between_plans(self):
+        other_list = ShoppingList.objects.create(user=self.user, name='Next week', meal_plan=self._meal_plan(7))
+        generate_shopping_list(other_list)
+        other_day = MealPlanDay.objects.create(meal_plan=other_list.meal_plan, date=timezone.now().date() + timedelta(days=7))
+
+        self.lunch_meal.day = other_day
+        self.lunch_meal.save()
+
+        self.assertEqual(self._items()[('apple', 'pcs')], (19, self.produce.id))
+        self.assertEqual(other_list.items.get(name='apple').quantity, 23)
+        self.assertFalse(self.shopping_list.contributions.filter(meal=self.lunch_meal).exists())
+        generate_shopping_list(self.shopping_list)
+        self.assertEqual(self._items()[('apple', 'pcs')], (19, self.produce.id))
+
+    def test_deleting_a_day_takes_its_meals_out(self):
+        self.lunch_meal.day.delete()
+
+        self.assertEqual(self._items()[('apple', 'pcs')], (18, self.produce.id))
+        incremental = self._items()
+        generate_shopping_list(self.shopping_list)
+        self.assertEqual(self._items(), incremental)
+
+    def test_plan_delete_cost_does_not_grow_with_plan_length(self):
+        long_list = ShoppingList.objects.create(user=self.user, name='Quarter', meal_plan=self._meal_plan(90))
+        generate_shopping_list(long_list)
+
+        def delete(meal_plan):
+            with CaptureQueriesContext(connection) as queries:
+                meal_plan.delete()
+            return len(queries)
+
+        # Only Django's own batching of the 180 meal rows differs
+        self.assertLessEqual(delete(long_list.meal_plan), delete(self.meal_plan) + 1)
+        self.assertFalse(ShoppingList.objects.exists())
+
+    def test_lists_not_generated_are_left_alone(self):
+        manual = ShoppingList.objects.create(user=self.user, name='Manual', meal_plan=self.meal_plan)
+        self.lunch_meal.servings = 3
+        self.lunch_meal.save()
+        self.assertFalse(manual.items.exists())
+
 class PantryAPITests(APITestCase):
     def setUp(self):
         self.client = APIClient()
@@ -185,3 +389,237 @@ class PantryAPITests(APITestCase):
         
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(len(response.data), 1)  # Only the low stock item
+
+    def test_list_pages_by_category_then_name(self):
+        dairy = IngredientCategory.objects.create(name='Dairy', display_order=2)
+        for name in ('Yogurt', 'Butter', 'Milk'):
+            PantryItem.objects.create(user=self.user, category=dairy, name=name, quantity=1, unit='pcs')
+        PantryItem.objects.create(user=self.user, name='Salt', quantity=1, unit='g')
+
+        names = []
+        url, params = reverse('pantryitem-list'), {'page_size': 1}
+        while url:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            names.extend(item['name'] for item in response.data['results'])
+            url, params = response.data['next'], None
+        self.assertEqual(names, ['Salt', 'Apples', 'Butter', 'Milk', 'Yogurt'])
+
+class ShoppingListFieldsetTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            password='testpass123'
+        )
+        self.client.force_authenticate(user=self.user)
+        category = IngredientCategory.objects.create(name='Dairy')
+        self.meal_plan = meal_plan = MealPlan.objects.create(
+            user=self.user,
+            name='Plan',
+            start_date=timezone.now().date(),
+            end_date=timezone.now().date()
+        )
+        for i in range(3):
+            shopping_list = ShoppingList.objects.create(user=self.user, meal_plan=meal_plan, name=f'List {i}')
+            for j in range(4):
+                ShoppingListItem.objects.create(
+                    shopping_list=shopping_list,
+                    category=category,
+                    name=f'Item {j}',
+                    quantity=1,
+                    unit='g',
+                    estimated_price=2,
+                    is_purchased=j < 2
+                )
+        self.url = reverse('shoppinglist-list')
+
+    def test_create_with_compact_meal_plan(self):
+        response = self.client.post(self.url, {'name': 'New', 'meal_plan': self.meal_plan.id}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['meal_plan'], self.meal_plan.id)
+        self.assertEqual(ShoppingList.objects.get(pk=response.data['id']).user, self.user)
+
+    def test_compact_list(self):
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url)
+        shopping_list = response.data['results'][0]
+        self.assertEqual(len(shopping_list['items']), 4)
+        self.assertIsInstance(shopping_list['items'][0], int)
+        self.assertEqual((shopping_list['total_items'], shopping_list['total_purchased']), (4, 2))
+        self.assertEqual(shopping_list['estimated_total_cost'], 8)
+
+    def test_expanded_list(self):
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url, {'expand': 'items.category'})
+        self.assertEqual(response.data['results'][0]['items'][0]['category']['name'], 'Dairy')
+
+    def test_sparse_fields_skip_items(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, {'fields': 'id,name'})
+        self.assertEqual(set(response.data['results'][0]), {'id', 'name'})
+
+    def test_totals_do_not_query_per_list(self):
+        fields = {'fields': 'id,total_items,total_purchased,estimated_total_cost'}
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, fields)
+        self.assertEqual(len(response.data['results']), 3)
+
+        meal_plan = MealPlan.objects.get()
+        for i in range(3, 10):
+            ShoppingList.objects.create(user=self.user, meal_plan=meal_plan, name=f'List {i}')
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, fields)
+        totals = {(t['total_items'], t['total_purchased'], t['estimated_total_cost']) for t in response.data['results']}
+        self.assertEqual(totals, {(0, 0, 0), (4, 2, 8)})
+
+    def test_totals_follow_actions(self):
+        shopping_list = ShoppingList.objects.first()
+        url = reverse('shoppinglist-mark-all-purchased', args=[shopping_list.id])
+        response = self.client.post(url)
+        self.assertEqual((response.data['total_items'], response.data['total_purchased']), (4, 4))
+
+class ShoppingPurchaseTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            password='testpass123'
+        )
+        self.client.force_authenticate(user=self.user)
+        meal_plan = MealPlan.objects.create(
+            user=self.user,
+            name='Plan',
+            start_date=timezone.now().date(),
+            end_date=timezone.now().date()
+        )
+        self.shopping_list = ShoppingList.objects.create(user=self.user, meal_plan=meal_plan, name='Groceries')
+        self.other_list = ShoppingList.objects.create(user=self.user, meal_plan=meal_plan, name='Other')
+        self.items = [
+            ShoppingListItem.objects.create(shopping_list=self.shopping_list, name=f'Item {i}', quantity=1, unit='pcs')
+            for i in range(5)
+        ]
+        self.other_item = ShoppingListItem.objects.create(
+            shopping_list=self.other_list, name='Other', quantity=1, unit='pcs'
+        )
+        self.url = reverse('shoppinglist-purchase', args=[self.shopping_list.id])
+
+    def _state(self):
+        self.shopping_list.refresh_from_db()
+        return self.shopping_list.unpurchased_count, self.shopping_list.is_completed
+
+    def test_counter_follows_item_writes(self):
+        self.assertEqual(self._state(), (5, False))
+        self.items[0].is_purchased = True
+        self.items[0].save()
+        self.items[1].shopping_list = self.other_list
+        self.items[1].save()
+        self.assertEqual(self._state(), (3, False))
+
+        self.client.delete(reverse('shoppinglistitem-detail', args=[self.items[2].id]))
+        self.assertEqual(self._state(), (2, False))
+
+        # Deletes outside the API and bulk deletes are counted too
+        self.items[3].delete()
+        ShoppingListItem.objects.filter(pk__in=[self.items[0].id, self.items[4].id]).delete()
+        self.assertEqual(self._state(), (0, True))
+
+    def test_stored_state_is_read_only(self):
+        response = self.client.patch(
+            reverse('shoppinglist-detail', args=[self.shopping_list.id]),
+            {'name': 'Weekly', 'unpurchased_count': 0, 'is_completed': True, 'generated_at': timezone.now()},
+            format='json'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self._state(), (5, False))
+        self.assertEqual(self.shopping_list.name, 'Weekly')
+        self.assertIsNone(self.shopping_list.generated_at)
+
+    def test_batch_purchase_completes_the_list(self):
+        ids = [item.id for item in self.items]
+        with CaptureQueriesContext(connection) as one:
+            self.client.post(self.url, {'items': ids[:1], 'is_purchased': True}, format='json')
+        with CaptureQueriesContext(connection) as several:
+            response = self.client.post(self.url, {'items': ids[:3], 'is_purchased': True}, format='json')
+        self.assertEqual(len(several), len(one))
+        self.assertEqual((response.data['total_purchased'], response.data['is_completed']), (3, False))
+
+        # Already purchased items and those of other lists are left alone
+        response = self.client.post(
+            self.url, {'items': ids + [self.other_item.id], 'is_purchased': True}, format='json'
+        )
+        self.assertEqual(response.data['total_purchased'], 5)
+        self.assertEqual(self._state(), (0, True))
+        self.other_item.refresh_from_db()
+        self.assertFalse(self.other_item.is_purchased)
+
+        response = self.client.post(self.url, {'items': ids[:1], 'is_purchased': False}, format='json')
+        self.assertEqual(self._state(), (1, False))
+
+    def test_batch_toggle(self):
+        set_purchased(self.shopping_list.id, [self.items[0].id], True)
+        response = self.client.post(self.url, {'items': [self.items[0].id, self.items[1].id]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            set(self.shopping_list.items.filter(is_purchased=True).values_list('name', flat=True)), {'Item 1'}
+        )
+        self.assertEqual(self._state(), (4, False))
+
+    def test_overlapping_checkers_count_each_item_once(self):
+        ids = [item.id for item in self.items]
+        # Two people tick off overlapping items from the same stale view
+        self.assertEqual(set_purchased(self.shopping_list.id, ids[:4], True), 4)
+        self.assertEqual(set_purchased(self.shopping_list.id, ids[2:], True), 1)
+        self.assertEqual(self._state(), (0, True))
+
+    def test_toggle_purchased_item(self):
+        for item in self.items[:-1]:
+            set_purchased(self.shopping_list.id, [item.id], True)
+        url = reverse('shoppinglistitem-toggle-purchased', args=[self.items[-1].id])
+        response = self.client.post(url)
+        self.assertTrue(response.data['is_purchased'])
+        self.assertEqual(self._state(), (0, True))
+
+    def test_rejects_bad_items(self):
+        for data in ({}, {'items': 'all'}, {'items': [1], 'is_purchased': 'yes'}):
+            response = self.client.post(self.url, data, format='json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+class ShoppingQueryPlanTests(QueryPlanTestMixin, TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            password='testpass123'
+        )
+        meal_plan = MealPlan.objects.create(
+            user=self.user,
+            name='Week',
+            start_date=timezone.now().date(),
+            end_date=timezone.now().date() + timedelta(days=6)
+        )
+        category = IngredientCategory.objects.create(name='Produce')
+        shopping_list = ShoppingList.objects.create(user=self.user, meal_plan=meal_plan, name='Groceries')
+        ShoppingListItem.objects.create(
+            shopping_list=shopping_list, category=category, name='Apples', quantity=1, unit='pcs'
+        )
+        PantryItem.objects.create(
+            user=self.user, category=category, name='Pears', quantity=1, unit='pcs',
+            expiry_date=timezone.now().date()
+        )
+
+    def test_list_pages(self):
+        for viewset in (ShoppingListViewSet, PantryItemViewSet):
+            for queryset in self.page_querysets(viewset, self.user):
+                self.assertIndexed(queryset)
+
+    def test_items_and_expiring_pantry(self):
+        queryset, _ = self.view_queryset(ShoppingListItemViewSet, self.user)
+        self.assertIndexed(queryset)
+
+        today = timezone.now().date()
+        queryset = PantryItem.objects.filter(
+            user=self.user, expiry_date__isnull=False, expiry_date__lte=today + timedelta(days=7),
+            expiry_date__gte=today
+        ).order_by('expiry_date')
+        self.assertIndexed(queryset)
+        self.assertIn('pantryitem_user_expiry_idx', ' '.join(query_plan(queryset)))
@@ -1,13 +1,13 @@
-from django.urls import path
+from django.urls import path, include
+from rest_framework.routers import SimpleRouter
 from . import views
 
-app_name = 'shopping'
+router = SimpleRouter()
+router.register('lists', views.ShoppingListViewSet, basename='shoppinglist')
+router.register('items', views.ShoppingListItemViewSet, basename='shoppinglistitem')
+router.register('pantry', views.PantryItemViewSet, basename='pantryitem')
+router.register('categories', views.IngredientCategoryViewSet)
 
 urlpatterns = [
-    path('lists/', views.ShoppingListList.as_view(), name='shopping-list-list'),
-    path('lists/<int:pk>/', views.ShoppingListDetail.as_view(), name='shopping-list-detail'),
-    path('lists/generate/<int:meal_plan_id>/', views.GenerateShoppingList.as_view(), name='generate-shopping-list'),
-    path('items/', views.ShoppingItemList.as_view(), name='shopping-item-list'),
-    path('items/<int:pk>/', views.ShoppingItemDetail.as_view(), name='shopping-item-detail'),
-    path('categories/', views.ShoppingCategoryList.as_view(), name='shopping-category-list'),
+    path('', include(router.urls)),
 ]
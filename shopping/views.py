@@ -3,8 +3,15 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from django.db import transaction
+from django.db.models import F, IntegerField, Value
+from django.db.models.functions import Coalesce
 from django.utils import timezone
+from meal_planner_project.fieldsets import ExpandableQuerysetMixin
+from meal_planner_project.pagination import KeysetPagination
+from .generation import generate_shopping_list
 from .models import IngredientCategory, ShoppingList, ShoppingListItem, PantryItem
+from .purchases import set_purchased
 from .serializers import (
     IngredientCategorySerializer, ShoppingListSerializer,
     ShoppingListItemSerializer, PantryItemSerializer
@@ -15,56 +22,29 @@ class IngredientCategoryViewSet(viewsets.ModelViewSet):
     serializer_class = IngredientCategorySerializer
     permission_classes = [IsAuthenticated]
 
-class ShoppingListViewSet(viewsets.ModelViewSet):
+class ShoppingListViewSet(ExpandableQuerysetMixin, viewsets.ModelViewSet):
     serializer_class = ShoppingListSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
+    keyset_ordering = ('-created_at',)
 
     def get_queryset(self):
-        return ShoppingList.objects.filter(user=self.request.user)
+        queryset = ShoppingList.objects.filter(user=self.request.user)
+        # Actions that change the items serialise the list afterwards, so a
+        # prefetch taken before the change would be stale
+        if self.action in ('list', 'retrieve'):
+            queryset = self.optimize_queryset(queryset)
+        return queryset
 
     @action(detail=True, methods=['POST'])
     def generate_from_meal_plan(self, request, pk=None):
-        """Generate shopping list items from a meal plan"""
+        """Generate shopping list items from a meal plan.
+
+        Replaces the items generated before, keeping any added by hand.
+        """
         shopping_list = self.get_object()
-        meal_plan = shopping_list.meal_plan
-        
-        # Get all meals in the plan
-        meals = []
-        for day in meal_plan.days.all():
-            meals.extend(day.meals.all())
-
-        # Create a dictionary to track ingredients
-        ingredients_dict = {}
-
-        # Process each meal
-        for meal in meals:
-            recipe = meal.recipe
-            servings_multiplier = meal.servings / recipe.servings
-
-            for ingredient in recipe.ingredients:
-                key = (ingredient['name'], ingredient.get('unit'), ingredient.get('category'))
-                current_amount = ingredients_dict.get(key, 0)
-                ingredients_dict[key] = current_amount + (ingredient['amount'] * servings_multiplier)
-
-        # Check pantry items and adjust quantities
-        pantry_items = PantryItem.objects.filter(user=request.user)
-        for pantry_item in pantry_items:
-            key = (pantry_item.name, pantry_item.unit, pantry_item.category_id)
-            if key in ingredients_dict:
-                if pantry_item.quantity >= ingredients_dict[key]:
-                    del ingredients_dict[key]
-                else:
-                    ingredients_dict[key] -= pantry_item.quantity
-
-        # Create shopping list items
-        for (name, unit, category_id), amount in ingredients_dict.items():
-            ShoppingListItem.objects.create(
-                shopping_list=shopping_list,
-                category_id=category_id,
-                name=name,
-                quantity=amount,
-                unit=unit
-            )
+        generate_shopping_list(shopping_list)
+        shopping_list.refresh_from_db(fields=['unpurchased_count', 'is_completed'])
 
         serializer = self.get_serializer(shopping_list)
         return Response(serializer.data)
@@ -73,10 +53,38 @@ class ShoppingListViewSet(viewsets.ModelViewSet):
     def mark_all_purchased(self, request, pk=None):
         """Mark all items in the shopping list as purchased"""
         shopping_list = self.get_object()
-        shopping_list.items.update(is_purchased=True)
-        shopping_list.is_completed = True
-        shopping_list.save()
-        
+        with transaction.atomic():
+            shopping_list.items.filter(is_purchased=False).update(is_purchased=True)
+            ShoppingList.objects.filter(pk=shopping_list.pk).update(unpurchased_count=0, is_completed=True)
+        shopping_list.refresh_from_db(fields=['unpurchased_count', 'is_completed'])
+
+        serializer = self.get_serializer(shopping_list)
+        return Response(serializer.data)
+
+    @action(detail=True, methods=['POST'])
+    def purchase(self, request, pk=None):
+        """Mark many items of the list purchased or not in one request.
+
+        Takes ``items``, a list of item ids, and ``is_purchased``; without
+        ``is_purchased`` each item is toggled.
+        """
+        shopping_list = self.get_object()
+        item_ids = request.data.get('items')
+        is_purchased = request.data.get('is_purchased')
+        if not isinstance(item_ids, list) or not all(isinstance(i, int) and not isinstance(i, bool) for i in item_ids):
+            return Response(
+                {'error': 'items must be a list of item ids'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if is_purchased is not None and not isinstance(is_purchased, bool):
+            return Response(
+                {'error': 'is_purchased must be true or false'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        set_purchased(shopping_list.pk, item_ids, is_purchased)
+        shopping_list.refresh_from_db(fields=['unpurchased_count', 'is_completed'])
+
         serializer = self.get_serializer(shopping_list)
         return Response(serializer.data)
 
@@ -107,36 +115,37 @@ class ShoppingListViewSet(viewsets.ModelViewSet):
 
         return Response(added_items)
 
-class ShoppingListItemViewSet(viewsets.ModelViewSet):
+class ShoppingListItemViewSet(ExpandableQuerysetMixin, viewsets.ModelViewSet):
     serializer_class = ShoppingListItemSerializer
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        return ShoppingListItem.objects.filter(shopping_list__user=self.request.user)
+        return self.optimize_queryset(ShoppingListItem.objects.filter(shopping_list__user=self.request.user))
 
     @action(detail=True, methods=['POST'])
     def toggle_purchased(self, request, pk=None):
         """Toggle the purchased status of an item"""
         item = self.get_object()
-        item.is_purchased = not item.is_purchased
-        item.save()
-        
-        # Check if all items are purchased and update shopping list
-        if item.is_purchased:
-            shopping_list = item.shopping_list
-            if not shopping_list.items.filter(is_purchased=False).exists():
-                shopping_list.is_completed = True
-                shopping_list.save()
-        
+        # The list completes in the same update when no items are left to buy
+        set_purchased(item.shopping_list_id, [item.pk])
+        item.refresh_from_db(fields=['is_purchased'])
+
         serializer = self.get_serializer(item)
         return Response(serializer.data)
 
 class PantryItemViewSet(viewsets.ModelViewSet):
     serializer_class = PantryItemSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
+    keyset_ordering = ('category_order', 'name')
 
     def get_queryset(self):
-        return PantryItem.objects.filter(user=self.request.user)
+        # Uncategorised items first, as in PantryItem.Meta.ordering; keyset
+        # columns must not be NULL. The output field must allow -1, or cursor
+        # lookups against it are treated as matching nothing
+        return PantryItem.objects.filter(user=self.request.user).annotate(
+            category_order=Coalesce(F('category__display_order'), Value(-1), output_field=IntegerField())
+        )
 
     @action(detail=False, methods=['GET'])
     def expiring_soon(self, request):